@@ -0,0 +1,469 @@
+"""
+Headless batch analysis.
+
+Streams a CSV or Parquet file of statements (one company per row, columns
+named like the page's widget keys: ``revenue_cy``, ``revenue_py`` ...)
+through every section of the analysis — ratios, horizontal and vertical
+analysis, Altman Z-score and red flags — and writes the results chunk by
+chunk, so memory stays flat however large the input is.
+
+    python batch.py statements.csv results.parquet --chunk-size 200000
+
+Excel workbooks (first sheet, streamed) are read too when the optional
+openpyxl package is installed (``EXCEL_INPUT``), and statement columns may
+also be named by the page's labels ("Revenue / Sales PY", see
+``column_mapping``). Any input column that is not a statement line
+(company, industry, ...) is copied through to the output as an identifier.
+With ``--peers`` the run also sketches every ratio per industry for the
+page's peer percentiles (see ``peers.py``). With ``--fx rates.csv``
+statements are first converted from their ``currency`` column into one
+currency (``--to``), at the rate of their ``date`` column if they have one
+(see ``fx.py``). With ``--history`` every company's inputs and summary are
+saved for the page to reopen (see ``history.py``). With ``--rejects`` rows
+that fail the accounting identity and sign checks of ``validation.py`` go
+to that file, with the checks they failed, instead of being analysed.
+"""
+
+import argparse
+import csv
+import importlib.util
+import itertools
+import os
+import re
+import sys
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from ratio_engine import LINE_ITEMS, LINE_KEYS, PERIODS, analyse
+
+
+INPUT_COLUMNS = {f"{k}_{p}" for k in LINE_KEYS for p in PERIODS}
+
+# Reading Excel input needs openpyxl, an optional dependency
+EXCEL_INPUT = importlib.util.find_spec("openpyxl") is not None
+
+
+# --------------------------------------------------
+# Column names
+# --------------------------------------------------
+# Besides the widget keys, a statement column may be named by the page's
+# label (or any "/"-separated part of it, or its abbreviation) with the
+# period as a prefix or suffix: "Revenue / Sales (PY)", "Sales CY",
+# "current_year_EBIT", "COGS prior year". Case and punctuation are ignored.
+
+PERIOD_ALIASES = {
+    "cy": ("cy", "current", "current_year", "this_year", "ty"),
+    "py": ("py", "previous", "previous_year", "prior", "prior_year", "last_year", "ly"),
+}
+
+def _normalise(name):
+    return re.sub(r"[^0-9a-z]+", "_", str(name).lower()).strip("_")
+
+def _line_aliases():
+    aliases = {}
+    for key, label in LINE_ITEMS:
+        names = [key, label, *label.split("/"), *re.findall(r"\(([A-Z&]+)\)", label)]
+        for name in names:
+            aliases.setdefault(_normalise(re.sub(r"\(.*?\)", "", name)), key)
+            aliases.setdefault(_normalise(name), key)
+    return aliases
+
+LINE_ALIASES = _line_aliases()
+
+def _line_column(name):
+    for period, spellings in PERIOD_ALIASES.items():
+        for spelling in spellings:
+            if name.endswith("_" + spelling):
+                base = name[:-len(spelling) - 1]
+            elif name.startswith(spelling + "_"):
+                base = name[len(spelling) + 1:]
+            else:
+                continue
+            if base in LINE_ALIASES:
+                return f"{LINE_ALIASES[base]}_{period}"
+    if name in LINE_ALIASES:
+        return f"{LINE_ALIASES[name]}_cy"  # no period given: the current year
+    return None
+
+def column_mapping(names):
+    """``{column: "<line>_<period>"}`` for every column of ``names`` that holds a statement line.
+
+    Exact widget keys always map to themselves; otherwise the first column
+    naming a line wins and later ones are left as identifiers.
+    """
+    mapping = {name: name for name in names if name in INPUT_COLUMNS}
+    taken = set(mapping)
+    for name in names:
+        if name in mapping:
+            continue
+        target = _line_column(_normalise(name))
+        if target is not None and target not in taken:
+            mapping[name] = target
+            taken.add(target)
+    return mapping
+
+
+# --------------------------------------------------
+# Readers / writers (Arrow end to end, no per-row Python work)
+# --------------------------------------------------
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+def _is_excel(path):
+    return path.lower().endswith((".xlsx", ".xlsm"))
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("reading Excel workbooks needs openpyxl (pip install openpyxl); "
+                         "or save the sheet as CSV") from None
+    return openpyxl
+
+def _rechunk(batches, chunk_size):
+    import pyarrow as pa
+    buffer, buffered = [], 0
+    for batch in batches:
+        buffer.append(batch)
+        buffered += batch.num_rows
+        while buffered >= chunk_size:
+            table = pa.Table.from_batches(buffer).combine_chunks()
+            yield table.slice(0, chunk_size)
+            rest = table.slice(chunk_size)
+            buffer, buffered = rest.to_batches(), rest.num_rows
+    if buffered:
+        yield pa.Table.from_batches(buffer).combine_chunks()
+
+def _excel_batches(path, chunk_size):
+    # openpyxl's read-only mode streams rows, so a workbook is never loaded whole
+    import pandas as pd
+    import pyarrow as pa
+    book = _openpyxl().load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = book.worksheets[0].iter_rows(values_only=True)
+        header = [f"column_{i + 1}" if h is None else str(h) for i, h in enumerate(next(rows, ()))]
+        mapping = column_mapping(header)
+        while True:
+            block = list(itertools.islice(rows, chunk_size))
+            if not block:
+                break
+            frame = pd.DataFrame.from_records(block, columns=header)
+            for name in frame.columns:
+                if name in mapping:
+                    frame[name] = pd.to_numeric(frame[name], errors="coerce")
+                else:
+                    frame[name] = frame[name].map(lambda v: None if v is None else str(v))
+            yield pa.RecordBatch.from_pandas(frame.rename(columns=mapping), preserve_index=False)
+    finally:
+        book.close()
+
+def read_columns(path):
+    """Column names of a statements file, as written (before ``column_mapping``)."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).schema_arrow.names
+    if _is_excel(path):
+        book = _openpyxl().load_workbook(path, read_only=True)
+        try:
+            header = next(book.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        finally:
+            book.close()
+        return [f"column_{i + 1}" if h is None else str(h) for i, h in enumerate(header)]
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+def count_rows(path):
+    """Number of companies in a statements file, for progress; None if unknown.
+
+    Exact for Parquet (from the footer); for CSV it counts lines, so quoted
+    fields spanning lines overcount.
+    """
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if _is_excel(path):
+        book = _openpyxl().load_workbook(path, read_only=True)
+        try:
+            last = book.worksheets[0].max_row
+        finally:
+            book.close()
+        return None if last is None else max(last - 1, 0)
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 22), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return max(lines + (last != b"\n") - 1, 0)
+
+def read_chunks(path, chunk_size):
+    """Yield Arrow tables of at most ``chunk_size`` rows, statement columns renamed by ``column_mapping``.
+
+    Blank (null or NaN) ``validation.OPTIONAL`` lines come back as 0, "not
+    given", so they are derived as on the page whatever is done next.
+    """
+    for chunk in _chunks(path, chunk_size):
+        yield _not_given(chunk)
+
+def _not_given(chunk):
+    # Blank (null or NaN) optional lines -> 0
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from validation import OPTIONAL
+    for name in (f"{k}_{p}" for k in OPTIONAL for p in PERIODS):
+        if name in chunk.column_names:
+            column = chunk.column(name).cast(pa.float64())
+            column = pc.fill_null(pc.if_else(pc.is_nan(column), 0.0, column), 0.0)
+            chunk = chunk.set_column(chunk.column_names.index(name), name, column)
+    return chunk
+
+def _chunks(path, chunk_size):
+    import pyarrow as pa
+    if _is_excel(path):
+        yield from _rechunk(_excel_batches(path, chunk_size), chunk_size)
+        return
+    names = read_columns(path)
+    mapping = column_mapping(names)
+    names = [mapping.get(n, n) for n in names]
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        batches = (batch.rename_columns(names)
+                   for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        import pyarrow.csv as pcsv
+        read = pcsv.ReadOptions(block_size=1 << 22, column_names=names, skip_rows=1)
+        convert = pcsv.ConvertOptions(column_types={c: pa.float64() for c in mapping.values()})
+        batches = pcsv.open_csv(path, read_options=read, convert_options=convert)
+    yield from _rechunk(batches, chunk_size)
+
+
+class Writer:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    def write(self, table):
+        if self.writer is None:
+            self.schema = table.schema
+            if _is_parquet(self.path):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                # Dictionary-encoding high-entropy float columns costs far more
+                # than it saves; keep it for the identifier columns only.
+                ids = [f.name for f in table.schema if not pa.types.is_floating(f.type)
+                       and not pa.types.is_boolean(f.type)]
+                self.writer = pq.ParquetWriter(self.path, table.schema, use_dictionary=ids)
+            else:
+                import pyarrow.csv as pcsv
+                self.writer = pcsv.CSVWriter(self.path, table.schema)
+        else:
+            table = table.cast(self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# --------------------------------------------------
+# Pipeline
+# --------------------------------------------------
+
+def analyse_chunk(chunk):
+    """Results table for one input chunk: identifier columns, then every output column."""
+    import pyarrow as pa
+    results = analyse(chunk)
+    out = {c: chunk[c] for c in chunk.column_names if c not in INPUT_COLUMNS}
+    out.update((k, v) for k, v in results.items() if k not in INPUT_COLUMNS)
+    return pa.table(out)
+
+def convert_chunk(chunk, fx_table, to, date=None):
+    """``chunk`` with every statement line converted into ``to``, plus an ``fx_factor`` column.
+
+    Rows with no (or an empty) currency, or every row of a chunk with no
+    ``currency`` column, are taken to be in ``to`` already. Rows are
+    converted at their ``date`` if the chunk has that column, else at
+    ``date`` (default: the latest rates).
+    """
+    import numpy as np
+    import pyarrow as pa
+    from fx import convert
+    if "currency" in chunk.column_names:
+        encoded = (chunk.column("currency").cast(pa.string()).fill_null(to)
+                   .dictionary_encode().combine_chunks())
+        currency = ([name or to for name in encoded.dictionary.to_pylist()],
+                    encoded.indices.to_numpy(zero_copy_only=False))
+        if "date" in chunk.column_names:
+            date = chunk.column("date").cast(pa.date32()).to_numpy(zero_copy_only=False)
+        factor = fx_table.factors(currency, to, date)
+    else:
+        factor = np.ones(chunk.num_rows)
+    out = {c: chunk.column(c) for c in chunk.column_names if c not in INPUT_COLUMNS}
+    out.update(convert(chunk, factor))
+    out["fx_factor"] = factor
+    return pa.table(out)
+
+def validate_chunk(chunk, first_row=0, mask=None):
+    """``(valid rows, rejected rows or None)`` of ``chunk`` under ``validation.validate``.
+
+    Rejected rows keep every input column and gain ``row`` (their position
+    in the input, counting from ``first_row``), ``validation_mask`` and
+    ``validation_errors``. ``mask`` reuses an earlier ``validate`` result.
+    """
+    import numpy as np
+    import pyarrow as pa
+    from validation import describe, validate
+    if mask is None:
+        mask = validate(chunk)
+    bad = mask != 0
+    if not bad.any():
+        return chunk, None
+    rows = np.flatnonzero(bad)
+    rejected = chunk.take(pa.array(rows))
+    rejected = rejected.add_column(0, "row", pa.array(rows + first_row))
+    rejected = rejected.append_column("validation_mask", pa.array(mask[bad]))
+    rejected = rejected.append_column("validation_errors", pa.array(describe(mask[bad]), pa.string()))
+    return chunk.filter(pa.array(~bad)), rejected
+
+def _screen(chunks, writer, totals):
+    # Rows failing validation go to the rejects file; the rest go on to be analysed
+    seen = 0
+    for chunk in chunks:
+        valid, rejected = validate_chunk(chunk, seen)
+        seen += chunk.num_rows
+        if rejected is not None:
+            writer.write(rejected)
+            totals["rejected"] += rejected.num_rows
+        if valid.num_rows:
+            yield valid
+
+def _tally(totals, results):
+    # Portfolio red-flag totals, accumulated chunk by chunk
+    critical = results.column("critical_count").to_numpy()
+    warning = results.column("warning_count").to_numpy()
+    totals["critical_issues"] += int(critical.sum())
+    totals["warnings"] += int(warning.sum())
+    totals["with_critical"] += int((critical > 0).sum())
+    totals["with_warning"] += int((warning > 0).sum())
+
+def _remember(chunks, seen):
+    # Pass chunks through, keeping each until its results come back
+    for chunk in chunks:
+        seen.append(chunk)
+        yield chunk
+
+def _with_industry(chunk, industry):
+    # Rows of a file with no industry column all get the run's default industry
+    if "industry" in chunk.column_names:
+        return chunk
+    import pyarrow as pa
+    return chunk.append_column("industry", pa.array([industry] * chunk.num_rows, pa.string()))
+
+def run(input_path, output_path, chunk_size=100_000, log=sys.stderr, workers=1, peers=None,
+        fx=None, to="USD", fx_date=None, history=None, industry=None, progress=None, rejects=None):
+    """Analyse ``input_path`` into ``output_path``; return ``(rows, seconds, portfolio totals)``.
+
+    With ``workers`` > 1 chunks are analysed on a process pool
+    (``parallel.ParallelExecutor``); output order is the same either way.
+    ``peers`` (a ``peers.PeerBenchmarks``) is updated with every chunk.
+    With ``fx`` (an ``fx.FxTable``) every chunk is converted into ``to``
+    first (``convert_chunk``). ``history`` (a ``history.History``) gets
+    every row's inputs and summary, one bulk insert per chunk.
+    ``industry`` is the industry of every row when the input has no
+    ``industry`` column. With ``rejects`` (an output path) rows failing
+    validation are written there instead (``validate_chunk``) and counted
+    in ``totals["rejected"]``. ``progress`` is called with the number of
+    input rows done (analysed or rejected) after every chunk.
+    """
+    rows = 0
+    totals = dict.fromkeys(("critical_issues", "warnings", "with_critical", "with_warning", "rejected"), 0)
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        writer = Writer(output_path)
+        stack.callback(writer.close)
+        chunks = read_chunks(input_path, chunk_size)
+        if industry is not None:
+            chunks = (_with_industry(chunk, industry) for chunk in chunks)
+        if rejects is not None:
+            rejects_writer = Writer(rejects)
+            stack.callback(rejects_writer.close)
+            chunks = _screen(chunks, rejects_writer, totals)
+        if fx is not None:
+            chunks = (convert_chunk(chunk, fx, to, fx_date) for chunk in chunks)
+        inputs = deque()
+        if history is not None:
+            chunks = _remember(chunks, inputs)
+        if workers > 1:
+            from parallel import ParallelExecutor
+            results_iter = stack.enter_context(ParallelExecutor(workers)).map(chunks)
+        else:
+            results_iter = map(analyse_chunk, chunks)
+        for results in results_iter:
+            writer.write(results)
+            _tally(totals, results)
+            if peers is not None:
+                peers.update(results)
+            if history is not None:
+                history.save_table(inputs.popleft(), results)
+            rows += results.num_rows
+            if progress is not None:
+                progress(rows + totals["rejected"])
+            if log:
+                elapsed = time.perf_counter() - start
+                print(f"{rows:,} rows  {rows / elapsed:,.0f} rows/sec", file=log)
+    return rows, time.perf_counter() - start, totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the full financial analysis over a file of companies.")
+    parser.add_argument("input", help="CSV or Parquet file of statements")
+    parser.add_argument("output", help="CSV or Parquet file to write results to")
+    parser.add_argument("--chunk-size", type=int, default=100_000,
+                        help="rows per chunk (default: 100000)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; 0 = one per core (default: 1)")
+    parser.add_argument("--industry", help="industry of every row when the input has no industry column")
+    parser.add_argument("--peers", help="also write per-industry ratio sketches to this .npz file")
+    parser.add_argument("--fx", help="CSV of FX rates (date,currency,rate); converts every row into --to")
+    parser.add_argument("--to", default="USD", help="currency to convert into with --fx (default: USD)")
+    parser.add_argument("--fx-date", help="rate date for rows without a date column (default: latest)")
+    parser.add_argument("--history", help="save every company's inputs to this SQLite database")
+    parser.add_argument("--rejects", help="write rows failing the validation checks here instead of analysing them")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    peers = None
+    if args.peers:
+        from peers import PeerBenchmarks
+        peers = PeerBenchmarks()
+    fx_table = None
+    if args.fx:
+        import fx
+        fx_table = fx.load(args.fx)
+    history = None
+    if args.history:
+        from history import History
+        history = History(args.history)
+    rows, elapsed, totals = run(args.input, args.output, args.chunk_size,
+                                log=None if args.quiet else sys.stderr, workers=workers, peers=peers,
+                                fx=fx_table, to=args.to, fx_date=args.fx_date, history=history,
+                                industry=args.industry, rejects=args.rejects)
+    if history is not None:
+        history.close()
+    if peers is not None:
+        peers.save(args.peers)
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"Analysed {rows:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec) -> {args.output}",
+          file=sys.stderr)
+    print(f"Red flags: {totals['critical_issues']:,} critical issues across "
+          f"{totals['with_critical']:,} companies, {totals['warnings']:,} warnings across "
+          f"{totals['with_warning']:,} companies", file=sys.stderr)
+    if args.rejects:
+        print(f"Rejected {totals['rejected']:,} rows failing validation -> {args.rejects}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Benchmark suite.
+
+Times the analysis at several portfolio sizes and the page's end-to-end
+rerun latency, and writes the numbers to a JSON file so runs can be
+compared:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --sizes 1 1000 --compare bench.json   # exit 1 on regression
+
+Cases, each at every ``--sizes`` value (companies):
+
+    ratios     compute_ratios — the ratio block for CY and PY
+    altman     altman() for one period
+    red_flags  red_flags.evaluate + flag_columns
+    styler     render.styled — the Styler the page builds for a change table,
+               computed the way st.dataframe does
+    arrow      render.arrow_view — the same table as Arrow data + column_config
+    sensitivity  scenarios.sensitivity for one company on a square
+               revenue × COGS grid of about n points
+    monte_carlo  scenarios.simulate_z — n Z-score draws for one company
+    validation   validation.validate — every identity and sign check
+
+plus ``apptest``: cold start, idle rerun, rerun with results on screen and
+rerun after an edit (live what-if) of main.py under Streamlit's AppTest.
+Inputs are random but seeded, so runs are repeatable.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import red_flags
+from ratio_engine import LINE_KEYS, PERIODS, altman, compute_ratios, current_view, growth
+
+
+DEFAULT_SIZES = (1, 1_000, 100_000, 1_000_000)
+CASES = ("ratios", "altman", "red_flags", "styler", "arrow", "sensitivity", "monte_carlo", "validation")
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# --------------------------------------------------
+# Inputs
+# --------------------------------------------------
+
+def make_table(n, seed=0):
+    """``n`` random companies in the page's column layout; ~15% of lines are 0."""
+    rng = np.random.default_rng(seed)
+    table = {}
+    for k in LINE_KEYS:
+        for p in PERIODS:
+            col = rng.uniform(-200, 1000, n).round(2)
+            col[rng.random(n) < 0.15] = 0.0
+            table[f"{k}_{p}"] = col
+    return table
+
+def flag_view(table):
+    """The period-agnostic columns ``red_flags.evaluate`` reads, without running ``analyse``."""
+    view = current_view(compute_ratios(table))
+    for name in red_flags.INPUTS:
+        if name in view:
+            continue
+        if name.startswith("growth_"):
+            key = name[len("growth_"):]
+            view[name] = growth(table[f"{key}_cy"], table[f"{key}_py"])
+        else:
+            view[name] = table[f"{name}_cy"]
+    return view
+
+
+# --------------------------------------------------
+# Cases: setup(table) -> zero-argument callable to time
+# --------------------------------------------------
+
+def _ratios(table):
+    return lambda: compute_ratios(table)
+
+def _altman(table):
+    args = {
+        "wc": table["current_assets_cy"] - table["current_liab_cy"],
+        "ta": table["total_assets_cy"], "re": table["retained_cy"], "ebit": table["ebit_cy"],
+        "equity": table["equity_cy"], "tl": table["total_liab_cy"], "sales": table["revenue_cy"],
+    }
+    return lambda: altman(**args)
+
+def _red_flags(table):
+    view = flag_view(table)
+    return lambda: red_flags.flag_columns(red_flags.evaluate(view))
+
+def _change_table(table):
+    import pandas as pd
+    ratios = compute_ratios(table)
+    df = pd.DataFrame({"Current Year": ratios["cr_cy"], "Previous Year": ratios["cr_py"]})
+    df["Change"] = df["Current Year"] - df["Previous Year"]
+    df["Change %"] = growth(df["Current Year"].to_numpy(), df["Previous Year"].to_numpy())
+    return df
+
+def _styler(table):
+    import render
+    df = _change_table(table)
+
+    def build():
+        styler = render.styled(df, "{:.2f}", ["Change", "Change %"])
+        styler._compute()  # what st.dataframe triggers to read the cell styles
+        return styler
+    return build
+
+def _arrow(table):
+    import render
+    df = _change_table(table)
+    return lambda: render.arrow_view(df, "{:.2f}", ["Change", "Change %"])
+
+def _sensitivity(table):
+    from scenarios import axis, sensitivity
+    side = max(1, round(len(table["revenue_cy"]) ** 0.5))
+    company = {k: v[:1] for k, v in table.items()}
+    axes = (axis("revenue", 0.30, side), axis("cogs", 0.20, side))
+    return lambda: sensitivity(company, *axes)
+
+def _monte_carlo(table):
+    from scenarios import simulate_z
+    company = {k: v[:1] for k, v in table.items()}
+    uncertainty = {"revenue": 0.1, "ebit": 0.2, "working_capital": 0.15, "total_liab": 0.05}
+    n = len(table["revenue_cy"])
+    return lambda: simulate_z(company, uncertainty, draws=n)
+
+def _validation(table):
+    from validation import validate
+    return lambda: validate(table)
+
+SETUP = {
+    "ratios": _ratios, "altman": _altman, "red_flags": _red_flags,
+    "styler": _styler, "arrow": _arrow, "sensitivity": _sensitivity,
+    "monte_carlo": _monte_carlo, "validation": _validation,
+}
+
+
+# --------------------------------------------------
+# Timing
+# --------------------------------------------------
+
+def _summary(name, n, times):
+    best = min(times)
+    return {
+        "name": name, "n": n, "repeat": len(times),
+        "min_s": best, "median_s": statistics.median(times), "mean_s": statistics.fmean(times),
+        "max_s": max(times), "rows_per_s": n / best if best else None,
+    }
+
+def time_case(fn, repeat, budget=10.0):
+    """Run ``fn`` once to warm up, then up to ``repeat`` times or until ``budget`` seconds pass."""
+    start = time.perf_counter()
+    fn()
+    warm = time.perf_counter() - start
+    times = []
+    for _ in range(repeat if warm * repeat <= budget else max(1, int(budget / max(warm, 1e-9)))):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+def run_cases(cases, sizes, repeat, log=sys.stderr):
+    import pandas as pd
+    results = []
+    for n in sizes:
+        table = make_table(n)
+        for name in cases:
+            # the Styler refuses frames past this many cells by default
+            with pd.option_context("styler.render.max_elements", max(262_144, 4 * n)):
+                times = time_case(SETUP[name](table), repeat)
+            results.append(_summary(name, n, times))
+            if log:
+                r = results[-1]
+                print(f"{name:<11} {n:>9,}  min {r['min_s'] * 1e3:10.3f} ms  "
+                      f"median {r['median_s'] * 1e3:10.3f} ms", file=log)
+        del table
+    return results
+
+
+def run_apptest(runs, log=sys.stderr):
+    """Rerun latency of main.py under AppTest, in the phases a user goes through."""
+    import logging
+    import warnings
+    from streamlit.testing.v1 import AppTest
+    warnings.filterwarnings("ignore")
+    # AppTest resets streamlit's log levels on every run; mute the per-rerun noise outright
+    for name in ("streamlit.deprecation_util", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+        logging.getLogger(name).disabled = True
+    rng = np.random.default_rng(0)
+
+    def timed(action):
+        start = time.perf_counter()
+        action()
+        return time.perf_counter() - start
+
+    at = AppTest.from_file(os.path.join(HERE, "main.py"), default_timeout=120)
+    cold = timed(at.run)
+    idle = [timed(at.run) for _ in range(runs)]
+
+    for k in LINE_KEYS:
+        for p in PERIODS:
+            at.number_input(key=f"{k}_{p}").set_value(round(float(rng.uniform(1, 1000)), 2))
+    at.run()
+    run_button = next(b for b in at.button if b.label.startswith("🚀"))
+    first = timed(run_button.click().run)
+    shown = [timed(at.run) for _ in range(runs)]
+
+    next(c for c in at.checkbox if c.label.startswith("⚡ Live what-if")).check().run()
+    edits = []
+    for i in range(runs):
+        at.number_input(key="cash_cy").set_value(float(500 + i))
+        edits.append(timed(at.run))
+    if at.exception:
+        raise RuntimeError(f"main.py raised: {at.exception[0].value}")
+    # Live edits are only worth timing if they re-analyse: the results must still be on screen
+    if not any(m.label == "Current Year Z-Score" for m in at.metric):
+        raise RuntimeError("results not shown after a live edit; the benchmark is timing the wrong page")
+
+    results = [
+        _summary("apptest_cold", 1, [cold]),
+        _summary("apptest_idle_rerun", 1, idle),
+        _summary("apptest_first_analysis", 1, [first]),
+        _summary("apptest_rerun_with_results", 1, shown),
+        _summary("apptest_live_edit", 1, edits),
+    ]
+    if log:
+        for r in results:
+            print(f"{r['name']:<28} median {r['median_s'] * 1e3:9.1f} ms  "
+                  f"max {r['max_s'] * 1e3:9.1f} ms", file=log)
+    return results
+
+
+# --------------------------------------------------
+# Results file
+# --------------------------------------------------
+
+def environment():
+    import pandas as pd
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(results, baseline, tolerance):
+    """``(name, n, old, new)`` for every case more than ``tolerance`` slower than in ``baseline``."""
+    old = {(r["name"], r["n"]): r["min_s"] for r in baseline["results"]}
+    return [
+        (r["name"], r["n"], old[(r["name"], r["n"])], r["min_s"])
+        for r in results
+        if (r["name"], r["n"]) in old and r["min_s"] > old[(r["name"], r["n"])] * tolerance
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ratio engine and the page.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="portfolio sizes in companies (default: 1 1000 100000 1000000)")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (default: 5)")
+    parser.add_argument("--apptest-runs", type=int, default=10,
+                        help="reruns per AppTest phase; 0 skips AppTest (default: 10)")
+    parser.add_argument("--output", default="benchmark.json", help="results file (default: benchmark.json)")
+    parser.add_argument("--compare", help="earlier results file; exit 1 if any case got slower")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="slowdown factor counted as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    results = run_cases(args.cases, args.sizes, args.repeat)
+    if args.apptest_runs:
+        results += run_apptest(args.apptest_runs)
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Wrote {len(results)} results -> {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, n, old, new in regressions:
+            print(f"REGRESSION {name} n={n:,}: {old * 1e3:.3f} ms -> {new * 1e3:.3f} ms "
+                  f"({new / old:.2f}x)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
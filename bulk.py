@@ -0,0 +1,158 @@
+"""
+Bulk statement upload for the page.
+
+An uploaded CSV, Parquet or Excel (with openpyxl) file of statements (one
+company per row, columns as ``batch.column_mapping`` recognises them) is
+screened by ``validation.py`` and analysed by the batch pipeline on a background
+thread, so the page script never waits on it: reruns only poll the job's
+progress. Results are written chunk by chunk
+to a Parquet file in a temporary directory rather than kept in session
+state, and the page reads back just the summary columns it shows, sorted
+and cut down on the Arrow side.
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import zipfile
+
+from batch import column_mapping, count_rows, read_columns, run
+from validation import BITS, CHECKS, failure_counts
+
+
+# Portfolio summary: Altman Z, red-flag counts and the headline ratios
+SUMMARY_COLUMNS = ("z_cy", "critical_count", "warning_count",
+                   "cr_cy", "qr_cy", "de_cy", "ic_cy", "gpm_cy", "npm_cy", "roe_cy", "roa_cy")
+
+
+class Cancelled(Exception):
+    pass
+
+
+class BulkJob:
+    """One uploaded file, analysed on a background thread into a Parquet results file.
+
+    Rows failing validation go to a rejects file instead of the results.
+    """
+
+    def __init__(self, upload, name, industry=None, chunk_size=50_000):
+        self.name = name
+        self.industry = industry
+        self.chunk_size = chunk_size
+        self.directory = tempfile.mkdtemp(prefix="ratio_bulk_")
+        # The files go when the job is closed or garbage-collected
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.directory, True)
+        self.input_path = os.path.join(self.directory, "upload" + os.path.splitext(name)[1].lower())
+        with open(self.input_path, "wb") as f:
+            shutil.copyfileobj(upload, f, 1 << 20)
+        self.results_path = os.path.join(self.directory, "results.parquet")
+        self.rejects_path = os.path.join(self.directory, "rejects.parquet")
+        # Decoding and Arrow errors are ValueErrors; a broken workbook is a bad zip
+        try:
+            columns = read_columns(self.input_path)
+        except (OSError, ValueError, csv.Error, zipfile.BadZipFile) as e:
+            self._cleanup()
+            raise ValueError(f"Cannot read {name}: {e}") from e
+        self.mapping = column_mapping(columns)
+        self.identifiers = [c for c in columns if c not in self.mapping]
+        if industry is not None and "industry" not in self.identifiers:
+            self.identifiers.append("industry")
+        self.total = None
+        self.rows = 0        # input rows done so far, analysed or rejected
+        self.analysed = 0
+        self.seconds = None
+        self.totals = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"bulk {name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def done(self):
+        """Finished with every row analysed."""
+        return self.totals is not None
+
+    @property
+    def fraction(self):
+        """Share of rows analysed so far (0-1), or None while the total is unknown."""
+        if not self.total:
+            return None
+        return min(self.rows / self.total, 1.0)
+
+    def _progress(self, rows):
+        self.rows = rows
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def _run(self):
+        try:
+            self.total = count_rows(self.input_path)
+            self.analysed, self.seconds, self.totals = run(
+                self.input_path, self.results_path, self.chunk_size, log=None,
+                industry=self.industry, progress=self._progress, rejects=self.rejects_path,
+            )
+        except Cancelled:
+            self.error = "cancelled"
+        except Exception as e:  # reported on the page; the thread has nowhere to raise to
+            self.error = f"{type(e).__name__}: {e}"
+
+    def cancel(self):
+        self._cancel.set()
+
+    def read_results(self):
+        """Bytes of the full results file (for a download)."""
+        with open(self.results_path, "rb") as f:
+            return f.read()
+
+    def read_rejects(self):
+        """Bytes of the rejects file (for a download)."""
+        with open(self.rejects_path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        self.cancel()
+        if self._thread.ident is not None:
+            self._thread.join(timeout=10)
+        self._cleanup()
+
+
+def read_summary(results_path, identifiers=(), sort_by="z_cy", descending=False, limit=1000):
+    """The first ``limit`` companies of a results file by ``sort_by``, as a DataFrame.
+
+    Only the identifier and ``SUMMARY_COLUMNS`` columns are read; NaN sorts
+    last either way.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    file = pq.ParquetFile(results_path)
+    present = set(file.schema_arrow.names)
+    columns = [c for c in (*identifiers, *SUMMARY_COLUMNS) if c in present]
+    table = pq.read_table(results_path, columns=columns, memory_map=True)
+    key = table.column(sort_by)
+    if pa.types.is_floating(key.type):
+        key = pc.if_else(pc.is_nan(key), None, key)
+    order = pc.array_sort_indices(key, order="descending" if descending else "ascending",
+                                  null_placement="at_end")
+    return table.take(order[:limit]).to_pandas()
+
+
+def read_failures(rejects_path):
+    """Rejected rows per failed check and period, most common first, as a DataFrame."""
+    import pandas as pd
+    import pyarrow.parquet as pq
+    mask = pq.read_table(rejects_path, columns=["validation_mask"]).column(0).to_numpy()
+    messages = {check.code: check.message for check in CHECKS}
+    counts = sorted(failure_counts(mask, BITS).items(), key=lambda kv: -kv[1])
+    return pd.DataFrame([(messages[code], period.upper(), n) for (code, period), n in counts],
+                        columns=["Check", "Period", "Rows"])
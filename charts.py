@@ -0,0 +1,199 @@
+"""
+Chart layer for the page.
+
+Every chart goes through ``show``, so what reaches the browser stays
+bounded however much data is behind it — a multi-decade panel or a whole
+portfolio draws no more points than two periods do:
+
+* Each chart spec has a point budget shared by its series. Longer series
+  are downsampled: Largest-Triangle-Three-Buckets (``lttb``) keeps the
+  shape of a line; per-bucket ``minmax`` keeps every peak and trough (for
+  bars, where an average would hide them).
+* Chart data is one long-format Arrow table — ``chart``, ``series``, ``x``,
+  ``order``, ``value`` — with the names dictionary-encoded and values in
+  float32, instead of a wide float64 frame per chart.
+* Related charts share one Vega-Lite spec, faceted by ``chart`` with
+  independent scales, and reference lines are ``rule`` layers rather than
+  constant series shipped as data.
+
+    charts.show({"Margins (%)": margins, "Days": days}, y_title=None)
+"""
+
+import numpy as np
+
+
+POINT_BUDGET = 2_000    # points per chart spec, shared by its series
+BAR_MAX_POINTS = 40     # longer series are drawn as lines
+FACET_WIDTH = 720       # pixels shared by a faceted spec's columns
+
+
+# --------------------------------------------------
+# Downsampling
+# --------------------------------------------------
+
+def lttb(y, budget, x=None):
+    """Indices of ``budget`` points of ``y`` chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; between them each bucket
+    keeps the point forming the largest triangle with the point kept before
+    it and the average of the next bucket. ``x`` defaults to positions.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if budget >= n:
+        return np.arange(n)
+    if budget < 3:
+        return np.array([0, n - 1][:max(budget, 0)], dtype=np.intp)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.intp)
+    out = np.empty(budget, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    with np.errstate(invalid="ignore"):
+        for i in range(budget - 2):
+            lo, hi = edges[i], edges[i + 1]
+            if i + 2 < len(edges):
+                next_x, next_y = x[hi:edges[i + 2]].mean(), np.nanmean(y[hi:edges[i + 2]])
+            else:
+                next_x, next_y = x[-1], y[-1]
+            area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+            a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+            out[i + 1] = a
+    return out
+
+
+def minmax(y, budget):
+    """Indices of each bucket's minimum and maximum (at most ``budget`` points, ends kept)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if budget >= n:
+        return np.arange(n)
+    width = -(-n // max((budget - 2) // 2, 1))
+    rows = -(-n // width)
+    padded = np.full(rows * width, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(rows, width)
+    base = np.arange(rows) * width
+    lows = base + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    highs = base + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    keep = np.unique(np.concatenate(([0, n - 1], lows, highs)))
+    return keep[keep < n]
+
+
+METHODS = {"lttb": lttb, "minmax": lambda y, budget, x=None: minmax(y, budget)}
+
+
+# --------------------------------------------------
+# Data and specs
+# --------------------------------------------------
+
+def _dictionary(values, names):
+    import pyarrow as pa
+    return pa.DictionaryArray.from_arrays(pa.array(values, pa.int32()), pa.array(names, pa.string()))
+
+def chart_data(frames, budget=POINT_BUDGET, method="lttb"):
+    """``{chart: wide frame}`` as one long-format Arrow table.
+
+    Each frame's index is the x axis and each column a series. A spec's
+    ``budget`` points are shared evenly by all its series; longer series are
+    downsampled by ``method`` ("lttb" or "minmax"). Returns
+    ``(table, numeric x, most points in a series)``.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    numeric = all(pd.api.types.is_numeric_dtype(f.index) for f in frames.values())
+    n_series = sum(len(f.columns) for f in frames.values()) or 1
+    per_series = max(budget // n_series, 3)
+    labels = {}
+    chart, series, x, order, value = [], [], [], [], []
+    series_names, longest = [], 0
+    for c, (name, frame) in enumerate(frames.items()):
+        positions = np.arange(len(frame))
+        xs = frame.index.to_numpy(dtype=np.float64) if numeric else None
+        for col in frame.columns:
+            y = frame[col].to_numpy(dtype=np.float64)
+            keep = METHODS[method](y, per_series, xs)
+            if col not in series_names:
+                series_names.append(col)
+            longest = max(longest, len(keep))
+            chart.append(np.full(len(keep), c, np.int32))
+            series.append(np.full(len(keep), series_names.index(col), np.int32))
+            if numeric:
+                x.append(xs[keep])
+            else:
+                x.append(np.array([labels.setdefault(str(frame.index[k]), len(labels)) for k in keep], np.int32))
+            order.append(positions[keep].astype(np.int32))
+            value.append(y[keep].astype(np.float32))
+
+    def cat(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype)
+
+    table = pa.table({
+        "chart":  _dictionary(cat(chart, np.int32), [str(name) for name in frames]),
+        "series": _dictionary(cat(series, np.int32), [str(s) for s in series_names]),
+        "x":      pa.array(cat(x, np.float64)) if numeric else _dictionary(cat(x, np.int32), list(labels)),
+        "order":  pa.array(cat(order, np.int32)),
+        "value":  pa.array(cat(value, np.float32)),
+    })
+    return table, numeric, longest
+
+
+def chart_spec(charts, series, numeric, longest, mark=None, x_title=None, y_title=None, rules=(),
+               columns=None, height=260):
+    """Vega-Lite spec for ``chart_data``'s table: one view, or one facet per chart.
+
+    ``mark`` defaults to bars for series of up to ``BAR_MAX_POINTS`` points
+    (grouped side by side) and lines beyond that. ``rules`` are
+    ``(y, label, colour)`` reference lines.
+    """
+    mark = mark or ("bar" if longest <= BAR_MAX_POINTS else "line")
+    x = {"field": "x", "type": "quantitative" if numeric else "ordinal", "title": x_title}
+    if not numeric:
+        x["sort"] = {"field": "order", "op": "min"}
+        x["axis"] = {"labelAngle": -35, "labelLimit": 140}
+    encoding = {
+        "x": x,
+        "y": {"field": "value", "type": "quantitative", "title": y_title},
+        "tooltip": [{"field": "series", "title": "Series"}, {"field": "x", "title": x_title or "x"},
+                    {"field": "value", "title": "Value", "format": ",.2f"}],
+    }
+    if len(series) > 1:
+        encoding["color"] = {"field": "series", "type": "nominal", "title": None, "sort": list(series)}
+        if mark == "bar":
+            encoding["xOffset"] = {"field": "series", "sort": list(series)}
+    view = {"mark": {"type": mark, **({"point": longest <= BAR_MAX_POINTS} if mark == "line" else {})},
+            "encoding": encoding}
+    if rules:
+        layers = [view]
+        for y, label, colour in rules:
+            layers.append({"mark": {"type": "rule", "color": colour, "strokeDash": [4, 4]},
+                           "encoding": {"y": {"datum": y}}})
+            layers.append({"mark": {"type": "text", "color": colour, "align": "left", "dx": 4, "dy": -6},
+                           "encoding": {"y": {"datum": y}, "x": {"value": 0}, "text": {"value": label}}})
+        view = {"layer": layers}
+    if len(charts) == 1:
+        return {**view, "height": height}
+    columns = columns or len(charts)
+    return {
+        "facet": {"field": "chart", "type": "nominal", "title": None, "sort": list(charts),
+                  "header": {"labelFontWeight": "bold", "labelFontSize": 12}},
+        "columns": columns,
+        "spec": {**view, "width": FACET_WIDTH // columns, "height": height},
+        "resolve": {"scale": {"x": "independent", "y": "independent"}},
+    }
+
+
+def show(frames, budget=POINT_BUDGET, method=None, mark=None, **spec):
+    """Draw ``{chart: wide frame}`` as one Vega-Lite chart (faceted by chart if several).
+
+    ``method`` defaults to ``minmax`` for bars and ``lttb`` for lines;
+    ``spec`` keywords go to ``chart_spec``.
+    """
+    import streamlit as st
+    if method is None:
+        longest = max((len(f) for f in frames.values()), default=0)
+        method = "minmax" if (mark or ("bar" if longest <= BAR_MAX_POINTS else "line")) == "bar" else "lttb"
+    table, numeric, longest = chart_data(frames, budget, method)
+    series = list(dict.fromkeys(str(c) for f in frames.values() for c in f.columns))
+    vl = chart_spec([str(name) for name in frames], series, numeric, longest, mark, **spec)
+    st.vega_lite_chart(table, vl, use_container_width=len(frames) == 1)
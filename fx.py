@@ -0,0 +1,165 @@
+"""
+Currency normalisation.
+
+Converts statements reported in different currencies into one, so a
+portfolio of MYR, INR, PKR, GBP and USD issuers can be compared on absolute
+lines (horizontal analysis, absolute-value screens). Ratios are unitless
+and come out the same either way.
+
+Rates come from a local CSV of ``date,currency,rate`` rows, where ``rate``
+is units of ``currency`` per one unit of the base currency (USD unless
+told otherwise; the base itself needs no rows):
+
+    date,currency,rate
+    2024-12-31,MYR,4.47
+    2024-12-31,GBP,0.80
+
+The first load compiles the CSV into a sorted record table
+(``<file>.npy``, rebuilt whenever the CSV changes) that later loads
+memory-map instead of parsing, and loaded tables are cached per process.
+A lookup takes the latest rate on or before the requested date.
+
+    python fx.py rates.csv                 # compile and list what it holds
+    python batch.py in.parquet out.parquet --fx rates.csv --to USD
+"""
+
+import argparse
+import functools
+import os
+import sys
+
+import numpy as np
+
+from ratio_engine import LINE_KEYS, PERIODS, line_values
+
+
+RECORD = np.dtype([("currency", "U3"), ("day", "i4"), ("rate", "f8")])
+
+
+def _days(dates):
+    # Dates (strings, datetime64, datetime.date) as days since 1970-01-01
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def compile_rates(csv_path, out_path):
+    """Parse ``csv_path`` into a sorted ``RECORD`` array saved at ``out_path``."""
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    convert = pcsv.ConvertOptions(column_types={"date": pa.date32(), "currency": pa.string(),
+                                                "rate": pa.float64()})
+    table = pcsv.read_csv(csv_path, convert_options=convert)
+    records = np.empty(table.num_rows, RECORD)
+    records["currency"] = np.char.upper(table.column("currency").to_numpy(zero_copy_only=False).astype("U3"))
+    records["day"] = table.column("date").cast(pa.int32()).to_numpy(zero_copy_only=False)
+    records["rate"] = table.column("rate").to_numpy(zero_copy_only=False)
+    records = records[np.isfinite(records["rate"]) & (records["rate"] > 0)]
+    records = records[np.lexsort((records["day"], records["currency"]))]
+    # one rate per (currency, day): the last row given for it wins
+    last = np.ones(len(records), dtype=bool)
+    last[:-1] = (records["currency"][1:] != records["currency"][:-1]) | (records["day"][1:] != records["day"][:-1])
+    np.save(out_path, records[last])
+
+
+class FxTable:
+    """Historical rates indexed by (currency, date)."""
+
+    def __init__(self, records, base="USD"):
+        self.records = records
+        self.base = base
+        codes, starts = np.unique(records["currency"], return_index=True)
+        ends = np.append(starts[1:], len(records))
+        self._index = {str(c): (s, e) for c, s, e in zip(codes, starts, ends)}
+
+    @property
+    def currencies(self):
+        return sorted({self.base, *self._index})
+
+    def rates(self, currency, dates=None):
+        """Units of ``currency`` per base unit on each of ``dates`` (default: the latest rate)."""
+        currency = currency.upper()
+        if currency == self.base:
+            return np.ones(np.shape(dates)) if dates is not None else np.float64(1.0)
+        if currency not in self._index:
+            raise KeyError(f"no {currency} rates in the FX table")
+        lo, hi = self._index[currency]
+        if dates is None:
+            return np.float64(self.records["rate"][hi - 1])
+        days = np.asarray(self.records["day"][lo:hi])
+        i = np.searchsorted(days, _days(dates), side="right") - 1
+        if np.any(i < 0):
+            raise KeyError(f"no {currency} rate on or before {np.min(np.asarray(dates, 'datetime64[D]'))}")
+        return np.asarray(self.records["rate"][lo:hi])[i]
+
+    def factors(self, currency, to, dates=None):
+        """Multipliers from ``currency`` into ``to``.
+
+        ``currency`` is one code, one per row, or ``(names, codes)`` as from
+        ``np.unique(..., return_inverse=True)``; ``dates`` likewise one or one
+        per row. Rates are looked up once per currency group.
+        """
+        if isinstance(currency, tuple):
+            names, codes = currency
+        elif np.ndim(currency) == 0:
+            return self.rates(to, dates) / self.rates(str(currency), dates)
+        else:
+            names, codes = np.unique(np.asarray(currency).astype(str), return_inverse=True)
+        codes = np.asarray(codes)
+        if dates is None:
+            per_name = np.array([self.rates(to) / self.rates(str(n)) for n in names])
+            return per_name[codes]
+        dates = np.broadcast_to(np.asarray(dates, "datetime64[D]"), codes.shape)
+        out = np.empty(codes.shape)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        for g, name in enumerate(names):
+            rows = order[bounds[g]:bounds[g + 1]]
+            if rows.size:
+                out[rows] = self.rates(to, dates[rows]) / self.rates(str(name), dates[rows])
+        return out
+
+
+@functools.lru_cache(maxsize=8)
+def _load(path, mtime, base):
+    cache = path + ".npy"
+    if not os.path.exists(cache) or os.path.getmtime(cache) < mtime:
+        compile_rates(path, cache)
+    return FxTable(np.load(cache, mmap_mode="r"), base)
+
+def load(path, base="USD"):
+    """The ``FxTable`` for a rates CSV, compiled on first use and cached per process."""
+    return _load(os.path.abspath(path), os.path.getmtime(path), base)
+
+
+def convert(table, factor, prior_factor=None):
+    """Statement lines of ``table`` multiplied into another currency.
+
+    ``factor`` (scalar, or one per row, from ``FxTable.factors``) converts
+    the current year; ``prior_factor`` the previous year (default: the same
+    factor, i.e. a constant-currency comparison). Returns a columnar dict of
+    every ``<line>_<period>`` column, missing lines as 0.
+    """
+    values = line_values(table)
+    per_line = values.reshape(len(LINE_KEYS), len(PERIODS), -1)
+    per_line[:, PERIODS.index("cy")] *= factor
+    per_line[:, PERIODS.index("py")] *= factor if prior_factor is None else prior_factor
+    names = [f"{k}_{p}" for k in LINE_KEYS for p in PERIODS]
+    return dict(zip(names, values))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile an FX rates CSV and summarise it.")
+    parser.add_argument("rates", help="CSV of date,currency,rate")
+    parser.add_argument("--base", default="USD")
+    args = parser.parse_args(argv)
+    fx = load(args.rates, args.base)
+    for code in fx.currencies:
+        if code == fx.base:
+            continue
+        lo, hi = fx._index[code]
+        first, last = (np.datetime64(int(d), "D") for d in fx.records["day"][[lo, hi - 1]])
+        print(f"{code}  {hi - lo:>6} rates  {first} .. {last}  latest {fx.records['rate'][hi - 1]:.4f}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
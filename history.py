@@ -0,0 +1,209 @@
+"""
+Analysis history in an embedded SQLite database.
+
+Saved analyses survive the Streamlit session: each row holds a company's
+inputs (one statement record, stored as its raw bytes) and, when saved from
+the page, the rendered results, so re-opening a company restores every
+field and shows its results without recomputing. Rows are unique per
+(company, period, currency); saving again replaces the row.
+
+Companies are looked up by case-insensitive prefix on an index, and period
+and industry are indexed too. Connections come from one shared pool (WAL
+mode, so readers never wait on a writer), and ``save_many`` /
+``save_table`` write any number of rows in a single transaction:
+
+    python batch.py statements.parquet results.parquet --history history.db
+"""
+
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from ratio_engine import statement_dtype, to_statements
+from result_cache import CODE_VERSION
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id           INTEGER PRIMARY KEY,
+    company      TEXT NOT NULL COLLATE NOCASE,
+    period       TEXT NOT NULL DEFAULT '',
+    industry     TEXT,
+    currency     TEXT NOT NULL DEFAULT '',
+    saved_at     REAL NOT NULL,
+    z_cy         REAL,
+    critical     INTEGER,
+    inputs       BLOB NOT NULL,
+    results      BLOB,
+    code_version TEXT,
+    UNIQUE (company, period, currency)
+);
+CREATE INDEX IF NOT EXISTS analyses_period   ON analyses (period);
+CREATE INDEX IF NOT EXISTS analyses_industry ON analyses (industry);
+"""
+
+# ``company`` leads the UNIQUE index, so prefix LIKE (case-insensitive, as the
+# column is NOCASE) is an index range scan
+_UPSERT = """
+INSERT INTO analyses (company, period, industry, currency, saved_at, z_cy, critical,
+                      inputs, results, code_version)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (company, period, currency) DO UPDATE SET
+    industry = excluded.industry, saved_at = excluded.saved_at, z_cy = excluded.z_cy,
+    critical = excluded.critical, inputs = excluded.inputs, results = excluded.results,
+    code_version = excluded.code_version
+"""
+
+SUMMARY = ("id", "company", "period", "industry", "currency", "saved_at", "z_cy", "critical")
+
+INPUT_DTYPE = statement_dtype()
+
+
+class ConnectionPool:
+    """At most ``size`` SQLite connections to ``path``, shared across threads."""
+
+    def __init__(self, path, size=4):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                self._created += create
+            conn = self._connect() if create else self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class History:
+    """Saved analyses: inputs, optional page results and a summary per company and period."""
+
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn, conn:
+            conn.executescript(SCHEMA)
+
+    # ---------- writes ----------
+
+    @staticmethod
+    def _row(company, period, industry, currency, inputs, results=None, z_cy=None, critical=None):
+        record = np.ascontiguousarray(to_statements(inputs)[:1])
+        blob = None if results is None else pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        return (company, period or "", industry, currency or "", time.time(),
+                None if z_cy is None else float(z_cy), None if critical is None else int(critical),
+                record.tobytes(), blob, CODE_VERSION)
+
+    def save(self, company, period, industry, currency, inputs, results=None, z_cy=None, critical=None):
+        """Save one analysis (replacing any earlier one for the same company, period and currency)."""
+        self.save_many([(company, period, industry, currency, inputs, results, z_cy, critical)])
+
+    def save_many(self, analyses):
+        """Save tuples of ``save`` arguments in one transaction."""
+        rows = [self._row(*a) for a in analyses]
+        with self.pool.connection() as conn, conn:
+            conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def save_table(self, table, results=None):
+        """Bulk-save every row of a statements table (e.g. a batch chunk); inputs only.
+
+        The table needs a ``company`` column; ``period``, ``industry`` and
+        ``currency`` columns are used when present. ``results`` (the chunk's
+        batch results) fills in the Z-score and critical-flag summary.
+        """
+        def column(name, default):
+            if name not in table.column_names:
+                return [default] * table.num_rows
+            return [default if v is None else v for v in table.column(name).to_pylist()]
+
+        records = to_statements(table)
+        blob, size = records.tobytes(), records.dtype.itemsize
+        z = critical = [None] * table.num_rows
+        if results is not None:
+            z = results.column("z_cy").to_pylist()
+            critical = results.column("critical_count").to_pylist()
+        now = time.time()
+        rows = [
+            (str(c), str(p), i, str(cur), now, zi, ci, blob[k * size:(k + 1) * size], None, CODE_VERSION)
+            for k, (c, p, i, cur, zi, ci) in enumerate(zip(
+                column("company", ""), column("period", ""), column("industry", None),
+                column("currency", ""), z, critical))
+        ]
+        with self.pool.connection() as conn, conn:
+            conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    # ---------- reads ----------
+
+    def search(self, prefix="", industry=None, limit=20):
+        """Summaries of saved analyses whose company starts with ``prefix`` (any case).
+
+        Ordered by company, latest period first.
+        """
+        sql = f"SELECT {', '.join(SUMMARY)} FROM analyses WHERE company LIKE ? ESCAPE '\\'"
+        args = [prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"]
+        if industry is not None:
+            sql += " AND industry = ?"
+            args.append(industry)
+        sql += " ORDER BY company, period DESC LIMIT ?"
+        args.append(limit)
+        with self.pool.connection() as conn:
+            return [dict(zip(SUMMARY, row)) for row in conn.execute(sql, args)]
+
+    def load(self, analysis_id):
+        """``(summary, inputs record, results)`` of a saved analysis.
+
+        ``results`` is None if none were saved or they were computed by
+        another version of the engine (the inputs are still good).
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(SUMMARY)}, inputs, results, code_version FROM analyses WHERE id = ?",
+                (analysis_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"no saved analysis {analysis_id}")
+        summary = dict(zip(SUMMARY, row))
+        blob, results, version = row[len(SUMMARY):]
+        inputs = np.frombuffer(blob, dtype=INPUT_DTYPE).copy()
+        if results is not None and version == CODE_VERSION:
+            results = pickle.loads(results)
+        else:
+            results = None
+        return summary, inputs, results
+
+    def __len__(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def close(self):
+        self.pool.close()
+
@@ -1,6 +1,27 @@
+import os
+
 import streamlit as st
 import pandas as pd
 
+import charts
+import fx
+import red_flags
+from ratio_engine import (
+    BALANCE_VERTICAL, INCOME_VERTICAL, LINE_ITEMS, LINE_KEYS, RATIO_GROUPS, RATIO_LABELS, TREND_CAPTIONS,
+    TREND_CHARTS, Z_ZONES,
+    current_view, growth, horizontal_frame, ratio_groups as build_ratio_groups, statements,
+    to_statements, trend_frame, z_label, z_zone,
+)
+from ratio_graph import SECTIONS, IncrementalAnalysis
+import render
+from batch import EXCEL_INPUT
+from bulk import SUMMARY_COLUMNS, BulkJob, read_failures, read_summary
+from history import History
+from peers import PeerBenchmarks
+from profiling import SectionProfiler
+from result_cache import ResultCache, input_key
+from scenarios import axis, grid_frame, sensitivity, simulate_z
+
 st.set_page_config(
     page_title="Financial Analysis Tool",
     page_icon="📊",
@@ -30,51 +51,97 @@ st.markdown("""
 
 
 # --------------------------------------------------
-# Utility Functions
+# SIDEBAR
 # --------------------------------------------------
 
-def safe_div(n, d):
-    return n / d if d and d != 0 else 0
-
-def pct(n, d):
-    return safe_div(n, d) * 100
-
-def growth(current, previous):
-    if previous == 0:
-        return 0.0
-    return ((current - previous) / abs(previous)) * 100
-
-def avg(a, b):
-    return (a + b) / 2 if (a + b) != 0 else 0
-
-def color_change(val):
-    try:
-        v = float(val)
-        if v > 0:
-            return "color: #38a169; font-weight:600"
-        elif v < 0:
-            return "color: #e53e3e; font-weight:600"
-    except Exception:
-        pass
-    return "color: #718096"
-
+FX_PATH = os.environ.get("RATIO_FX", "fx_rates.csv")
+HISTORY_PATH = os.environ.get("RATIO_HISTORY_DB", "history.db")
+
+INDUSTRIES = [
+    "General", "Manufacturing", "Retail", "Technology",
+    "Banking/Finance", "Healthcare", "Real Estate", "Energy"
+]
+currencies = ["USD ($)", "GBP (£)", "EUR (€)", "MYR (RM)", "INR (₹)", "SGD (S$)", "PKR (₨)"]
+
+
+@st.cache_resource
+def get_history(path):
+    # One connection pool per server process, shared by every session
+    return History(path)
+
+def open_saved(analysis_id):
+    # "Open" callback: runs before the next script run, so it can set every
+    # widget. Stored results go into the result cache under the key this
+    # run will compute, so the analysis is shown without recomputing.
+    summary, record, results = get_history(HISTORY_PATH).load(analysis_id)
+    for name in record.dtype.names:
+        st.session_state[name] = float(record[name][0])
+    st.session_state["company_name"] = summary["company"]
+    st.session_state["period"] = summary["period"]
+    if summary["industry"] in INDUSTRIES:
+        st.session_state["industry"] = summary["industry"]
+    if summary["currency"] in currencies:
+        st.session_state["currency"] = summary["currency"]
+    st.session_state["compare_in"] = "As entered"
+    key = input_key(record, industry=st.session_state.get("industry", INDUSTRIES[0]),
+                    currency=st.session_state.get("currency", currencies[0]), report_in=None)
+    if results is not None:
+        get_result_cache().put(key, results)
+    st.session_state["analysed_key"] = key
 
-# --------------------------------------------------
-# SIDEBAR
-# --------------------------------------------------
 
 with st.sidebar:
     st.title("⚙️ Settings")
-    company_name = st.text_input("Company Name", placeholder="e.g. ABC Corp")
-    industry = st.selectbox("Industry", [
-        "General", "Manufacturing", "Retail", "Technology",
-        "Banking/Finance", "Healthcare", "Real Estate", "Energy"
-    ])
-    currency = st.selectbox("Currency", [
-        "USD ($)", "GBP (£)", "EUR (€)", "MYR (RM)", "INR (₹)", "SGD (S$)", "PKR (₨)"
-    ])
+    company_name = st.text_input("Company Name", placeholder="e.g. ABC Corp", key="company_name",
+                                 help="Analyses of named companies are saved when you run them")
+    period = st.text_input("Period", placeholder="e.g. FY2024", key="period")
+    industry = st.selectbox("Industry", INDUSTRIES, key="industry")
+    currency = st.selectbox("Currency", currencies, key="currency")
     curr_sym = currency.split("(")[1].replace(")", "").strip()
 
+    # With an FX rates file (fx.py), figures can be restated in another currency
+    report_in = None
+    fx_table = fx.load(FX_PATH) if os.path.exists(FX_PATH) else None
+    if fx_table is not None:
+        restate = st.selectbox(
+            "Compare in", ["As entered", *[c for c in currencies if c.split()[0] in fx_table.currencies]],
+            key="compare_in",
+            help="Convert every amount at the historical rate for the date below "
+                 "(both years at the same rate)",
+        )
+        if restate != "As entered" and restate != currency:
+            report_in = restate
+            fx_date = st.date_input("Rates as of", help="The latest rate on or before this date is used")
+    live_updates = st.checkbox(
+        "⚡ Live what-if updates",
+        help="After the first run, re-analyse on every edit, recomputing only what the edit affects",
+    )
+    table_mode = st.selectbox(
+        "Table rendering", ["Auto", "Styled", "Fast (Arrow)"],
+        help="Fast (Arrow) skips the HTML Styler and marks changes with 🟢/🔴; "
+             "Auto uses it for large tables",
+    )
+    table_mode = {"Auto": "auto", "Styled": "styled", "Fast (Arrow)": "arrow"}[table_mode]
+    profile_page = st.checkbox(
+        "🛠 Profile this page",
+        value=os.environ.get("RATIO_PROFILE") == "1",
+        help="Time each section and track its peak memory; shown in a debug panel at the bottom",
+    )
+
+    st.markdown("---")
+    st.markdown("**📂 Saved analyses**")
+    lookup = st.text_input("Find company", placeholder="Start typing a company name",
+                           label_visibility="collapsed")
+    matches = get_history(HISTORY_PATH).search(lookup) if lookup else []
+    if matches:
+        chosen = st.selectbox(
+            "Matches", matches, label_visibility="collapsed",
+            format_func=lambda m: " · ".join(filter(None, (m["company"], m["period"], m["currency"]))),
+        )
+        st.button("📂 Open", on_click=open_saved, args=(chosen["id"],), use_container_width=True)
+    elif lookup:
+        st.caption("No saved analyses match.")
+
     st.markdown("---")
     st.markdown("**📘 How to use**")
     st.info(
@@ -94,16 +161,22 @@ st.caption("Ratio analysis · Horizontal & vertical analysis · Red flag detecti
 st.markdown("---")
 
 
+# Opt-in (sidebar): wall time and peak memory of each results section
+profiler = SectionProfiler(enabled=profile_page)
+
+
 # --------------------------------------------------
 # INPUT SECTION
 # --------------------------------------------------
 
 st.markdown('<div class="section-header">📥 Enter Financial Data</div>', unsafe_allow_html=True)
 
-tab_is, tab_bs, tab_cf, tab_extra = st.tabs([
-    "📋 Income Statement", "🏦 Balance Sheet", "💵 Cash Flow", "➕ Additional"
+tab_is, tab_bs, tab_cf, tab_extra, tab_bulk = st.tabs([
+    "📋 Income Statement", "🏦 Balance Sheet", "💵 Cash Flow", "➕ Additional", "📦 Bulk Upload"
 ])
 
+inputs = statements()  # one CY/PY statement record, filled field by field
+
 def two_col_input(label, key, help_text=""):
     c1, c2, c3 = st.columns([2.5, 1, 1])
     c1.markdown(f"**{label}**")
@@ -113,512 +186,522 @@ def two_col_input(label, key, help_text=""):
                          key=f"{key}_cy", label_visibility="collapsed")
     py = c3.number_input("PY", value=0.0, step=1.0, format="%.2f",
                          key=f"{key}_py", label_visibility="collapsed")
-    return cy, py
+    inputs[f"{key}_cy"], inputs[f"{key}_py"] = cy, py
 
 with tab_is:
     hdr1, hdr2, hdr3 = st.columns([2.5, 1, 1])
     hdr1.markdown("**Item**")
     hdr2.markdown("**Current Year**")
     hdr3.markdown("**Previous Year**")
-    cy_revenue,      py_revenue      = two_col_input("Revenue / Sales", "revenue")
-    cy_cogs,         py_cogs         = two_col_input("Cost of Goods Sold (COGS)", "cogs")
-    cy_gross,        py_gross        = two_col_input("Gross Profit", "gross",
-                                                      "Leave 0 to auto-calc as Revenue − COGS")
-    cy_ebitda,       py_ebitda       = two_col_input("EBITDA", "ebitda")
-    cy_ebit,         py_ebit         = two_col_input("EBIT", "ebit")
-    cy_interest,     py_interest     = two_col_input("Finance Cost / Interest Expense", "interest")
-    cy_tax,          py_tax          = two_col_input("Tax Expense", "tax")
-    cy_pbt,          py_pbt          = two_col_input("Profit Before Tax (PBT)", "pbt")
-    cy_pat,          py_pat          = two_col_input("Profit After Tax (PAT) / Net Income", "pat")
-    cy_sga,          py_sga          = two_col_input("SG&A Expenses", "sga")
-    cy_depreciation, py_depreciation = two_col_input("Depreciation Expense", "depreciation")
+    two_col_input("Revenue / Sales", "revenue")
+    two_col_input("Cost of Goods Sold (COGS)", "cogs")
+    two_col_input("Gross Profit", "gross", "Leave 0 to auto-calc as Revenue − COGS")
+    two_col_input("EBITDA", "ebitda")
+    two_col_input("EBIT", "ebit")
+    two_col_input("Finance Cost / Interest Expense", "interest")
+    two_col_input("Tax Expense", "tax")
+    two_col_input("Profit Before Tax (PBT)", "pbt")
+    two_col_input("Profit After Tax (PAT) / Net Income", "pat")
+    two_col_input("SG&A Expenses", "sga")
+    two_col_input("Depreciation Expense", "depreciation")
 
 with tab_bs:
     hdr1, hdr2, hdr3 = st.columns([2.5, 1, 1])
     hdr1.markdown("**Item**")
     hdr2.markdown("**Current Year**")
     hdr3.markdown("**Previous Year**")
-    cy_cash,           py_cash           = two_col_input("Cash & Bank Balances", "cash")
-    cy_receivables,    py_receivables    = two_col_input("Trade Receivables", "receivables")
-    cy_inventory,      py_inventory      = two_col_input("Inventory", "inventory")
-    cy_current_assets, py_current_assets = two_col_input("Total Current Assets", "current_assets")
-    cy_total_assets,   py_total_assets   = two_col_input("Total Assets", "total_assets")
-    cy_gross_ppe,      py_gross_ppe      = two_col_input("Gross PP&E", "gross_ppe")
-    cy_net_ppe,        py_net_ppe        = two_col_input("Net Fixed Assets / Net PP&E", "net_ppe")
-    cy_current_liab,   py_current_liab   = two_col_input("Current Liabilities", "current_liab")
-    cy_st_debt,        py_st_debt        = two_col_input("Short-Term Debt", "st_debt")
-    cy_lt_debt,        py_lt_debt        = two_col_input("Long-Term Debt", "lt_debt")
-    cy_total_debt,     py_total_debt     = two_col_input("Total Debt", "total_debt")
-    cy_total_liab,     py_total_liab     = two_col_input("Total Liabilities", "total_liab")
-    cy_equity,         py_equity         = two_col_input("Total Equity", "equity")
-    cy_retained,       py_retained       = two_col_input("Retained Earnings", "retained")
-    cy_payables,       py_payables       = two_col_input("Trade Payables", "payables")
+    two_col_input("Cash & Bank Balances", "cash")
+    two_col_input("Trade Receivables", "receivables")
+    two_col_input("Inventory", "inventory")
+    two_col_input("Total Current Assets", "current_assets")
+    two_col_input("Total Assets", "total_assets")
+    two_col_input("Gross PP&E", "gross_ppe")
+    two_col_input("Net Fixed Assets / Net PP&E", "net_ppe")
+    two_col_input("Current Liabilities", "current_liab")
+    two_col_input("Short-Term Debt", "st_debt")
+    two_col_input("Long-Term Debt", "lt_debt")
+    two_col_input("Total Debt", "total_debt")
+    two_col_input("Total Liabilities", "total_liab")
+    two_col_input("Total Equity", "equity")
+    two_col_input("Retained Earnings", "retained")
+    two_col_input("Trade Payables", "payables")
 
 with tab_cf:
     hdr1, hdr2, hdr3 = st.columns([2.5, 1, 1])
     hdr1.markdown("**Item**")
     hdr2.markdown("**Current Year**")
     hdr3.markdown("**Previous Year**")
-    cy_ocf, py_ocf = two_col_input("Operating Cash Flow (CFO)", "ocf")
-    cy_icf, py_icf = two_col_input("Investing Cash Flow", "icf")
-    cy_fcf, py_fcf = two_col_input("Financing Cash Flow", "fcf")
+    two_col_input("Operating Cash Flow (CFO)", "ocf")
+    two_col_input("Investing Cash Flow", "icf")
+    two_col_input("Financing Cash Flow", "fcf")
 
 with tab_extra:
     hdr1, hdr2, hdr3 = st.columns([2.5, 1, 1])
     hdr1.markdown("**Item**")
     hdr2.markdown("**Current Year**")
     hdr3.markdown("**Previous Year**")
-    cy_credit_sales, py_credit_sales = two_col_input(
+    two_col_input(
         "Credit Sales (for Receivable Days)", "credit_sales",
         "Leave 0 to use Total Revenue as proxy"
     )
     st.info("💡 Average figures are auto-calculated as (Current Year + Previous Year) / 2")
 
 
+BULK_ROWS_SHOWN = 1000
+BULK_LABELS = {"z_cy": "Z-Score", "critical_count": "Critical", "warning_count": "Warnings",
+               **{c: RATIO_LABELS[c[:-3]] for c in SUMMARY_COLUMNS if c[:-3] in RATIO_LABELS}}
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def bulk_summary(results_path, identifiers, sort_by, descending):
+    # Keyed by the job's own results file, so a new upload never hits an old entry
+    return read_summary(results_path, list(identifiers), sort_by, descending, BULK_ROWS_SHOWN)
+
+def bulk_progress(job):
+    # Polled while the job runs; once it stops, a full rerun shows the outcome
+    if not job.running:
+        st.rerun()
+    done = f"{job.rows:,} of {job.total:,}" if job.total else f"{job.rows:,}"
+    st.progress(job.fraction or 0.0, text=f"Analysing {job.name}: {done} companies")
+    st.button("✖ Cancel", on_click=job.cancel)
+
+def show_bulk_results(job):
+    if job.error is not None:
+        st.error(f"Could not analyse {job.name}: {job.error}")
+        return
+    t = job.totals
+    b1, b2, b3, b4, b5 = st.columns(5)
+    b1.metric("Companies", f"{job.analysed:,}")
+    b2.metric("Rejected", f"{t['rejected']:,}", help="Rows failing the accounting identity and sign checks")
+    b3.metric("With critical issues", f"{t['with_critical']:,}")
+    b4.metric("Critical issues", f"{t['critical_issues']:,}")
+    b5.metric("Warnings", f"{t['warnings']:,}")
+    st.caption(f"{job.name} analysed in {job.seconds:.1f}s")
+
+    if t["rejected"]:
+        with st.expander(f"🚫 {t['rejected']:,} rows rejected by validation"):
+            st.dataframe(read_failures(job.rejects_path), use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Download rejected rows (Parquet)", job.read_rejects, on_click="ignore",
+                               file_name=os.path.splitext(job.name)[0] + "_rejects.parquet")
+    if not job.analysed:
+        st.warning("No rows passed validation, so there is nothing to summarise.")
+        return
+
+    o1, o2 = st.columns([3, 1])
+    sort_by = o1.selectbox("Sort by", list(BULK_LABELS), format_func=BULK_LABELS.get, key="bulk_sort")
+    descending = o2.toggle("Highest first", key="bulk_descending")
+    df_bulk = bulk_summary(job.results_path, tuple(job.identifiers), sort_by, descending)
+    df_bulk.insert(len(job.identifiers), "Zone",
+                   [Z_ZONES[z][1] for z in z_zone(df_bulk["z_cy"].to_numpy())])
+    st.dataframe(df_bulk.rename(columns=BULK_LABELS), use_container_width=True, hide_index=True,
+                 column_config={label: st.column_config.NumberColumn(format="%.2f")
+                                for col, label in BULK_LABELS.items() if col.endswith("_cy")})
+    if job.analysed > BULK_ROWS_SHOWN:
+        st.caption(f"The {BULK_ROWS_SHOWN:,} {'highest' if descending else 'lowest'} of {job.analysed:,} "
+                   f"companies by {BULK_LABELS[sort_by]}; download the results for all of them.")
+    st.download_button("⬇️ Download full results (Parquet)", job.read_results, on_click="ignore",
+                       file_name=os.path.splitext(job.name)[0] + "_results.parquet")
+
+with tab_bulk:
+    st.caption("Analyse a whole file of companies, one per row. Name the columns like the fields "
+               "above (\"Revenue / Sales CY\", \"Revenue / Sales PY\" ...) or by their keys "
+               "(revenue_cy, revenue_py ...); other columns such as the company name are carried "
+               "through. Rows without an industry column use the sidebar's industry. Rows that fail "
+               "the accounting identity and sign checks are set aside, not analysed.")
+    upload = st.file_uploader("Statements file",
+                              type=["csv", "parquet"] + (["xlsx", "xlsm"] if EXCEL_INPUT else []))
+    job = st.session_state.get("bulk_job")
+    if st.button("📦 Analyse file", disabled=upload is None):
+        if job is not None:
+            job.close()
+        try:
+            job = BulkJob(upload, upload.name, industry=industry)
+        except ValueError as e:
+            job = None
+            st.error(str(e))
+        else:
+            if job.mapping:
+                job.start()
+            else:
+                job.close()
+                job = None
+                st.error("No statement columns recognised in that file.")
+        st.session_state["bulk_job"] = job
+    if job is not None:
+        st.caption(f"{len(job.mapping)} statement columns recognised; carried through: "
+                   + (", ".join(job.identifiers) or "none"))
+        if job.running:
+            st.fragment(bulk_progress, run_every=0.5)(job)
+        else:
+            show_bulk_results(job)
+
+
 # --------------------------------------------------
 # RUN ANALYSIS
 # --------------------------------------------------
 
-st.markdown("---")
-run = st.button("🚀 Run Full Analysis", type="primary", use_container_width=True)
+PERIOD_LABELS = ["Previous Year", "Current Year"]
+
+
+@st.cache_resource
+def get_result_cache():
+    # One cache per server process, shared by every session. Set
+    # RATIO_CACHE_DIR to keep results on disk across restarts as well.
+    return ResultCache(
+        maxsize=int(os.environ.get("RATIO_CACHE_SIZE", "512")),
+        directory=os.environ.get("RATIO_CACHE_DIR") or None,
+    )
+
+
+@st.cache_resource
+def get_peers(path, mtime):
+    # Peer-group sketches written by ``batch.py --peers``; reloaded when the file changes
+    return PeerBenchmarks.load(path)
+
+PEERS_PATH = os.environ.get("RATIO_PEERS", "peers.npz")
+peers = get_peers(PEERS_PATH, os.path.getmtime(PEERS_PATH)) if os.path.exists(PEERS_PATH) else None
+
+
+def build_section(section, v, curr_sym):
+    """Display model (tables, chart frames, flags) for one section of the results.
+
+    These are what the result cache and saved history hold: bump
+    ``result_cache.SECTIONS_VERSION`` with any change to what is returned.
+    """
+    if section.startswith("ratios:"):
+        ratios = build_ratio_groups(v)[section.split(":", 1)[1]]
+        df = pd.DataFrame(ratios, index=["Current Year", "Previous Year"]).T
+        df["Change"] = df["Current Year"] - df["Previous Year"]
+        df["Change %"] = growth(df["Current Year"].to_numpy(), df["Previous Year"].to_numpy())
+        return df
 
-if run:
+    if section == "horizontal":
+        return horizontal_frame(v, PERIOD_LABELS, unit=curr_sym)
 
-    # ---------- Derived / averaged values ----------
-    cy_gross_profit = cy_gross if cy_gross != 0 else cy_revenue - cy_cogs
-    py_gross_profit = py_gross if py_gross != 0 else py_revenue - py_cogs
+    if section == "vertical":
+        inc_vert = {
+            label: (float(v[f"pct_rev_{key}_cy"][0]), float(v[f"pct_rev_{key}_py"][0]))
+            for label, key in INCOME_VERTICAL
+        }
+        bs_vert = {
+            label: (float(v[f"pct_ta_{key}_cy"][0]), float(v[f"pct_ta_{key}_py"][0]))
+            for label, key in BALANCE_VERTICAL
+        }
+        return (pd.DataFrame(inc_vert, index=["CY %", "PY %"]).T,
+                pd.DataFrame(bs_vert, index=["CY %", "PY %"]).T)
+
+    if section == "trends":
+        return {name: trend_frame(v, items, PERIOD_LABELS) for name, items in TREND_CHARTS.items()}
 
-    credit_cy = cy_credit_sales if cy_credit_sales != 0 else cy_revenue
-    credit_py = py_credit_sales if py_credit_sales != 0 else py_revenue
+    if section == "altman":
+        return float(v["z_cy"][0]), float(v["z_py"][0])
 
-    avg_inventory    = avg(cy_inventory,    py_inventory)
-    avg_receivables  = avg(cy_receivables,  py_receivables)
-    avg_payables     = avg(cy_payables,     py_payables)
-    avg_equity       = avg(cy_equity,       py_equity)
-    avg_total_assets = avg(cy_total_assets, py_total_assets)
+    if section == "red_flags":
+        view = current_view(v)
+        return red_flags.company_flags(v["red_flags"], view)
+
+    raise KeyError(section)
+
+
+st.markdown("---")
+run = st.button("🚀 Run Full Analysis", type="primary", use_container_width=True)
 
-    working_capital = cy_current_assets - cy_current_liab
-    py_wc           = py_current_assets - py_current_liab
+entered = inputs  # as typed, before any currency restatement
+if report_in is not None:
+    try:
+        factor = fx_table.factors(currency.split()[0], report_in.split()[0], fx_date)
+    except KeyError as e:
+        st.error(f"Cannot convert to {report_in}: {e.args[0]}")
+        st.stop()
+    inputs = to_statements(fx.convert(inputs, factor))
+    curr_sym = report_in.split("(")[1].replace(")", "").strip()
+    st.caption(f"💱 Amounts restated from {currency} into {report_in} at {float(factor):.6g} "
+               f"(rates as of {fx_date})")
+
+# Results stay on screen across reruns for as long as the inputs match the
+# last analysed set (with live what-if on, every edit is analysed). Any
+# analysis seen before, by any session, is a cache hit; otherwise only the
+# ratios and sections downstream of the edited inputs are recomputed.
+analysis_key = input_key(inputs, industry=industry, currency=currency, report_in=report_in)
+if run or (live_updates and "analysed_key" in st.session_state):
+    st.session_state["analysed_key"] = analysis_key
+
+cache_hit = None
+analysis = None
+if st.session_state.get("analysed_key") == analysis_key:
+    with profiler.section("Compute"):
+        analysis = get_result_cache().get(analysis_key)
+        cache_hit = analysis is not None
+        if analysis is None:
+            # The engine is only brought up to date on a miss; after a hit the
+            # sections on screen are not its own, so none of them are reused
+            engine = st.session_state.setdefault("incremental", IncrementalAnalysis())
+            changed = engine.update(inputs, context=curr_sym, industry=industry)
+            previous = {} if st.session_state.get("engine_behind") else st.session_state.get("analysis", {})
+            stale = engine.stale_sections(changed)
+            analysis = {
+                section: previous[section] if section in previous and section not in stale
+                         else build_section(section, engine.values, curr_sym)
+                for section in SECTIONS
+            }
+            get_result_cache().put(analysis_key, analysis)
+        st.session_state["engine_behind"] = cache_hit
+        st.session_state["analysis"] = analysis
+
+    if run and company_name:
+        # Results are kept only in the entered currency, which is what reopening restores
+        flags, _ = analysis["red_flags"]
+        get_history(HISTORY_PATH).save(
+            company_name, period, industry, currency, entered,
+            analysis if report_in is None else None,
+            z_cy=analysis["altman"][0], critical=sum("Critical" in sev for sev, _ in flags),
+        )
+        st.toast(f"💾 Saved {company_name} {period}".strip())
+
+if analysis is not None:
+
+    z_cy, z_py = analysis["altman"]
 
     # ======================================================
     # 1️⃣  RATIO ANALYSIS
     # ======================================================
 
-    st.markdown('<div class="section-header">📊 Ratio Analysis</div>', unsafe_allow_html=True)
-
-    # --- Profitability ---
-    roce_cy = pct(cy_ebit, cy_total_assets - cy_current_liab)
-    roe_cy  = pct(cy_pat, avg_equity)
-    roa_cy  = pct(cy_pat, avg_total_assets)
-    gpm_cy  = pct(cy_gross_profit, cy_revenue)
-    npm_cy  = pct(cy_pat, cy_revenue)
-    ebitda_m_cy = pct(cy_ebitda, cy_revenue)
-
-    roce_py = pct(py_ebit, py_total_assets - py_current_liab)
-    roe_py  = pct(py_pat, py_equity)
-    roa_py  = pct(py_pat, py_total_assets)
-    gpm_py  = pct(py_gross_profit, py_revenue)
-    npm_py  = pct(py_pat, py_revenue)
-    ebitda_m_py = pct(py_ebitda, py_revenue)
-
-    # --- Liquidity ---
-    cr_cy     = safe_div(cy_current_assets, cy_current_liab)
-    qr_cy     = safe_div(cy_current_assets - cy_inventory, cy_current_liab)
-    cash_r_cy = safe_div(cy_cash, cy_current_liab)
-    cr_py     = safe_div(py_current_assets, py_current_liab)
-    qr_py     = safe_div(py_current_assets - py_inventory, py_current_liab)
-    cash_r_py = safe_div(py_cash, py_current_liab)
-
-    # --- Leverage ---
-    de_cy   = safe_div(cy_total_debt, cy_equity)
-    gear_cy = pct(cy_lt_debt, cy_lt_debt + cy_equity)
-    ic_cy   = safe_div(cy_ebit, cy_interest)
-    de_py   = safe_div(py_total_debt, py_equity)
-    gear_py = pct(py_lt_debt, py_lt_debt + py_equity)
-    ic_py   = safe_div(py_ebit, py_interest)
-
-    # --- Efficiency ---
-    inv_turn_cy = safe_div(cy_cogs, avg_inventory)
-    inv_days_cy = safe_div(avg_inventory, cy_cogs) * 365
-    rec_days_cy = safe_div(avg_receivables, credit_cy) * 365
-    pay_days_cy = safe_div(avg_payables, cy_cogs) * 365
-    wcc_cy      = inv_days_cy + rec_days_cy - pay_days_cy
-    at_cy       = safe_div(cy_revenue, cy_total_assets)
-    fat_cy      = safe_div(cy_revenue, cy_net_ppe)
-
-    inv_turn_py = safe_div(py_cogs, avg(py_inventory, 0))
-    inv_days_py = safe_div(py_inventory, py_cogs) * 365
-    rec_days_py = safe_div(py_receivables, credit_py) * 365
-    pay_days_py = safe_div(py_payables, py_cogs) * 365
-    wcc_py      = inv_days_py + rec_days_py - pay_days_py
-    at_py       = safe_div(py_revenue, py_total_assets)
-    fat_py      = safe_div(py_revenue, py_net_ppe)
-
-    # --- Cash Flow ---
-    ocf_cl_cy   = safe_div(cy_ocf, cy_current_liab)
-    ocf_np_cy   = safe_div(cy_ocf, cy_pat)
-    ccr_cy      = safe_div(cy_ocf, cy_ebitda)
-    cfo_debt_cy = safe_div(cy_ocf, cy_total_debt)
-    ocf_cl_py   = safe_div(py_ocf, py_current_liab)
-    ocf_np_py   = safe_div(py_ocf, py_pat)
-    ccr_py      = safe_div(py_ocf, py_ebitda)
-    cfo_debt_py = safe_div(py_ocf, py_total_debt)
-
-    # --- Quality ---
-    eff_tax_cy  = pct(cy_tax, cy_pbt)
-    sga_s_cy    = pct(cy_sga, cy_revenue)
-    dep_rate_cy = pct(cy_depreciation, cy_gross_ppe)
-    accruals_cy = pct(cy_pat - cy_ocf, cy_total_assets)
-    eff_tax_py  = pct(py_tax, py_pbt)
-    sga_s_py    = pct(py_sga, py_revenue)
-    dep_rate_py = pct(py_depreciation, py_gross_ppe)
-    accruals_py = pct(py_pat - py_ocf, py_total_assets)
-
-    # --- Altman Z-Score ---
-    def altman(wc, ta, re, ebit, equity, tl, sales):
-        if ta == 0 or tl == 0:
-            return 0.0
-        return (1.2*(wc/ta) + 1.4*(re/ta) + 3.3*(ebit/ta) +
-                0.6*(equity/tl) + 1.0*(sales/ta))
-
-    z_cy = altman(working_capital, cy_total_assets, cy_retained,
-                  cy_ebit, cy_equity, cy_total_liab, cy_revenue)
-    z_py = altman(py_wc, py_total_assets, py_retained,
-                  py_ebit, py_equity, py_total_liab, py_revenue)
-
-    # --- Build ratio groups ---
-    ratio_groups = {
-        "📈 Profitability": {
-            "ROCE (%)":               (roce_cy,      roce_py),
-            "ROE (%)":                (roe_cy,       roe_py),
-            "ROA (%)":                (roa_cy,       roa_py),
-            "Gross Profit Margin (%)": (gpm_cy,      gpm_py),
-            "Net Profit Margin (%)":   (npm_cy,      npm_py),
-            "EBITDA Margin (%)":       (ebitda_m_cy, ebitda_m_py),
-        },
-        "💧 Liquidity": {
-            "Current Ratio":          (cr_cy,        cr_py),
-            "Quick Ratio":            (qr_cy,        qr_py),
-            "Cash Ratio":             (cash_r_cy,    cash_r_py),
-            "Working Capital (abs)":  (working_capital, py_wc),
-        },
-        "⚖️ Leverage": {
-            "Debt to Equity":         (de_cy,        de_py),
-            "Gearing Ratio (%)":      (gear_cy,      gear_py),
-            "Interest Coverage (x)":  (ic_cy,        ic_py),
-        },
-        "⚙️ Efficiency": {
-            "Inventory Turnover (x)":  (inv_turn_cy, inv_turn_py),
-            "Inventory Days":          (inv_days_cy, inv_days_py),
-            "Receivable Days":         (rec_days_cy, rec_days_py),
-            "Payable Days":            (pay_days_cy, pay_days_py),
-            "Working Capital Cycle":   (wcc_cy,      wcc_py),
-            "Asset Turnover (x)":      (at_cy,       at_py),
-            "Fixed Asset Turnover (x)":(fat_cy,      fat_py),
-        },
-        "💵 Cash Flow": {
-            "OCF Ratio":               (ocf_cl_cy,   ocf_cl_py),
-            "OCF to Net Profit":       (ocf_np_cy,   ocf_np_py),
-            "Cash Conversion Ratio":   (ccr_cy,      ccr_py),
-            "CFO to Total Debt":       (cfo_debt_cy, cfo_debt_py),
-        },
-        "🔬 Quality & Other": {
-            "Effective Tax Rate (%)":  (eff_tax_cy,  eff_tax_py),
-            "SG&A to Sales (%)":       (sga_s_cy,    sga_s_py),
-            "Depreciation Rate (%)":   (dep_rate_cy, dep_rate_py),
-            "Accruals to Assets (%)":  (accruals_cy, accruals_py),
-            "Altman Z-Score":          (z_cy,        z_py),
-        },
-    }
+    with profiler.section("Ratio Analysis"):
+        st.markdown('<div class="section-header">📊 Ratio Analysis</div>', unsafe_allow_html=True)
 
-    all_ratio_data = {}
-    for group_name, ratios in ratio_groups.items():
-        with st.expander(group_name, expanded=True):
-            df = pd.DataFrame(ratios, index=["Current Year", "Previous Year"]).T
-            df["Change"] = df["Current Year"] - df["Previous Year"]
-            df["Change %"] = df.apply(
-                lambda row: growth(row["Current Year"], row["Previous Year"]), axis=1
-            )
-            st.dataframe(
-                df.style
-                  .format("{:.2f}")
-                  .applymap(color_change, subset=["Change", "Change %"]),
-                use_container_width=True
-            )
-        all_ratio_data.update(ratios)
+        fmt = "{:.2f}"
+        if peers is not None:
+            peer_group, peer_count = peers.group(industry)
+            st.caption(f"Peer percentile: where the Current Year value ranks among {peer_count:,} "
+                       + (f"{industry} companies" if peer_group == industry else "companies (all industries)")
+                       + " — 0 lowest, 100 highest")
+            fmt = {c: "{:.2f}" for c in ("Current Year", "Previous Year", "Change", "Change %")}
+            fmt["Peer percentile"] = "{:.0f}"
+
+        for group_name, ratios in RATIO_GROUPS:
+            df = analysis[f"ratios:{group_name}"]
+            if peers is not None:
+                df = df.assign(**{"Peer percentile": peers.percentiles(
+                    industry, [key for key, _, _ in ratios], df["Current Year"].to_numpy())})
+            with st.expander(group_name, expanded=True):
+                render.show(df, fmt, ["Change", "Change %"], table_mode,
+                            use_container_width=True)
 
 
     # ======================================================
     # 2️⃣  HORIZONTAL ANALYSIS
     # ======================================================
 
-    st.markdown('<div class="section-header">📈 Horizontal Analysis (Year-on-Year %)</div>',
-                unsafe_allow_html=True)
-
-    horiz_items = {
-        "Revenue":             (cy_revenue,       py_revenue),
-        "Gross Profit":        (cy_gross_profit,  py_gross_profit),
-        "EBIT":                (cy_ebit,          py_ebit),
-        "Net Income / PAT":    (cy_pat,           py_pat),
-        "Total Assets":        (cy_total_assets,  py_total_assets),
-        "Total Liabilities":   (cy_total_liab,    py_total_liab),
-        "Equity":              (cy_equity,        py_equity),
-        "Operating Cash Flow": (cy_ocf,           py_ocf),
-        "Trade Receivables":   (cy_receivables,   py_receivables),
-        "Inventory":           (cy_inventory,     py_inventory),
-        "Total Debt":          (cy_total_debt,    py_total_debt),
-    }
+    with profiler.section("Horizontal Analysis"):
+        st.markdown('<div class="section-header">📈 Horizontal Analysis (Year-on-Year %)</div>',
+                    unsafe_allow_html=True)
 
-    horiz_rows = []
-    for item, (cy, py) in horiz_items.items():
-        g = growth(cy, py)
-        horiz_rows.append({
-            "Item": item,
-            f"Previous Year ({curr_sym})": py,
-            f"Current Year ({curr_sym})":  cy,
-            "Change (%)": round(g, 2),
-            "Trend": "▲" if g > 0 else ("▼" if g < 0 else "—"),
-        })
-
-    df_horiz = pd.DataFrame(horiz_rows)
-    st.dataframe(
-        df_horiz.style
-          .format({
-              f"Previous Year ({curr_sym})": "{:,.2f}",
-              f"Current Year ({curr_sym})":  "{:,.2f}",
-              "Change (%)": "{:.2f}",
-          })
-          .applymap(color_change, subset=["Change (%)"]),
-        use_container_width=True,
-        hide_index=True,
-    )
+        df_horiz = analysis["horizontal"]
+        period_cols = [f"{p} ({curr_sym})" for p in PERIOD_LABELS]
+        render.show(
+            df_horiz,
+            {**{c: "{:,.2f}" for c in period_cols}, "Change (%)": "{:.2f}"},
+            ["Change (%)"], table_mode,
+            use_container_width=True,
+            hide_index=True,
+        )
 
-    # Native bar chart for YoY growth
-    st.caption("📊 Year-on-Year Growth (%)")
-    chart_horiz = df_horiz.set_index("Item")[["Change (%)"]]
-    st.bar_chart(chart_horiz)
+        st.caption("📊 Year-on-Year Growth (%)")
+        charts.show({"Year-on-Year Growth (%)": df_horiz.set_index("Item")[["Change (%)"]]})
 
 
     # ======================================================
     # 3️⃣  VERTICAL ANALYSIS
     # ======================================================
 
-    st.markdown('<div class="section-header">📊 Vertical Analysis (Common Size)</div>',
-                unsafe_allow_html=True)
+    with profiler.section("Vertical Analysis"):
+        st.markdown('<div class="section-header">📊 Vertical Analysis (Common Size)</div>',
+                    unsafe_allow_html=True)
 
-    v_col1, v_col2 = st.columns(2)
+        v_col1, v_col2 = st.columns(2)
 
-    with v_col1:
-        st.subheader("Income Statement (% of Revenue)")
-        inc_vert = {
-            "Revenue":      (100.0,                            100.0),
-            "COGS":         (pct(cy_cogs,         cy_revenue), pct(py_cogs,         py_revenue)),
-            "Gross Profit": (pct(cy_gross_profit, cy_revenue), pct(py_gross_profit, py_revenue)),
-            "SG&A":         (pct(cy_sga,          cy_revenue), pct(py_sga,          py_revenue)),
-            "EBIT":         (pct(cy_ebit,         cy_revenue), pct(py_ebit,         py_revenue)),
-            "Interest":     (pct(cy_interest,     cy_revenue), pct(py_interest,     py_revenue)),
-            "Tax":          (pct(cy_tax,          cy_revenue), pct(py_tax,          py_revenue)),
-            "Net Income":   (pct(cy_pat,          cy_revenue), pct(py_pat,          py_revenue)),
-        }
-        df_inc_vert = pd.DataFrame(inc_vert, index=["CY %", "PY %"]).T
-        st.dataframe(df_inc_vert.style.format("{:.2f}"), use_container_width=True)
+        with v_col1:
+            st.subheader("Income Statement (% of Revenue)")
+            df_inc_vert, df_bs_vert = analysis["vertical"]
+            render.show(df_inc_vert, "{:.2f}", mode=table_mode, use_container_width=True)
 
-        st.caption("📊 Income Statement — Current Year %")
-        st.bar_chart(df_inc_vert[["CY %"]])
+        with v_col2:
+            st.subheader("Balance Sheet (% of Total Assets)")
+            render.show(df_bs_vert, "{:.2f}", mode=table_mode, use_container_width=True)
 
-    with v_col2:
-        st.subheader("Balance Sheet (% of Total Assets)")
-        bs_vert = {
-            "Cash":              (pct(cy_cash,           cy_total_assets), pct(py_cash,           py_total_assets)),
-            "Receivables":       (pct(cy_receivables,    cy_total_assets), pct(py_receivables,    py_total_assets)),
-            "Inventory":         (pct(cy_inventory,      cy_total_assets), pct(py_inventory,      py_total_assets)),
-            "Current Assets":    (pct(cy_current_assets, cy_total_assets), pct(py_current_assets, py_total_assets)),
-            "Net Fixed Assets":  (pct(cy_net_ppe,        cy_total_assets), pct(py_net_ppe,        py_total_assets)),
-            "Current Liab.":     (pct(cy_current_liab,   cy_total_assets), pct(py_current_liab,   py_total_assets)),
-            "Total Liabilities": (pct(cy_total_liab,     cy_total_assets), pct(py_total_liab,     py_total_assets)),
-            "Equity":            (pct(cy_equity,         cy_total_assets), pct(py_equity,         py_total_assets)),
-        }
-        df_bs_vert = pd.DataFrame(bs_vert, index=["CY %", "PY %"]).T
-        st.dataframe(df_bs_vert.style.format("{:.2f}"), use_container_width=True)
-
-        st.caption("📊 Balance Sheet — CY vs PY (%)")
-        st.bar_chart(df_bs_vert)
+        charts.show({
+            "📊 Income Statement — Current Year %": df_inc_vert[["CY %"]],
+            "📊 Balance Sheet — CY vs PY (%)":      df_bs_vert,
+        })
 
 
     # ======================================================
     # 4️⃣  TREND CHARTS
     # ======================================================
 
-    st.markdown('<div class="section-header">📉 Key Ratio Trends (CY vs PY)</div>',
-                unsafe_allow_html=True)
-
-    ch1, ch2 = st.columns(2)
-
-    with ch1:
-        st.caption("📊 Profitability Margins (%)")
-        df_prof = pd.DataFrame({
-            "Gross Margin %":   [gpm_py,      gpm_cy],
-            "Net Margin %":     [npm_py,      npm_cy],
-            "EBITDA Margin %":  [ebitda_m_py, ebitda_m_cy],
-            "ROE %":            [roe_py,      roe_cy],
-            "ROA %":            [roa_py,      roa_cy],
-        }, index=["Previous Year", "Current Year"])
-        st.bar_chart(df_prof)
-
-    with ch2:
-        st.caption("📊 Liquidity & Leverage Ratios")
-        df_lev = pd.DataFrame({
-            "Current Ratio": [cr_py,  cr_cy],
-            "Quick Ratio":   [qr_py,  qr_cy],
-            "Debt/Equity":   [de_py,  de_cy],
-            "Int. Coverage": [ic_py,  ic_cy],
-        }, index=["Previous Year", "Current Year"])
-        st.bar_chart(df_lev)
-
-    st.caption("📊 Working Capital Cycle — Days (CY vs PY)")
-    df_wcc = pd.DataFrame({
-        "Inventory Days":  [inv_days_py, inv_days_cy],
-        "Receivable Days": [rec_days_py, rec_days_cy],
-        "Payable Days":    [pay_days_py, pay_days_cy],
-    }, index=["Previous Year", "Current Year"])
-    st.bar_chart(df_wcc)
+    with profiler.section("Trend Charts"):
+        st.markdown('<div class="section-header">📉 Key Ratio Trends (CY vs PY)</div>',
+                    unsafe_allow_html=True)
+
+        charts.show({f"📊 {TREND_CAPTIONS[name]}": frame for name, frame in analysis["trends"].items()},
+                    columns=2)
 
 
     # ======================================================
     # 5️⃣  ALTMAN Z-SCORE
     # ======================================================
 
-    st.markdown('<div class="section-header">🧮 Altman Z-Score</div>', unsafe_allow_html=True)
+    with profiler.section("Altman Z-Score"):
+        st.markdown('<div class="section-header">🧮 Altman Z-Score</div>', unsafe_allow_html=True)
+
+        lbl_cy, col_cy = z_label(z_cy)
+        lbl_py, col_py = z_label(z_py)
+
+        z1, z2, z3 = st.columns(3)
+        z1.metric("Current Year Z-Score",  f"{z_cy:.2f}", delta=f"{z_cy - z_py:.2f} vs PY")
+        z2.metric("Previous Year Z-Score", f"{z_py:.2f}")
+        z3.markdown(f"**Interpretation:**")
+        z3.markdown(f"<span style='color:{col_cy};font-size:1.05rem;font-weight:700'>{lbl_cy}</span>",
+                    unsafe_allow_html=True)
+
+        st.caption("Zones: < 1.8 Danger | 1.8–2.7 Distress | 2.7–3.0 Caution | > 3.0 Safe")
+        charts.show({"Altman Z-Score": pd.DataFrame({"Z-Score": [z_py, z_cy]}, index=PERIOD_LABELS)},
+                    mark="line", rules=[(3.0, "Safe Threshold (3.0)", Z_ZONES[0][2]),
+                                        (1.8, "Danger Threshold (1.8)", Z_ZONES[-1][2])])
+
+        if st.checkbox("🎲 Simulate distress probability",
+                       help="Perturb the Current Year inputs to the Z-score and report how often "
+                            "each zone comes up"):
+            st.caption("Uncertainty — one standard deviation, % of the entered value")
+            u1, u2, u3, u4, u5 = st.columns(5)
+            uncertainty = {
+                "revenue":         u1.number_input("Revenue ±%", 0.0, 100.0, 10.0, step=1.0) / 100,
+                "ebit":            u2.number_input("EBIT ±%", 0.0, 100.0, 20.0, step=1.0) / 100,
+                "working_capital": u3.number_input("Working capital ±%", 0.0, 100.0, 15.0, step=1.0) / 100,
+                "total_liab":      u4.number_input("Liabilities ±%", 0.0, 100.0, 5.0, step=1.0) / 100,
+            }
+            draws = u5.selectbox("Draws", [100_000, 250_000, 1_000_000], format_func="{:,}".format)
+            seed = u5.number_input("Seed", 0, 2**31 - 1, 0, step=1)
+
+            sim = simulate_z(inputs, uncertainty, draws=draws, seed=int(seed))
+            for col, (_, label, _), p in zip(st.columns(len(Z_ZONES)), Z_ZONES, sim.probabilities):
+                col.metric(label, f"{p:.1%}")
+            st.caption(f"Z-score mean {sim.mean:.2f} (σ {sim.std:.2f}) over {sim.draws:,} draws; "
+                       f"entered statements give {sim.base:.2f}")
+            centres = (sim.bin_edges[:-1] + sim.bin_edges[1:]) / 2
+            charts.show({"Z-Score distribution": pd.DataFrame({"Share of draws (%)": sim.counts / sim.draws * 100},
+                                                              index=centres)},
+                        mark="bar", x_title="Z-Score", y_title="Share of draws (%)")
 
-    def z_label(z):
-        if z > 3.0:   return "✅ Safe Zone (> 3.0)",        "#38a169"
-        elif z > 2.7: return "🟡 Caution Zone (2.7–3.0)",  "#d69e2e"
-        elif z > 1.8: return "🟠 Distress Zone (1.8–2.7)", "#dd6b20"
-        else:         return "🔴 Danger Zone (< 1.8)",      "#e53e3e"
 
-    lbl_cy, col_cy = z_label(z_cy)
-    lbl_py, col_py = z_label(z_py)
+    # ======================================================
+    # 6️⃣  RED FLAG ENGINE
+    # ======================================================
 
-    z1, z2, z3 = st.columns(3)
-    z1.metric("Current Year Z-Score",  f"{z_cy:.2f}", delta=f"{z_cy - z_py:.2f} vs PY")
-    z2.metric("Previous Year Z-Score", f"{z_py:.2f}")
-    z3.markdown(f"**Interpretation:**")
-    z3.markdown(f"<span style='color:{col_cy};font-size:1.05rem;font-weight:700'>{lbl_cy}</span>",
-                unsafe_allow_html=True)
+    with profiler.section("Red Flags"):
+        st.markdown('<div class="section-header">🚨 Red Flag & Health Check</div>',
+                    unsafe_allow_html=True)
 
-    st.caption("Zones: < 1.8 Danger | 1.8–2.7 Distress | 2.7–3.0 Caution | > 3.0 Safe")
-    df_z = pd.DataFrame({
-        "Z-Score": [z_py, z_cy],
-        "Safe Threshold (3.0)": [3.0, 3.0],
-        "Danger Threshold (1.8)": [1.8, 1.8],
-    }, index=["Previous Year", "Current Year"])
-    st.line_chart(df_z)
+        flags, positives = analysis["red_flags"]
+
+        crit_flags = [f for f in flags if "Critical" in f[0]]
+        warn_flags = [f for f in flags if "Warning"  in f[0]]
+
+        fc1, fc2, fc3 = st.columns(3)
+        fc1.metric("🔴 Critical Issues", len(crit_flags))
+        fc2.metric("🟡 Warnings",        len(warn_flags))
+        fc3.metric("✅ Positives",       len(positives))
+
+        if crit_flags:
+            st.markdown("**Critical Issues:**")
+            for sev, msg in crit_flags:
+                st.error(f"{sev}: {msg}")
+
+        if warn_flags:
+            st.markdown("**Warnings:**")
+            for sev, msg in warn_flags:
+                st.warning(f"{sev}: {msg}")
+
+        if positives:
+            st.markdown("**Positive Signals:**")
+            for p in positives:
+                st.success(f"✅ {p}")
+
+        if not flags:
+            st.success("✅ No major red flags detected. Financial health looks solid.")
 
 
     # ======================================================
-    # 6️⃣  RED FLAG ENGINE
+    # 7️⃣  WHAT-IF SENSITIVITY
     # ======================================================
 
-    st.markdown('<div class="section-header">🚨 Red Flag & Health Check</div>',
-                unsafe_allow_html=True)
-
-    flags     = []
-    positives = []
-
-    rev_growth    = growth(cy_revenue,    py_revenue)
-    rec_growth    = growth(cy_receivables, py_receivables)
-    profit_growth = growth(cy_pat,        py_pat)
-    debt_growth   = growth(cy_total_debt, py_total_debt)
-
-    # Liquidity
-    if cr_cy < 1.0:
-        flags.append(("🔴 Critical", "Current Ratio below 1.0 — Cannot cover short-term obligations"))
-    elif cr_cy < 1.5:
-        flags.append(("🟡 Warning",  f"Current Ratio is low at {cr_cy:.2f} (target ≥ 1.5)"))
-    else:
-        positives.append(f"Current Ratio is healthy at {cr_cy:.2f}")
-
-    if qr_cy < 1.0:
-        flags.append(("🟡 Warning", f"Quick Ratio below 1.0 at {qr_cy:.2f} — Limited liquid assets"))
-
-    if working_capital < 0:
-        flags.append(("🔴 Critical", "Negative Working Capital — Serious liquidity risk"))
-
-    # Cash Flow
-    if cy_ocf < 0:
-        flags.append(("🔴 Critical", "Negative Operating Cash Flow — Business is burning cash from operations"))
-    elif cy_ocf > cy_pat:
-        positives.append("Operating Cash Flow exceeds Net Profit — Strong earnings quality")
-
-    if cy_ocf < cy_pat * 0.8 and cy_pat > 0:
-        flags.append(("🟡 Warning", "Operating CF significantly below Net Profit — Weak cash conversion or aggressive accounting"))
-
-    # Leverage
-    if de_cy > 3.0:
-        flags.append(("🔴 Critical", f"Debt-to-Equity at {de_cy:.2f} — Dangerously high leverage"))
-    elif de_cy > 2.0:
-        flags.append(("🟡 Warning",  f"Debt-to-Equity at {de_cy:.2f} — High leverage (target < 2.0)"))
-    else:
-        positives.append(f"Debt-to-Equity is manageable at {de_cy:.2f}")
-
-    if ic_cy < 1.5 and cy_interest > 0:
-        flags.append(("🔴 Critical", f"Interest Coverage of {ic_cy:.2f}x — At risk of defaulting on interest"))
-    elif ic_cy < 3.0 and cy_interest > 0:
-        flags.append(("🟡 Warning",  f"Interest Coverage of {ic_cy:.2f}x — Should be above 3.0x"))
-
-    # Revenue & receivables
-    if rec_growth > rev_growth + 15:
-        flags.append(("🟡 Warning", f"Receivables growing ({rec_growth:.1f}%) faster than Revenue ({rev_growth:.1f}%) — Potential collection issues"))
-
-    if rev_growth > 0 and profit_growth < 0:
-        flags.append(("🟡 Warning", "Revenue growing but profits declining — Margin compression or cost overruns"))
-
-    if debt_growth > rev_growth + 20:
-        flags.append(("🟡 Warning", f"Debt growing ({debt_growth:.1f}%) much faster than Revenue ({rev_growth:.1f}%)"))
-
-    # Profitability
-    if npm_cy < 0:
-        flags.append(("🔴 Critical", "Negative Net Profit Margin — Company is loss-making"))
-    elif npm_cy < 5:
-        flags.append(("🟡 Warning",  f"Net Profit Margin very thin at {npm_cy:.1f}%"))
-
-    # Accruals
-    if abs(accruals_cy) > 5:
-        flags.append(("🟡 Warning", f"High Accruals-to-Assets ({accruals_cy:.1f}%) — Earnings quality concern"))
-
-    # Altman
-    if z_cy < 1.8:
-        flags.append(("🔴 Critical", f"Altman Z-Score {z_cy:.2f} — High bankruptcy risk"))
-    elif z_cy < 2.7:
-        flags.append(("🟡 Warning",  f"Altman Z-Score {z_cy:.2f} — In financial distress zone"))
-    elif z_cy > 3.0:
-        positives.append(f"Altman Z-Score {z_cy:.2f} — Company is in the safe zone")
-
-    if npm_cy > npm_py and rev_growth > 0:
-        positives.append("Profit margin improving alongside revenue growth — Quality performance")
-
-    crit_flags = [f for f in flags if "Critical" in f[0]]
-    warn_flags = [f for f in flags if "Warning"  in f[0]]
-
-    fc1, fc2, fc3 = st.columns(3)
-    fc1.metric("🔴 Critical Issues", len(crit_flags))
-    fc2.metric("🟡 Warnings",        len(warn_flags))
-    fc3.metric("✅ Positives",       len(positives))
-
-    if crit_flags:
-        st.markdown("**Critical Issues:**")
-        for sev, msg in crit_flags:
-            st.error(f"{sev}: {msg}")
-
-    if warn_flags:
-        st.markdown("**Warnings:**")
-        for sev, msg in warn_flags:
-            st.warning(f"{sev}: {msg}")
-
-    if positives:
-        st.markdown("**Positive Signals:**")
-        for p in positives:
-            st.success(f"✅ {p}")
-
-    if not flags:
-        st.success("✅ No major red flags detected. Financial health looks solid.")
+    with profiler.section("What-if Sensitivity"):
+        st.markdown('<div class="section-header">🎛️ What-if Sensitivity</div>', unsafe_allow_html=True)
+
+        if st.checkbox("Show sensitivity grid",
+                       help="Vary one or two Current Year inputs over a grid of changes and see "
+                            "every grid point at once"):
+            line_labels = dict(LINE_ITEMS)
+            metric_labels = {"z": RATIO_LABELS["z"],
+                             **{k: v for k, v in RATIO_LABELS.items() if k != "z"},
+                             "critical_count": "Critical red flags"}
+
+            s1, s2, s3 = st.columns(3)
+            line_x = s1.selectbox("Vary", LINE_KEYS, index=LINE_KEYS.index("revenue"),
+                                  format_func=line_labels.get)
+            span_x = s1.slider("Range ± (%)", 5, 100, 30, step=5, key="what_if_span_x")
+            line_y = s2.selectbox("Against", [None, *LINE_KEYS], index=1 + LINE_KEYS.index("cogs"),
+                                  format_func=lambda k: "— none —" if k is None else line_labels[k])
+            span_y = s2.slider("Range ± (%)", 5, 100, 20, step=5, key="what_if_span_y")
+            steps = s3.slider("Points per axis", 11, 201, 41, step=10)
+            metric = s3.selectbox("Show", list(metric_labels), format_func=metric_labels.get)
+
+            axes = [axis(line_x, span_x / 100, steps)]
+            if line_y is not None and line_y != line_x:
+                axes.append(axis(line_y, span_y / 100, steps))
+            column = metric if metric == "critical_count" else f"{metric}_cy"
+            grid = sensitivity(inputs, *axes, industry=industry)
+            df_grid = grid_frame(grid, axes, [column])
+
+            st.caption(f"{metric_labels[metric]} over "
+                       + " × ".join(f"{line_labels[a.line]} ±{abs(a.changes[0]) * 100:.0f}%" for a in axes)
+                       + " (subtotals that include a varied line move with it)")
+            if len(axes) == 1:
+                charts.show({metric_labels[metric]: df_grid.set_index(line_x)[[column]]}, mark="line",
+                            x_title=f"{line_labels[line_x]} change (%)", y_title=metric_labels[metric])
+            else:
+                if metric == "z":
+                    # coloured by Altman zone, danger to safe
+                    color_scale = {"type": "threshold",
+                                   "domain": [bound for bound, _, _ in Z_ZONES[-2::-1]],
+                                   "range": [colour for _, _, colour in Z_ZONES[::-1]]}
+                else:
+                    color_scale = {"scheme": "reds" if metric == "critical_count" else "viridis"}
+                st.vega_lite_chart(df_grid, {
+                    "mark": "rect",
+                    "encoding": {
+                        "x": {"field": line_x, "type": "ordinal", "title": f"{line_labels[line_x]} change (%)",
+                              "axis": {"format": ".0f", "labelOverlap": True}},
+                        "y": {"field": line_y, "type": "ordinal", "title": f"{line_labels[line_y]} change (%)",
+                              "sort": "descending", "axis": {"format": ".0f", "labelOverlap": True}},
+                        "color": {"field": column, "type": "quantitative",
+                                  "title": metric_labels[metric], "scale": color_scale},
+                        "tooltip": [{"field": line_x, "format": ".1f"}, {"field": line_y, "format": ".1f"},
+                                    {"field": column, "format": ".2f"}],
+                    },
+                }, use_container_width=True)
+
+
+profile = profiler.finish(
+    session=st.session_state.setdefault("profile_session", os.urandom(4).hex()),
+    analysed=analysis is not None,
+    cache_hit=cache_hit,
+    live=live_updates,
+)
+if profile:
+    with st.expander("🛠 Profiling", expanded=False):
+        st.caption(f"Script run: {profile['total_ms']:.1f} ms (server side; browser rendering not included)")
+        if profile["sections"]:
+            st.dataframe(pd.DataFrame(profile["sections"]).set_index("section"), use_container_width=True)
+        else:
+            st.caption("Run the analysis to time its sections.")
@@ -0,0 +1,157 @@
+"""
+Process-pool execution of the batch analysis.
+
+Each input chunk's statement columns are copied once into a shared-memory
+block; a worker attaches to it, runs ``ratio_engine.analyse`` (ratios,
+Altman Z-score and red flags) and writes every result column into a second
+shared-memory block laid out in advance, so no DataFrame or result array is
+ever pickled between processes. Results come back in input order whatever
+order the workers finish in, and at most ``2 * workers`` chunks are in
+flight, so memory stays bounded on any input size.
+"""
+
+import os
+from collections import deque
+from multiprocessing import get_all_start_methods, get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from ratio_engine import LINE_KEYS, PERIODS, analyse
+
+
+INPUT_COLUMNS = tuple(f"{k}_{p}" for k in LINE_KEYS for p in PERIODS)
+
+
+def _result_layout():
+    # (name, dtype) of every output column that is not an input line, in
+    # ``analyse`` order; dtypes do not depend on the data
+    sample = analyse({c: np.zeros(1) for c in INPUT_COLUMNS})
+    return tuple((k, np.asarray(v).dtype) for k, v in sample.items() if k not in INPUT_COLUMNS)
+
+RESULT_LAYOUT = _result_layout()
+
+
+def _offsets(rows):
+    # Byte offset of each result column in the output block, 8-byte aligned
+    offsets, size = [], 0
+    for _, dtype in RESULT_LAYOUT:
+        offsets.append(size)
+        size += -(-rows * dtype.itemsize // 8) * 8
+    return offsets, max(size, 1)
+
+
+def _column_views(buf, rows, offsets):
+    return {
+        name: np.ndarray((rows,), dtype=dtype, buffer=buf, offset=off)
+        for (name, dtype), off in zip(RESULT_LAYOUT, offsets)
+    }
+
+
+def _analyse_into(src, dst, rows, industry):
+    lines = np.ndarray((len(INPUT_COLUMNS), rows), dtype=np.float64, buffer=src)
+    if industry is not None:
+        names, codes = industry
+        industry = np.asarray(names)[codes]
+    results = analyse(dict(zip(INPUT_COLUMNS, lines)), industry=industry)
+    views = _column_views(dst, rows, _offsets(rows)[0])
+    for name in views:
+        views[name][:] = results[name]
+
+def _analyse_shared(task):
+    # Worker: inputs from one shared block, results into another. Every array
+    # viewing the blocks lives in _analyse_into, so they are gone before close().
+    in_name, out_name, rows, industry = task
+    src, dst = SharedMemory(name=in_name), SharedMemory(name=out_name)
+    try:
+        _analyse_into(src.buf, dst.buf, rows, industry)
+    finally:
+        src.close()
+        dst.close()
+    return rows
+
+
+def _fill_lines(buf, chunk):
+    lines = np.ndarray((len(INPUT_COLUMNS), chunk.num_rows), dtype=np.float64, buffer=buf)
+    columns = set(chunk.column_names)
+    for i, col in enumerate(INPUT_COLUMNS):
+        lines[i] = chunk.column(col).to_numpy(zero_copy_only=False) if col in columns else 0.0
+
+def _results_table(buf, chunk):
+    import pyarrow as pa
+    rows = chunk.num_rows
+    out = {c: chunk.column(c) for c in chunk.column_names if c not in INPUT_COLUMNS}
+    views = _column_views(buf, rows, _offsets(rows)[0])
+    # copy out: the block is unlinked as soon as this chunk is done
+    out.update((name, pa.array(np.array(view))) for name, view in views.items())
+    return pa.table(out)
+
+def _release(*blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+class ParallelExecutor:
+    """Run ``analyse`` over Arrow chunks on a process pool, yielding result tables in order.
+
+    ``workers`` defaults to the machine's core count. Chunk size is set by
+    whoever produces the chunks (``batch.read_chunks``); each chunk is one
+    task, so use several chunks per worker for even load.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+
+    def __enter__(self):
+        # fork keeps the engine imported in the parent; spawn would re-import it per worker
+        method = "fork" if "fork" in get_all_start_methods() else None
+        # Workers must share our resource tracker: one of their own would
+        # unlink blocks still in use when the worker exits
+        resource_tracker.ensure_running()
+        self.pool = get_context(method).Pool(self.workers)
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0]:
+            self.pool.terminate()
+        else:
+            self.pool.close()
+        self.pool.join()
+
+    def _submit(self, chunk):
+        rows = chunk.num_rows
+        src = SharedMemory(create=True, size=max(len(INPUT_COLUMNS) * rows * 8, 1))
+        _fill_lines(src.buf, chunk)
+
+        industry = None
+        if "industry" in chunk.column_names:
+            encoded = (chunk.column("industry").cast("string").fill_null("")
+                       .dictionary_encode().combine_chunks())
+            industry = (encoded.dictionary.to_pylist(), encoded.indices.to_numpy(zero_copy_only=False))
+
+        dst = SharedMemory(create=True, size=_offsets(rows)[1])
+        job = self.pool.apply_async(_analyse_shared, ((src.name, dst.name, rows, industry),))
+        return chunk, src, dst, job
+
+    def _collect(self, chunk, src, dst, job):
+        try:
+            job.get()
+            return _results_table(dst.buf, chunk)
+        finally:
+            _release(src, dst)
+
+    def map(self, chunks):
+        """Yield the result table of each chunk of ``chunks``, in order."""
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(self._submit(chunk))
+                if len(pending) >= 2 * self.workers:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            for _, src, dst, _ in pending:
+                _release(src, dst)
@@ -0,0 +1,253 @@
+"""
+Peer-group percentiles.
+
+Places a company's ratios within its industry across the whole analysed
+universe. The universe is summarised by one mergeable quantile sketch per
+(industry, ratio), plus an all-industries sketch per ratio, built chunk by
+chunk as ``batch.py`` analyses its input (``--peers peers.npz``). Sketches
+from separate runs merge, so a universe can be built in pieces:
+
+    python batch.py statements.parquet results.parquet --peers peers.npz
+    python peers.py build results.parquet peers.npz       # from earlier output
+    python peers.py merge peers_eu.npz peers_us.npz -o peers.npz
+
+A sketch is a merging t-digest: at most about ``compression / 2`` weighted
+centroids, finest in the tails, whatever the number of values seen. A
+percentile lookup interpolates in that fixed-size table, so its cost does
+not grow with the universe and nothing is sorted at query time.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from ratio_engine import RATIOS
+
+
+ALL = "(all)"       # peer group of every company, whatever its industry
+MIN_PEERS = 30      # smaller industry groups fall back to ALL
+
+
+# --------------------------------------------------
+# Sketch
+# --------------------------------------------------
+
+class QuantileSketch:
+    """Mergeable quantile sketch (merging t-digest with the arcsine scale)."""
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min, self.max = np.inf, -np.inf
+        self._table = None
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        """Add a batch of values; non-finite values are ignored."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size:
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress(np.sort(values), np.ones(values.size))
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch."""
+        if other.weights.size:
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+            self._compress(other.means, other.weights)
+        return self
+
+    def _compress(self, means, weights):
+        # ``means`` is sorted; slot the (few, sorted) existing centroids into it
+        at = np.searchsorted(means, self.means)
+        m, w = np.insert(means, at, self.means), np.insert(weights, at, self.weights)
+        cum = np.cumsum(w)
+        q = (cum - w / 2) / cum[-1]
+        # Centroids whose mid-quantile falls in the same unit of k(q) merge;
+        # k is steep near 0 and 1, so the tails keep small centroids
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+        groups = np.concatenate(([0], np.cumsum(k[1:] != k[:-1])))  # k is non-decreasing
+        self.weights = np.bincount(groups, w)
+        self.means = np.bincount(groups, w * m) / self.weights
+        self._table = None
+
+    def _lookup(self):
+        if self._table is None:
+            cum = np.cumsum(self.weights)
+            q = (cum - self.weights / 2) / cum[-1]
+            self._table = (np.concatenate(([self.min], self.means, [self.max])),
+                           np.concatenate(([0.0], q, [1.0])))
+        return self._table
+
+    def cdf(self, x):
+        """Estimated fraction of values at or below ``x`` (NaN for an empty sketch)."""
+        if not self.weights.size:
+            return np.full(np.shape(x), np.nan)
+        xs, qs = self._lookup()
+        return np.interp(x, xs, qs)
+
+    def quantile(self, q):
+        """Estimated ``q``-quantile (``0 <= q <= 1``)."""
+        if not self.weights.size:
+            return np.full(np.shape(q), np.nan)
+        xs, qs = self._lookup()
+        return np.interp(q, qs, xs)
+
+
+# --------------------------------------------------
+# Peer groups
+# --------------------------------------------------
+
+def _column_names(table):
+    names = getattr(table, "column_names", None)
+    return set(names if names is not None else table.keys())
+
+def _industry_groups(industry):
+    # (name, row indices) per industry; nulls and "" belong to no industry
+    if industry is None:
+        return []
+    if np.ndim(industry) == 0:
+        return [(str(industry), slice(None))] if industry else []
+    industry = np.asarray(industry, dtype=object)
+    valid = np.flatnonzero((industry != None) & (industry != ""))  # noqa: E711 (element-wise)
+    names, codes = np.unique(industry[valid].astype(str), return_inverse=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return [(name, valid[order[bounds[i]:bounds[i + 1]]]) for i, name in enumerate(names)]
+
+
+class PeerBenchmarks:
+    """Quantile sketches of every Current Year ratio, per industry and overall."""
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.sketches = {}
+        self.sizes = {}      # group -> companies: the largest count of its sketches
+
+    def sketch(self, group, ratio):
+        key = (group, ratio)
+        if key not in self.sketches:
+            self.sketches[key] = QuantileSketch(self.compression)
+        return self.sketches[key]
+
+    def _counted(self, group, sketch):
+        # Keep ``sizes`` current after ``sketch`` (of ``group``) grew
+        if sketch.count > self.sizes.get(group, 0):
+            self.sizes[group] = sketch.count
+
+    def update(self, results, industry=None):
+        """Add a chunk of analysis results (``analyse`` output or a batch results table).
+
+        ``industry`` (one name, or one per row) defaults to the table's
+        ``industry`` column if it has one.
+        """
+        columns = _column_names(results)
+        if industry is None and "industry" in columns:
+            industry = np.asarray(results["industry"], dtype=object)
+        groups = None
+        for ratio in RATIOS:
+            if f"{ratio}_cy" not in columns:
+                continue
+            values = np.asarray(results[f"{ratio}_cy"], dtype=np.float64)
+            if groups is None:
+                groups = _industry_groups(industry)
+            self._counted(ALL, self.sketch(ALL, ratio).update(values))
+            for name, rows in groups:
+                self._counted(name, self.sketch(name, ratio).update(values[rows]))
+        return self
+
+    def merge(self, other):
+        """Fold another universe's sketches into this one."""
+        for (group, ratio), sketch in other.sketches.items():
+            self._counted(group, self.sketch(group, ratio).merge(sketch))
+        return self
+
+    def group(self, industry):
+        """``(name, companies)`` of the peer group ``industry`` is ranked against."""
+        for name in (industry, ALL):
+            size = self.sizes.get(name, 0)
+            if size >= MIN_PEERS or name == ALL:
+                return name, int(size)
+
+    def percentiles(self, industry, ratios, values):
+        """Percentile (0-100) of each value among ``industry`` peers; NaN where there are none."""
+        name, _ = self.group(industry)
+        out = np.full(len(ratios), np.nan)
+        for i, (ratio, value) in enumerate(zip(ratios, values)):
+            sketch = self.sketches.get((name, ratio))
+            if sketch is not None and sketch.count:
+                out[i] = 100 * sketch.cdf(value)
+        return out
+
+    def save(self, path):
+        keys = sorted(self.sketches)
+        sketches = [self.sketches[k] for k in keys]
+        np.savez_compressed(
+            path,
+            compression=self.compression,
+            groups=np.array([g for g, _ in keys], dtype=str),
+            ratios=np.array([r for _, r in keys], dtype=str),
+            sizes=np.array([s.means.size for s in sketches], dtype=np.int64),
+            means=np.concatenate([s.means for s in sketches]) if sketches else np.empty(0),
+            weights=np.concatenate([s.weights for s in sketches]) if sketches else np.empty(0),
+            bounds=np.array([(s.min, s.max) for s in sketches]).reshape(-1, 2),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            peers = cls(int(f["compression"]))
+            offsets = np.concatenate(([0], np.cumsum(f["sizes"])))
+            for i, (group, ratio) in enumerate(zip(f["groups"], f["ratios"])):
+                sketch = peers.sketch(str(group), str(ratio))
+                sketch.means = f["means"][offsets[i]:offsets[i + 1]]
+                sketch.weights = f["weights"][offsets[i]:offsets[i + 1]]
+                sketch.min, sketch.max = (float(b) for b in f["bounds"][i])
+                peers._counted(str(group), sketch)
+        return peers
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or merge peer-group percentile sketches.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="sketch the ratios of batch results")
+    build.add_argument("results", help="CSV or Parquet output of batch.py")
+    build.add_argument("peers", help="sketch file to write (.npz)")
+    build.add_argument("--chunk-size", type=int, default=100_000)
+    build.add_argument("--compression", type=int, default=200)
+
+    merge = sub.add_parser("merge", help="merge sketch files")
+    merge.add_argument("inputs", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        from batch import read_chunks
+        peers, rows = PeerBenchmarks(args.compression), 0
+        for chunk in read_chunks(args.results, args.chunk_size):
+            peers.update(chunk)
+            rows += chunk.num_rows
+        peers.save(args.peers)
+        print(f"Sketched {rows:,} companies -> {args.peers}", file=sys.stderr)
+    else:
+        peers = PeerBenchmarks.load(args.inputs[0])
+        for path in args.inputs[1:]:
+            peers.merge(PeerBenchmarks.load(path))
+        peers.save(args.output)
+        print(f"Merged {len(args.inputs)} files -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Opt-in per-section profiling for the page.
+
+``SectionProfiler`` records wall time and peak Python allocations
+(``tracemalloc``) for each named section of one script run. Sections must
+not nest: the allocation peak is reset at the start of each one. Times are
+the server-side cost of a section — computing, building frames and Stylers,
+serialising elements — not browser rendering.
+
+``tracemalloc`` is process-wide, shared by every session on the server, so
+tracing is on only while some section is running: the first section to
+start switches it on, the last to finish switches it off (however the
+script run ends — ``st.stop()``, a rerun or an exception). A peak is only
+recorded for a section no other session's section overlapped; otherwise
+``peak_kib`` is left out rather than mixing in their allocations.
+
+Each profiled run is also logged as one JSON line on the
+``ratio_analysis.profile`` logger (to the file named by
+``RATIO_PROFILE_LOG``, else stderr), so runs can be aggregated across
+sessions:
+
+    python profiling.py profile.jsonl      # p50 / p99 per section
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+LOGGER = logging.getLogger("ratio_analysis.profile")
+
+
+def _configure_logger():
+    if LOGGER.handlers:
+        return
+    path = os.environ.get("RATIO_PROFILE_LOG")
+    handler = logging.FileHandler(path) if path else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False
+
+
+# Shared tracing state, guarded by _LOCK
+_LOCK = threading.Lock()
+_active = 0      # sections tracing right now, across sessions
+_started = 0     # sections ever started: a change means another one overlapped
+_owned = False   # tracing was switched on here, so it is switched off here
+
+
+def _begin():
+    # Start tracing for one section: (token if it runs alone, else None, traced bytes now)
+    global _active, _started, _owned
+    with _LOCK:
+        if _active == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owned = True
+        _active += 1
+        _started += 1
+        alone = _active == 1
+        if alone:
+            tracemalloc.reset_peak()
+        return (_started if alone else None), tracemalloc.get_traced_memory()[0]
+
+
+def _end(token):
+    # Finish one section's tracing: the peak traced bytes if it ran alone, else None
+    global _active, _owned
+    with _LOCK:
+        peak = tracemalloc.get_traced_memory()[1] if token == _started and _active == 1 else None
+        _active -= 1
+        if _active == 0 and _owned:
+            tracemalloc.stop()
+            _owned = False
+        return peak
+
+
+class SectionProfiler:
+    """Wall time and peak allocations per section of one run; a no-op unless ``enabled``."""
+
+    def __init__(self, enabled=True, memory=True):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.records = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        if self.memory:
+            token, base = _begin()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {"section": name, "wall_ms": round((time.perf_counter() - start) * 1e3, 3)}
+            if self.memory:
+                peak = _end(token)
+                if peak is not None:
+                    record["peak_kib"] = round((peak - base) / 1024, 1)
+            self.records.append(record)
+
+    def finish(self, **context):
+        """Close the run: log it as JSON and return the logged record."""
+        if not self.enabled:
+            return None
+        event = {
+            "event": "page_profile",
+            "ts": round(time.time(), 3),
+            "total_ms": round((time.perf_counter() - self._start) * 1e3, 3),
+            **context,
+            "sections": self.records,
+        }
+        _configure_logger()
+        LOGGER.info(json.dumps(event, default=str))
+        return event
+
+
+# --------------------------------------------------
+# Aggregation across runs
+# --------------------------------------------------
+
+def summarise(lines, percentiles=(50, 99)):
+    """``{section: {"runs": n, "wall_ms_p50": ..., "peak_kib_p99": ...}}`` from JSON log lines."""
+    import numpy as np
+    samples = {}
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if event.get("event") != "page_profile":
+            continue
+        samples.setdefault("(total)", {"wall_ms": [], "peak_kib": []})["wall_ms"].append(event["total_ms"])
+        for record in event["sections"]:
+            s = samples.setdefault(record["section"], {"wall_ms": [], "peak_kib": []})
+            s["wall_ms"].append(record["wall_ms"])
+            if "peak_kib" in record:
+                s["peak_kib"].append(record["peak_kib"])
+
+    out = {}
+    for section, values in samples.items():
+        row = {"runs": len(values["wall_ms"])}
+        for metric, xs in values.items():
+            for p in percentiles:
+                row[f"{metric}_p{p}"] = float(np.percentile(xs, p)) if xs else None
+        out[section] = row
+    return out
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarise page profile logs (JSON lines).")
+    parser.add_argument("logs", nargs="+", help="files written via RATIO_PROFILE_LOG")
+    args = parser.parse_args(argv)
+
+    lines = []
+    for path in args.logs:
+        with open(path) as f:
+            lines.extend(f)
+    summary = summarise(lines)
+    print(f"{'section':<24} {'runs':>6} {'p50 ms':>10} {'p99 ms':>10} {'p50 KiB':>10} {'p99 KiB':>10}")
+    for section, row in summary.items():
+        cells = [row["wall_ms_p50"], row["wall_ms_p99"], row["peak_kib_p50"], row["peak_kib_p99"]]
+        print(f"{section:<24} {row['runs']:>6} "
+              + " ".join(f"{c:>10.1f}" if c is not None else f"{'-':>10}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
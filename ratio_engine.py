@@ -0,0 +1,591 @@
+"""
+Vectorised ratio engine.
+
+Computes every ratio shown on the Streamlit page for N companies at once.
+Input is a columnar table (dict of arrays, DataFrame, Arrow table or
+structured array) whose columns follow the page's widget keys, e.g.
+``revenue_cy`` / ``revenue_py``. Missing columns are treated as 0, the same
+default the input widgets use.
+
+The module has no UI dependencies and imports only NumPy at load time;
+pandas is imported by the DataFrame views on first use, so batch workers
+and services start without paying for it.
+"""
+
+import inspect
+
+import numpy as np
+
+import red_flags
+
+
+# --------------------------------------------------
+# Statement schema
+# --------------------------------------------------
+
+LINE_ITEMS = (
+    # Income statement
+    ("revenue",        "Revenue / Sales"),
+    ("cogs",           "Cost of Goods Sold (COGS)"),
+    ("gross",          "Gross Profit"),
+    ("ebitda",         "EBITDA"),
+    ("ebit",           "EBIT"),
+    ("interest",       "Finance Cost / Interest Expense"),
+    ("tax",            "Tax Expense"),
+    ("pbt",            "Profit Before Tax (PBT)"),
+    ("pat",            "Profit After Tax (PAT) / Net Income"),
+    ("sga",            "SG&A Expenses"),
+    ("depreciation",   "Depreciation Expense"),
+    # Balance sheet
+    ("cash",           "Cash & Bank Balances"),
+    ("receivables",    "Trade Receivables"),
+    ("inventory",      "Inventory"),
+    ("current_assets", "Total Current Assets"),
+    ("total_assets",   "Total Assets"),
+    ("gross_ppe",      "Gross PP&E"),
+    ("net_ppe",        "Net Fixed Assets / Net PP&E"),
+    ("current_liab",   "Current Liabilities"),
+    ("st_debt",        "Short-Term Debt"),
+    ("lt_debt",        "Long-Term Debt"),
+    ("total_debt",     "Total Debt"),
+    ("total_liab",     "Total Liabilities"),
+    ("equity",         "Total Equity"),
+    ("retained",       "Retained Earnings"),
+    ("payables",       "Trade Payables"),
+    # Cash flow
+    ("ocf",            "Operating Cash Flow (CFO)"),
+    ("icf",            "Investing Cash Flow"),
+    ("fcf",            "Financing Cash Flow"),
+    # Additional
+    ("credit_sales",   "Credit Sales (for Receivable Days)"),
+)
+
+LINE_KEYS = tuple(k for k, _ in LINE_ITEMS)
+PERIODS = ("cy", "py")
+
+# Statements are kept as NumPy structured records — one fixed-width field per
+# line item — rather than Python objects: a company-period costs 240 bytes in
+# float64 (120 in float32), so 10M of them fit in 1.2-2.4 GB, and every line
+# is a strided view the engine computes on directly.
+
+def statement_dtype(periods=PERIODS, dtype=np.float64):
+    """Structured dtype with one field per line item and period (``revenue_cy`` ...).
+
+    ``periods=None`` gives one company-period per record (``revenue`` ...),
+    for panels shaped ``(companies, periods)``.
+    """
+    names = LINE_KEYS if periods is None else [f"{k}_{p}" for k in LINE_KEYS for p in periods]
+    return np.dtype([(name, dtype) for name in names])
+
+def statements(shape=1, periods=PERIODS, dtype=np.float64):
+    """Zeroed statement records; accepted anywhere the engine takes a table."""
+    return np.zeros(shape, statement_dtype(periods, dtype))
+
+
+# --------------------------------------------------
+# Array utilities (same semantics as the scalar helpers on the page)
+# --------------------------------------------------
+
+def safe_div(n, d):
+    n, d = np.asarray(n, dtype=np.float64), np.asarray(d, dtype=np.float64)
+    if n.shape != d.shape:
+        n, d = np.broadcast_arrays(n, d)
+    out = np.zeros(n.shape)
+    np.divide(n, d, out=out, where=d != 0)
+    return out
+
+def pct(n, d):
+    return safe_div(n, d) * 100
+
+def growth(current, previous):
+    return safe_div(np.subtract(current, previous), np.abs(previous)) * 100
+
+def avg(a, b):
+    s = np.add(a, b, dtype=np.float64)
+    return np.where(s != 0, s / 2, 0.0)
+
+def altman(wc, ta, re, ebit, equity, tl, sales):
+    z = (1.2*safe_div(wc, ta) + 1.4*safe_div(re, ta) + 3.3*safe_div(ebit, ta) +
+         0.6*safe_div(equity, tl) + 1.0*safe_div(sales, ta))
+    return np.where((np.asarray(ta) == 0) | (np.asarray(tl) == 0), 0.0, z)
+
+# (lower bound, label, colour) from the top zone down; a score must exceed the bound
+Z_ZONES = (
+    (3.0,     "✅ Safe Zone (> 3.0)",        "#38a169"),
+    (2.7,     "🟡 Caution Zone (2.7–3.0)",  "#d69e2e"),
+    (1.8,     "🟠 Distress Zone (1.8–2.7)", "#dd6b20"),
+    (-np.inf, "🔴 Danger Zone (< 1.8)",      "#e53e3e"),
+)
+
+def z_label(z):
+    """``(label, colour)`` of the Altman zone a single score falls in."""
+    for bound, label, colour in Z_ZONES[:-1]:
+        if z > bound:
+            return label, colour
+    return Z_ZONES[-1][1:]
+
+_Z_BOUNDS = np.array([bound for bound, _, _ in Z_ZONES[-2::-1]])
+
+def z_zone(z):
+    """Index into ``Z_ZONES`` of the zone each score falls in (vectorised ``z_label``)."""
+    z = np.asarray(z, dtype=np.float64)
+    zone = len(Z_ZONES) - 1 - np.searchsorted(_Z_BOUNDS, z, side="left")
+    return np.where(np.isnan(z), len(Z_ZONES) - 1, zone)
+
+
+# --------------------------------------------------
+# Derived lines
+# --------------------------------------------------
+# Each definition is a function whose parameter names are the statement lines
+# (or earlier definitions) it reads. ``prior_<line>`` is the previous period's
+# value of a line; for the earliest period it is the period itself, so the
+# averages collapse to the closing balance exactly as the page's PY column does.
+
+DERIVED = {
+    "gross_profit":     lambda gross, revenue, cogs: np.where(gross != 0, gross, revenue - cogs),
+    "credit":           lambda credit_sales, revenue: np.where(credit_sales != 0, credit_sales, revenue),
+    "avg_inventory":    lambda inventory, prior_inventory: avg(inventory, prior_inventory),
+    "avg_receivables":  lambda receivables, prior_receivables: avg(receivables, prior_receivables),
+    "avg_payables":     lambda payables, prior_payables: avg(payables, prior_payables),
+    "avg_equity":       lambda equity, prior_equity: avg(equity, prior_equity),
+    "avg_total_assets": lambda total_assets, prior_total_assets: avg(total_assets, prior_total_assets),
+}
+
+
+# --------------------------------------------------
+# Ratio definitions, in page layout order
+# --------------------------------------------------
+
+RATIO_GROUPS = (
+    ("📈 Profitability", (
+        ("roce",     "ROCE (%)",                lambda ebit, total_assets, current_liab: pct(ebit, total_assets - current_liab)),
+        ("roe",      "ROE (%)",                 lambda pat, avg_equity: pct(pat, avg_equity)),
+        ("roa",      "ROA (%)",                 lambda pat, avg_total_assets: pct(pat, avg_total_assets)),
+        ("gpm",      "Gross Profit Margin (%)", lambda gross_profit, revenue: pct(gross_profit, revenue)),
+        ("npm",      "Net Profit Margin (%)",   lambda pat, revenue: pct(pat, revenue)),
+        ("ebitda_m", "EBITDA Margin (%)",       lambda ebitda, revenue: pct(ebitda, revenue)),
+    )),
+    ("💧 Liquidity", (
+        ("cr",              "Current Ratio",         lambda current_assets, current_liab: safe_div(current_assets, current_liab)),
+        ("qr",              "Quick Ratio",           lambda current_assets, inventory, current_liab: safe_div(current_assets - inventory, current_liab)),
+        ("cash_r",          "Cash Ratio",            lambda cash, current_liab: safe_div(cash, current_liab)),
+        ("working_capital", "Working Capital (abs)", lambda current_assets, current_liab: current_assets - current_liab),
+    )),
+    ("⚖️ Leverage", (
+        ("de",   "Debt to Equity",        lambda total_debt, equity: safe_div(total_debt, equity)),
+        ("gear", "Gearing Ratio (%)",     lambda lt_debt, equity: pct(lt_debt, lt_debt + equity)),
+        ("ic",   "Interest Coverage (x)", lambda ebit, interest: safe_div(ebit, interest)),
+    )),
+    ("⚙️ Efficiency", (
+        ("inv_turn", "Inventory Turnover (x)",   lambda cogs, avg_inventory: safe_div(cogs, avg_inventory)),
+        ("inv_days", "Inventory Days",           lambda avg_inventory, cogs: safe_div(avg_inventory, cogs) * 365),
+        ("rec_days", "Receivable Days",          lambda avg_receivables, credit: safe_div(avg_receivables, credit) * 365),
+        ("pay_days", "Payable Days",             lambda avg_payables, cogs: safe_div(avg_payables, cogs) * 365),
+        ("wcc",      "Working Capital Cycle",    lambda inv_days, rec_days, pay_days: inv_days + rec_days - pay_days),
+        ("at",       "Asset Turnover (x)",       lambda revenue, total_assets: safe_div(revenue, total_assets)),
+        ("fat",      "Fixed Asset Turnover (x)", lambda revenue, net_ppe: safe_div(revenue, net_ppe)),
+    )),
+    ("💵 Cash Flow", (
+        ("ocf_cl",   "OCF Ratio",             lambda ocf, current_liab: safe_div(ocf, current_liab)),
+        ("ocf_np",   "OCF to Net Profit",     lambda ocf, pat: safe_div(ocf, pat)),
+        ("ccr",      "Cash Conversion Ratio", lambda ocf, ebitda: safe_div(ocf, ebitda)),
+        ("cfo_debt", "CFO to Total Debt",     lambda ocf, total_debt: safe_div(ocf, total_debt)),
+    )),
+    ("🔬 Quality & Other", (
+        ("eff_tax",  "Effective Tax Rate (%)", lambda tax, pbt: pct(tax, pbt)),
+        ("sga_s",    "SG&A to Sales (%)",      lambda sga, revenue: pct(sga, revenue)),
+        ("dep_rate", "Depreciation Rate (%)",  lambda depreciation, gross_ppe: pct(depreciation, gross_ppe)),
+        ("accruals", "Accruals to Assets (%)", lambda pat, ocf, total_assets: pct(pat - ocf, total_assets)),
+        ("z",        "Altman Z-Score",         lambda working_capital, total_assets, retained, ebit, equity, total_liab, revenue:
+                                                   altman(working_capital, total_assets, retained,
+                                                          ebit, equity, total_liab, revenue)),
+    )),
+)
+
+RATIOS = {key: fn for _, ratios in RATIO_GROUPS for key, _, fn in ratios}
+RATIO_LABELS = {key: label for _, ratios in RATIO_GROUPS for key, label, _ in ratios}
+
+# The page has always computed PY inventory turnover against half the closing
+# inventory (an average with zero). Kept so both paths agree.
+OPENING_OVERRIDES = {
+    "inv_turn": lambda cogs, inventory: safe_div(cogs, avg(inventory, 0)),
+}
+
+OUTPUT_KEYS = tuple(DERIVED) + tuple(RATIOS)
+
+
+# --------------------------------------------------
+# Horizontal / vertical analysis layout
+# --------------------------------------------------
+
+HORIZONTAL_ITEMS = (
+    ("Revenue",             "revenue"),
+    ("Gross Profit",        "gross_profit"),
+    ("EBIT",                "ebit"),
+    ("Net Income / PAT",    "pat"),
+    ("Total Assets",        "total_assets"),
+    ("Total Liabilities",   "total_liab"),
+    ("Equity",              "equity"),
+    ("Operating Cash Flow", "ocf"),
+    ("Trade Receivables",   "receivables"),
+    ("Inventory",           "inventory"),
+    ("Total Debt",          "total_debt"),
+)
+
+# Common-size income statement (% of revenue). Revenue itself is always 100.
+INCOME_VERTICAL = (
+    ("Revenue",      "revenue"),
+    ("COGS",         "cogs"),
+    ("Gross Profit", "gross_profit"),
+    ("SG&A",         "sga"),
+    ("EBIT",         "ebit"),
+    ("Interest",     "interest"),
+    ("Tax",          "tax"),
+    ("Net Income",   "pat"),
+)
+
+# Common-size balance sheet (% of total assets)
+BALANCE_VERTICAL = (
+    ("Cash",              "cash"),
+    ("Receivables",       "receivables"),
+    ("Inventory",         "inventory"),
+    ("Current Assets",    "current_assets"),
+    ("Net Fixed Assets",  "net_ppe"),
+    ("Current Liab.",     "current_liab"),
+    ("Total Liabilities", "total_liab"),
+    ("Equity",            "equity"),
+)
+
+# Key ratio trend charts (CY vs PY): chart -> (label, ratio) series
+TREND_CHARTS = {
+    "prof": [
+        ("Gross Margin %",  "gpm"),
+        ("Net Margin %",    "npm"),
+        ("EBITDA Margin %", "ebitda_m"),
+        ("ROE %",           "roe"),
+        ("ROA %",           "roa"),
+    ],
+    "lev": [
+        ("Current Ratio", "cr"),
+        ("Quick Ratio",   "qr"),
+        ("Debt/Equity",   "de"),
+        ("Int. Coverage", "ic"),
+    ],
+    "wcc": [
+        ("Inventory Days",  "inv_days"),
+        ("Receivable Days", "rec_days"),
+        ("Payable Days",    "pay_days"),
+    ],
+}
+
+TREND_CAPTIONS = {
+    "prof": "Profitability Margins (%)",
+    "lev":  "Liquidity & Leverage Ratios",
+    "wcc":  "Working Capital Cycle — Days (CY vs PY)",
+}
+
+_PARAMS = {
+    fn: tuple(inspect.signature(fn).parameters)
+    for fn in [*DERIVED.values(), *RATIOS.values(), *OPENING_OVERRIDES.values()]
+}
+
+def depends_on(fn):
+    """Names a derived-line or ratio definition reads (its parameter names)."""
+    return _PARAMS[fn]
+
+
+# --------------------------------------------------
+# Evaluation
+# --------------------------------------------------
+
+def _columns(table):
+    names = getattr(table, "column_names", None)
+    if names is None:
+        names = getattr(getattr(table, "dtype", None), "names", None)
+    if names is None:
+        names = table.keys()
+    return set(names)
+
+def _rows(table, columns):
+    for period in PERIODS:
+        for key in LINE_KEYS:
+            if f"{key}_{period}" in columns:
+                return len(np.atleast_1d(np.asarray(table[f"{key}_{period}"])))
+    return 1
+
+def _period_lines(table, period, columns, n):
+    lines = {}
+    for key in LINE_KEYS:
+        col = f"{key}_{period}"
+        if col in columns:
+            lines[key] = np.atleast_1d(np.asarray(table[col], dtype=np.float64))
+        else:
+            lines[key] = np.zeros(n)
+    return lines
+
+def _evaluate(lines, prior=None, opening=None):
+    # ``opening`` selects (along the time axis, or a boolean mask over the
+    # rows) the periods that have no prior period of their own; they get
+    # OPENING_OVERRIDES. No ``prior`` at all means every period is an opening one.
+    if prior is None:
+        prior, opening = lines, slice(None)
+    ns = dict(lines)
+    ns.update((f"prior_{k}", v) for k, v in prior.items())
+    for name, fn in DERIVED.items():
+        ns[name] = fn(*(ns[p] for p in _PARAMS[fn]))
+    for name, fn in RATIOS.items():
+        override = OPENING_OVERRIDES.get(name) if opening is not None else None
+        if override is not None and isinstance(opening, slice) and opening == slice(None):
+            fn = override
+        ns[name] = fn(*(ns[p] for p in _PARAMS[fn]))
+        if override is not None and fn is not override:
+            ns[name][..., opening] = override(*(ns[p][..., opening] for p in _PARAMS[override]))
+    for k in prior:
+        del ns[f"prior_{k}"]
+    return ns
+
+def _vertical(ns):
+    revenue, total_assets = ns["revenue"], ns["total_assets"]
+    out = {}
+    for _, key in INCOME_VERTICAL:
+        if key == "revenue":
+            out[f"pct_rev_{key}"] = np.full(revenue.shape, 100.0)
+        else:
+            out[f"pct_rev_{key}"] = pct(ns[key], revenue)
+    for _, key in BALANCE_VERTICAL:
+        out[f"pct_ta_{key}"] = pct(ns[key], total_assets)
+    return out
+
+def evaluate_step(lines, prior, opening):
+    """Derived lines, ratios and common-size shares of one period per row.
+
+    ``lines`` and ``prior`` are dicts of line arrays — each row's period and
+    its comparative period — and ``opening`` is a boolean mask of the rows
+    that have no comparative of their own (they get the opening
+    definitions). For callers that keep their own history, such as
+    ``streaming.FilingStream``; growth and red flags are left to them.
+    """
+    ns = _evaluate(lines, prior, opening)
+    ns.update(_vertical(ns))
+    return ns
+
+def line_values(table, periods=PERIODS):
+    """``(lines * periods, N)`` float64 matrix in ``<line>_<period>`` order, missing = 0."""
+    columns = _columns(table)
+    n = _rows(table, columns)
+    out = np.zeros((len(LINE_KEYS) * len(periods), n))
+    for i, name in enumerate(f"{k}_{p}" for k in LINE_KEYS for p in periods):
+        if name in columns:
+            out[i] = np.asarray(table[name], dtype=np.float64).reshape(-1)
+    return out
+
+def to_statements(table, periods=PERIODS, dtype=np.float64):
+    """Any columnar table as contiguous statement records (missing lines are 0)."""
+    values = line_values(table, periods)
+    out = statements(values.shape[1], periods, dtype)
+    for name, row in zip(out.dtype.names, values):
+        out[name] = row
+    return out
+
+def load_periods(table):
+    """Split a columnar table into ``(cy, py)`` dicts of line arrays."""
+    columns = _columns(table)
+    n = _rows(table, columns)
+    return (_period_lines(table, "cy", columns, n),
+            _period_lines(table, "py", columns, n))
+
+def compute_ratios(table):
+    """Compute every ratio for every row of ``table`` in one pass.
+
+    Returns a columnar dict keyed ``<ratio>_cy`` / ``<ratio>_py`` holding
+    float64 arrays of length N (derived lines such as ``gross_profit`` are
+    included under the same naming).
+    """
+    cy, py = load_periods(table)
+    out = {}
+    for period, ns in (("cy", _evaluate(cy, py)), ("py", _evaluate(py))):
+        for name in OUTPUT_KEYS:
+            out[f"{name}_{period}"] = ns[name]
+    return out
+
+def current_view(results):
+    """CY/PY results as the period-agnostic names the red-flag rules read.
+
+    ``<name>_cy`` becomes ``<name>``, ``<name>_py`` becomes ``prior_<name>``
+    and unsuffixed columns (``growth_*``) pass through.
+    """
+    view = {}
+    for col, arr in results.items():
+        if col.endswith("_cy"):
+            view[col[:-3]] = arr
+        elif col.endswith("_py"):
+            view[f"prior_{col[:-3]}"] = arr
+        else:
+            view[col] = arr
+    return view
+
+def analyse(table, flags=True, industry=None):
+    """Every section of the page for every row of ``table``, as one columnar dict.
+
+    Holds the (zero-filled) statement lines, the ratios from
+    ``compute_ratios``, ``growth_<line>`` for the horizontal analysis,
+    ``pct_rev_<line>_<period>`` / ``pct_ta_<line>_<period>`` for the vertical
+    analysis and, with ``flags``, the red-flag counts and rule columns.
+    ``industry`` (one name, or one per row; defaults to the table's
+    ``industry`` column if it has one) selects red-flag threshold overrides.
+    """
+    cy, py = load_periods(table)
+    cur, prev = _evaluate(cy, py), _evaluate(py)
+    out = {}
+    for period, ns in (("cy", cur), ("py", prev)):
+        for name, arr in ns.items():
+            out[f"{name}_{period}"] = arr
+    for _, key in HORIZONTAL_ITEMS:
+        out[f"growth_{key}"] = growth(cur[key], prev[key])
+    for period, ns in (("cy", cur), ("py", prev)):
+        for name, arr in _vertical(ns).items():
+            out[f"{name}_{period}"] = arr
+
+    if flags:
+        if industry is None and "industry" in _columns(table):
+            industry = np.asarray(table["industry"])
+        out.update(red_flags.flag_columns(red_flags.evaluate(current_view(out), industry)))
+    return out
+
+
+# --------------------------------------------------
+# Panels: any number of periods per company
+# --------------------------------------------------
+# A panel maps each statement line to an array whose LAST axis is time,
+# oldest period first — (N, T) for N companies, or (T,) for one. Comparatives
+# are the same line shifted ``lag`` periods back (1 for annual data, 4 for
+# year-on-year on quarterly data), so averages, growth and YoY deltas are
+# whole-array operations whatever T is.
+
+def shift(a, k=1, fill=np.nan):
+    """``a`` shifted ``k`` periods later along the time axis, first ``k`` filled."""
+    a = np.asarray(a, dtype=np.float64)
+    out = np.empty_like(a)
+    out[..., :k] = fill
+    out[..., k:] = a[..., :a.shape[-1] - k]
+    return out
+
+def lagged(a, k=1):
+    """Comparative value ``k`` periods back; periods with no history see themselves."""
+    out = shift(a, k)
+    out[..., :k] = np.asarray(a)[..., :k]
+    return out
+
+def rolling_sum(a, window):
+    """Trailing ``window``-period sum (e.g. ``window=4`` for TTM on quarterly flows)."""
+    a = np.asarray(a, dtype=np.float64)
+    out = np.full(a.shape, np.nan)
+    if a.shape[-1] >= window:
+        out[..., window - 1:] = np.lib.stride_tricks.sliding_window_view(a, window, axis=-1).sum(axis=-1)
+    return out
+
+def rolling_mean(a, window):
+    return rolling_sum(a, window) / window
+
+def load_panel(panel):
+    """Statement lines of a panel as float64 arrays; missing lines are 0."""
+    columns = _columns(panel)
+    shape = next((np.shape(panel[k]) for k in LINE_KEYS if k in columns), (1,))
+    return {
+        key: np.asarray(panel[key], dtype=np.float64) if key in columns else np.zeros(shape)
+        for key in LINE_KEYS
+    }
+
+def panel_from_frame(df, company="company", period="period"):
+    """Long-format frame (one row per company-period) -> ``(panel, companies, periods)``.
+
+    Company-periods missing from the file are NaN in the panel.
+    """
+    lines = [k for k in LINE_KEYS if k in df.columns]
+    wide = df.set_index([company, period])[lines].unstack(period).sort_index(axis=1)
+    periods = wide.columns.get_level_values(period).unique()
+    panel = {k: wide[k].reindex(columns=periods).to_numpy(dtype=np.float64) for k in lines}
+    return panel, wide.index, periods
+
+def compute_panel(panel, lag=1):
+    """Every ratio for every company and period of ``panel``, each shaped like the input."""
+    lines = load_panel(panel)
+    prior = {k: lagged(v, lag) for k, v in lines.items()}
+    ns = _evaluate(lines, prior, opening=slice(0, lag))
+    return {name: ns[name] for name in OUTPUT_KEYS}
+
+def analyse_panel(panel, lag=1, flags=True, industry=None):
+    """``analyse`` over a whole panel: same columns without the ``_cy``/``_py`` suffix.
+
+    ``growth_<line>`` is NaN for the first ``lag`` periods, which have no
+    comparative. Red flags are evaluated for every period; ``industry`` is
+    one name or one per company.
+    """
+    lines = load_panel(panel)
+    prior = {k: lagged(v, lag) for k, v in lines.items()}
+    out = _evaluate(lines, prior, opening=slice(0, lag))
+    for _, key in HORIZONTAL_ITEMS:
+        out[f"growth_{key}"] = growth(out[key], shift(out[key], lag))
+    out.update(_vertical(out))
+
+    if flags:
+        view = dict(out, prior_npm=shift(out["npm"], lag))
+        if industry is not None and not isinstance(industry, str):
+            shape = np.shape(out["npm"])
+            industry = np.broadcast_to(np.asarray(industry).reshape(shape[:-1] + (1,)), shape)
+        out.update(red_flags.flag_columns(red_flags.evaluate(view, industry)))
+    return out
+
+
+# --------------------------------------------------
+# Page / report views
+# --------------------------------------------------
+
+def ratio_groups(ratios, i=0):
+    """The page's ``ratio_groups`` layout (group -> label -> (cy, py)) for row ``i``."""
+    return {
+        group: {
+            label: (float(ratios[f"{key}_cy"][i]), float(ratios[f"{key}_py"][i]))
+            for key, label, _ in items
+        }
+        for group, items in RATIO_GROUPS
+    }
+
+def ratio_row(ratios, i=0):
+    return {col: float(arr[i]) for col, arr in ratios.items()}
+
+def ratio_frame(ratios, index=None):
+    """Full ratio matrix as a DataFrame, one row per company."""
+    import pandas as pd
+    return pd.DataFrame(ratios, index=index)
+
+def period_values(results, key, i=0):
+    """One company's values for ``key`` across periods, oldest first.
+
+    Works on panel results (``key`` shaped (N, T)) and on CY/PY results
+    (``key_py``, ``key_cy``).
+    """
+    if key in results:
+        return np.atleast_2d(results[key])[i]
+    return np.array([results[f"{key}_py"][i], results[f"{key}_cy"][i]])
+
+def horizontal_frame(results, periods, i=0, unit=""):
+    """Horizontal-analysis table: one column per period, then the latest change."""
+    import pandas as pd
+    values = np.array([period_values(results, key, i) for _, key in HORIZONTAL_ITEMS])
+    cols = [f"{p} ({unit})" if unit else p for p in periods]
+    df = pd.DataFrame(values, columns=cols)
+    df.insert(0, "Item", [label for label, _ in HORIZONTAL_ITEMS])
+    if values.shape[1] > 1:
+        g = growth(values[:, -1], values[:, -2])
+    else:
+        g = np.zeros(len(values))
+    df["Change (%)"] = g.round(2)
+    df["Trend"] = np.where(g > 0, "▲", np.where(g < 0, "▼", "—"))
+    return df
+
+def trend_frame(results, items, periods, i=0):
+    """Chart data: one column per ``(label, key)`` item, one row per period."""
+    import pandas as pd
+    return pd.DataFrame({label: period_values(results, key, i) for label, key in items},
+                        index=list(periods))
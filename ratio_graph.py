@@ -0,0 +1,158 @@
+"""
+Dependency graph over the analysis, for incremental recomputation.
+
+Every output column of ``ratio_engine.analyse`` becomes a node that lists the
+columns it reads — taken straight from the parameter names of the engine's
+definitions — so when one input changes only the nodes downstream of it are
+recomputed. A node whose new value equals its old one stops the propagation
+there, and ``SECTIONS`` maps each block of the page to the nodes it shows so
+untouched sections can be reused as they are.
+"""
+
+import numpy as np
+
+import red_flags
+from ratio_engine import (
+    BALANCE_VERTICAL, DERIVED, HORIZONTAL_ITEMS, INCOME_VERTICAL, LINE_KEYS,
+    OPENING_OVERRIDES, PERIODS, RATIO_GROUPS, RATIOS, depends_on, growth, line_values, pct,
+)
+
+
+INPUTS = tuple(f"{k}_{p}" for k in LINE_KEYS for p in PERIODS)
+
+
+# --------------------------------------------------
+# Graph construction
+# --------------------------------------------------
+
+def _flag_column(name):
+    # red_flags reads current-period names; map them back to CY/PY columns
+    if name.startswith("growth_"):
+        return name
+    if name.startswith("prior_"):
+        return f"{name[6:]}_py"
+    return f"{name}_cy"
+
+def _evaluate_flags(industry, *values):
+    return red_flags.evaluate(dict(zip(red_flags.INPUTS, values)), industry)
+
+def _build_nodes():
+    nodes = {}  # name -> (fn, deps), in evaluation order
+
+    for period, prior in (("cy", "py"), ("py", "py")):
+        def column(param):
+            if param.startswith("prior_"):
+                return f"{param[6:]}_{prior}"
+            return f"{param}_{period}"
+
+        for name, fn in DERIVED.items():
+            nodes[f"{name}_{period}"] = (fn, [column(p) for p in depends_on(fn)])
+        for name, fn in RATIOS.items():
+            if period == "py" and name in OPENING_OVERRIDES:
+                fn = OPENING_OVERRIDES[name]
+            nodes[f"{name}_{period}"] = (fn, [column(p) for p in depends_on(fn)])
+
+    for _, key in HORIZONTAL_ITEMS:
+        nodes[f"growth_{key}"] = (growth, [f"{key}_cy", f"{key}_py"])
+
+    for period in PERIODS:
+        for _, key in INCOME_VERTICAL:
+            if key == "revenue":
+                nodes[f"pct_rev_{key}_{period}"] = (lambda r: np.full(np.shape(r), 100.0),
+                                                    [f"revenue_{period}"])
+            else:
+                nodes[f"pct_rev_{key}_{period}"] = (pct, [f"{key}_{period}", f"revenue_{period}"])
+        for _, key in BALANCE_VERTICAL:
+            nodes[f"pct_ta_{key}_{period}"] = (pct, [f"{key}_{period}", f"total_assets_{period}"])
+
+    nodes["red_flags"] = (_evaluate_flags, ["industry"] + [_flag_column(n) for n in red_flags.INPUTS])
+
+    known = set(INPUTS) | {"industry"}
+    for name, (_, deps) in nodes.items():
+        missing = [d for d in deps if d not in known]
+        if missing:
+            raise ValueError(f"node {name!r} depends on {missing} before they are defined")
+        known.add(name)
+    return nodes
+
+NODES = _build_nodes()
+
+
+# --------------------------------------------------
+# Page sections and the nodes they display
+# --------------------------------------------------
+
+def _pairs(keys):
+    return [f"{k}_{p}" for k in keys for p in PERIODS]
+
+SECTIONS = {
+    **{
+        f"ratios:{group}": _pairs(key for key, _, _ in items)
+        for group, items in RATIO_GROUPS
+    },
+    "horizontal": _pairs(k for _, k in HORIZONTAL_ITEMS) + [f"growth_{k}" for _, k in HORIZONTAL_ITEMS],
+    "vertical":   _pairs(f"pct_rev_{k}" for _, k in INCOME_VERTICAL)
+                  + _pairs(f"pct_ta_{k}" for _, k in BALANCE_VERTICAL),
+    "trends":     _pairs(["gpm", "npm", "ebitda_m", "roe", "roa", "cr", "qr", "de", "ic",
+                          "inv_days", "rec_days", "pay_days"]),
+    "altman":     _pairs(["z"]),
+    "red_flags":  ["red_flags"] + NODES["red_flags"][1],
+}
+
+
+# --------------------------------------------------
+# Incremental evaluation
+# --------------------------------------------------
+
+def _same(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.shape(a) == np.shape(b) and np.array_equal(a, b, equal_nan=True)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+class IncrementalAnalysis:
+    """Holds the last evaluated values and recomputes only what an update touches.
+
+    ``values`` uses the same column names as ``ratio_engine.analyse`` (minus
+    the flag summary columns), so section builders can read either.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.context = None
+        self.recomputed = 0
+
+    def update(self, inputs, context=None, industry=None):
+        """Apply new inputs; return the set of input and node names whose value changed.
+
+        A change of ``context`` (e.g. display currency) marks everything
+        changed; ``industry`` only feeds the red-flag thresholds.
+        """
+        first = not self.values or context != self.context
+        self.context = context
+        changed = set()
+        if first or industry != self.values.get("industry"):
+            self.values["industry"] = industry
+            changed.add("industry")
+        for name, value in zip(INPUTS, line_values(inputs)):
+            if first or not _same(value, self.values.get(name)):
+                self.values[name] = value
+                changed.add(name)
+
+        self.recomputed = 0
+        for name, (fn, deps) in NODES.items():
+            if not first and changed.isdisjoint(deps):
+                continue
+            value = fn(*(self.values[d] for d in deps))
+            self.recomputed += 1
+            if first or not _same(value, self.values.get(name)):
+                self.values[name] = value
+                changed.add(name)
+        return changed
+
+    @staticmethod
+    def stale_sections(changed):
+        """Sections of the page that show at least one changed value."""
+        return {section for section, deps in SECTIONS.items() if not changed.isdisjoint(deps)}
@@ -0,0 +1,294 @@
+"""
+Red Flag & Health Check engine.
+
+The checks are a table of ``Rule`` records — metric, comparator, threshold,
+severity, message template and optional per-industry threshold overrides —
+so adding or tuning a rule is a data change. ``evaluate`` runs the whole
+table as boolean masks over whole columns, so a portfolio of companies is
+checked in one pass. Input is a mapping of arrays for the period being
+assessed: the ratios from ``ratio_engine`` (``cr``, ``z`` ...), the statement
+lines (``ocf``, ``pat``, ``interest``), the horizontal-analysis growth
+columns (``growth_revenue`` ...) and ``prior_npm``. Arrays may be 1-D (one
+period per company) or a whole panel; see ``ratio_engine.current_view``.
+"""
+
+import operator
+import string
+from collections import namedtuple
+
+import numpy as np
+
+
+CRITICAL = "🔴 Critical"
+WARNING  = "🟡 Warning"
+POSITIVE = "✅ Positive"
+
+
+# --------------------------------------------------
+# Rule table
+# --------------------------------------------------
+# A rule holds where ``metric <op> threshold`` — or, with ``versus``,
+# ``metric <op> versus * scale + threshold`` — and every ``when`` condition
+# ``(metric, op, threshold)`` is true. ``metric=None`` always holds (an
+# ``else`` branch). Rules sharing a ``group`` form an if/elif chain: only the
+# first rule of the group that holds, in table order, fires. ``overrides``
+# maps an industry to its own threshold, or to None to switch the rule off.
+# Messages may use ``{threshold}`` and any input name.
+
+Rule = namedtuple("Rule", [
+    "code", "severity", "metric", "op", "threshold", "message",
+    "versus", "scale", "when", "group", "overrides",
+], defaults=(None, 1.0, (), None, {}))
+
+RULES = (
+    # Liquidity
+    Rule("cr_critical", CRITICAL, "cr", "<", 1.0,
+         "Current Ratio below {threshold:.1f} — Cannot cover short-term obligations", group="cr"),
+    Rule("cr_low", WARNING, "cr", "<", 1.5,
+         "Current Ratio is low at {cr:.2f} (target ≥ {threshold:.1f})", group="cr"),
+    Rule("cr_healthy", POSITIVE, None, None, None,
+         "Current Ratio is healthy at {cr:.2f}", group="cr"),
+    Rule("qr_low", WARNING, "qr", "<", 1.0,
+         "Quick Ratio below {threshold:.1f} at {qr:.2f} — Limited liquid assets"),
+    Rule("negative_wc", CRITICAL, "working_capital", "<", 0,
+         "Negative Working Capital — Serious liquidity risk"),
+
+    # Cash Flow
+    Rule("negative_ocf", CRITICAL, "ocf", "<", 0,
+         "Negative Operating Cash Flow — Business is burning cash from operations", group="ocf"),
+    Rule("ocf_above_pat", POSITIVE, "ocf", ">", 0,
+         "Operating Cash Flow exceeds Net Profit — Strong earnings quality",
+         versus="pat", group="ocf"),
+    Rule("weak_cash_conv", WARNING, "ocf", "<", 0,
+         "Operating CF significantly below Net Profit — Weak cash conversion or aggressive accounting",
+         versus="pat", scale=0.8, when=(("pat", ">", 0),)),
+
+    # Leverage
+    Rule("de_critical", CRITICAL, "de", ">", 3.0,
+         "Debt-to-Equity at {de:.2f} — Dangerously high leverage", group="de"),
+    Rule("de_high", WARNING, "de", ">", 2.0,
+         "Debt-to-Equity at {de:.2f} — High leverage (target < {threshold:.1f})", group="de"),
+    Rule("de_ok", POSITIVE, None, None, None,
+         "Debt-to-Equity is manageable at {de:.2f}", group="de"),
+    Rule("ic_critical", CRITICAL, "ic", "<", 1.5,
+         "Interest Coverage of {ic:.2f}x — At risk of defaulting on interest",
+         when=(("interest", ">", 0),), group="ic"),
+    Rule("ic_low", WARNING, "ic", "<", 3.0,
+         "Interest Coverage of {ic:.2f}x — Should be above {threshold:.1f}x",
+         when=(("interest", ">", 0),), group="ic"),
+
+    # Revenue & receivables
+    Rule("receivables_outpace", WARNING, "growth_receivables", ">", 15,
+         "Receivables growing ({growth_receivables:.1f}%) faster than Revenue ({growth_revenue:.1f}%) — Potential collection issues",
+         versus="growth_revenue"),
+    Rule("margin_compression", WARNING, "growth_revenue", ">", 0,
+         "Revenue growing but profits declining — Margin compression or cost overruns",
+         when=(("growth_pat", "<", 0),)),
+    Rule("debt_outpace", WARNING, "growth_total_debt", ">", 20,
+         "Debt growing ({growth_total_debt:.1f}%) much faster than Revenue ({growth_revenue:.1f}%)",
+         versus="growth_revenue"),
+
+    # Profitability
+    Rule("loss_making", CRITICAL, "npm", "<", 0,
+         "Negative Net Profit Margin — Company is loss-making", group="npm"),
+    Rule("thin_margin", WARNING, "npm", "<", 5,
+         "Net Profit Margin very thin at {npm:.1f}%", group="npm"),
+
+    # Accruals
+    Rule("high_accruals", WARNING, "abs_accruals", ">", 5,
+         "High Accruals-to-Assets ({accruals:.1f}%) — Earnings quality concern"),
+
+    # Altman
+    Rule("z_danger", CRITICAL, "z", "<", 1.8,
+         "Altman Z-Score {z:.2f} — High bankruptcy risk", group="z"),
+    Rule("z_distress", WARNING, "z", "<", 2.7,
+         "Altman Z-Score {z:.2f} — In financial distress zone", group="z"),
+    Rule("z_safe", POSITIVE, "z", ">", 3.0,
+         "Altman Z-Score {z:.2f} — Company is in the safe zone", group="z"),
+    Rule("quality_growth", POSITIVE, "npm", ">", 0,
+         "Profit margin improving alongside revenue growth — Quality performance",
+         versus="prior_npm", when=(("growth_revenue", ">", 0),)),
+)
+
+# Metrics rules may test that are not inputs themselves
+METRICS = {
+    "abs_accruals": (np.abs, ("accruals",)),
+}
+
+COMPARATORS = {
+    "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+
+
+def rule_inputs(rules=RULES):
+    """Every input name ``rules`` read (metrics, conditions and message fields), in table order."""
+    names = []
+    def need(name):
+        for n in METRICS[name][1] if name in METRICS else (name,):
+            if n not in names:
+                names.append(n)
+
+    codes = set()
+    for r in rules:
+        if r.code in codes:
+            raise ValueError(f"duplicate rule code {r.code!r}")
+        codes.add(r.code)
+        for op in [r.op] * (r.metric is not None) + [op for _, op, _ in r.when]:
+            if op not in COMPARATORS:
+                raise ValueError(f"rule {r.code!r}: unknown comparator {op!r}")
+        for name in [r.metric, r.versus] + [m for m, _, _ in r.when]:
+            if name is not None:
+                need(name)
+        for _, field, _, _ in string.Formatter().parse(r.message):
+            if field and field != "threshold":
+                need(field)
+    return tuple(names)
+
+# Every name the default rules read, for callers that track dependencies
+INPUTS = rule_inputs()
+
+
+# --------------------------------------------------
+# Evaluation
+# --------------------------------------------------
+
+def _threshold(rule, industry):
+    # -> (threshold, enabled): scalars, or per-row arrays when the rule has
+    # overrides and ``industry`` is ``(names, codes)`` from ``np.unique``
+    if not rule.overrides or industry is None:
+        return rule.threshold, True
+    if isinstance(industry, str):
+        if industry not in rule.overrides:
+            return rule.threshold, True
+        t = rule.overrides[industry]
+        return (rule.threshold, False) if t is None else (t, True)
+    names, codes = industry
+    enabled = np.array([rule.overrides.get(n, True) is not None for n in names])[codes]
+    if rule.threshold is None:
+        return None, enabled
+    table = [rule.overrides.get(n, rule.threshold) for n in names]
+    return np.array([np.nan if t is None else t for t in table])[codes], enabled
+
+
+def evaluate(c, industry=None, rules=RULES):
+    """Evaluate ``rules`` over every row of ``c``.
+
+    ``industry`` is one industry name for every row, or an array of names
+    with one per row; it only matters for rules with ``overrides``. Returns
+    ``[(code, severity, mask, message template, threshold), ...]`` in table
+    order, where ``threshold`` is a scalar or per-row array.
+    """
+    metrics = {}
+    def metric(name):
+        if name not in metrics:
+            if name in METRICS:
+                fn, args = METRICS[name]
+                metrics[name] = fn(*(np.asarray(c[a]) for a in args))
+            else:
+                metrics[name] = np.asarray(c[name])
+        return metrics[name]
+
+    shape = np.shape(metric(rules[0].metric or INPUTS[0]))
+    if industry is not None and not isinstance(industry, str):
+        names, codes = np.unique(np.asarray(industry, dtype=str), return_inverse=True)
+        industry = (names.tolist(), codes.reshape(shape))
+
+    out = []
+    taken = {}  # group -> rows an earlier rule of the group already claimed
+    for r in rules:
+        threshold, enabled = _threshold(r, industry)
+        if r.metric is None:
+            mask = np.ones(shape, dtype=bool)
+        else:
+            rhs = threshold if r.versus is None else metric(r.versus) * r.scale + threshold
+            mask = COMPARATORS[r.op](metric(r.metric), rhs)
+        for name, op, t in r.when:
+            mask &= COMPARATORS[op](metric(name), t)
+        if enabled is not True:
+            mask &= enabled
+        if r.group is not None:
+            if r.group in taken:
+                mask &= ~taken[r.group]
+                taken[r.group] |= mask
+            else:
+                taken[r.group] = mask.copy()
+        out.append((r.code, r.severity, mask, r.message, threshold))
+    return out
+
+
+def flag_columns(rules):
+    """Columnar summary for batch output: counts plus one boolean column per rule."""
+    out = {
+        "critical_count": sum(m.astype(np.int32) for _, sev, m, _, _ in rules if sev == CRITICAL),
+        "warning_count":  sum(m.astype(np.int32) for _, sev, m, _, _ in rules if sev == WARNING),
+        "positive_count": sum(m.astype(np.int32) for _, sev, m, _, _ in rules if sev == POSITIVE),
+    }
+    for code, _, mask, _, _ in rules:
+        out[f"flag_{code}"] = mask
+    return out
+
+
+def portfolio_counts(rules):
+    """Portfolio totals: issues by severity, companies affected and hits per rule."""
+    columns = flag_columns(rules)
+    critical, warning = columns["critical_count"], columns["warning_count"]
+    return {
+        "companies":        int(np.size(critical)),
+        "critical_issues":  int(np.sum(critical)),
+        "warnings":         int(np.sum(warning)),
+        "positives":        int(np.sum(columns["positive_count"])),
+        "with_critical":    int(np.count_nonzero(critical)),
+        "with_warning":     int(np.count_nonzero(warning)),
+        "by_rule":          {code: int(np.count_nonzero(mask)) for code, _, mask, _, _ in rules},
+    }
+
+
+class _Row(dict):
+    # Looks values up on demand, so only the fields a message uses are indexed
+    def __init__(self, c, i):
+        super().__init__()
+        self.c, self.i = c, i
+
+    def __missing__(self, key):
+        return np.asarray(self.c[key])[self.i]
+
+
+def company_flags(rules, c, i=0):
+    """Page view for row ``i``: ``([(severity, message), ...], [positive message, ...])``."""
+    flags, positives = [], []
+    for _, sev, mask, template, threshold in rules:
+        if mask[i]:
+            values = _Row(c, i)
+            values["threshold"] = threshold[i] if np.ndim(threshold) else threshold
+            msg = template.format_map(values)
+            if sev == POSITIVE:
+                positives.append(msg)
+            else:
+                flags.append((sev, msg))
+    return flags, positives
+
+
+def all_company_flags(rules, c):
+    """``company_flags`` of every row, as a list of ``(flags, positives)``.
+
+    Each rule's message fields are gathered once, for just the rows it
+    fires on, so this costs per message rather than per row and rule.
+    """
+    masks = [np.ravel(mask) for _, _, mask, _, _ in rules]
+    out = [([], []) for _ in range(masks[0].size if masks else 0)]
+    for (_, sev, _, template, threshold), mask in zip(rules, masks):
+        rows = np.flatnonzero(mask)
+        if not rows.size:
+            continue
+        fields = {f for _, f, _, _ in string.Formatter().parse(template) if f and f != "threshold"}
+        values = {f: np.ravel(c[f])[rows].tolist() for f in fields}
+        thresholds = np.ravel(threshold)[rows].tolist() if np.ndim(threshold) else [threshold] * rows.size
+        for k, i in enumerate(rows.tolist()):
+            msg = template.format(threshold=thresholds[k], **{f: v[k] for f, v in values.items()})
+            if sev == POSITIVE:
+                out[i][1].append(msg)
+            else:
+                out[i][0].append((sev, msg))
+    return out
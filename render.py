@@ -0,0 +1,92 @@
+"""
+Table rendering for the page.
+
+Change columns are coloured by sign (green up, red down, grey flat or
+non-numeric). The colour class of every cell comes from one vectorised
+comparison per column, never a Python call per cell, and reaches Streamlit
+one of two ways:
+
+* ``styled``: a pandas Styler whose cell CSS is set in one ``apply`` —
+  full colouring, for the small tables the page shows per company.
+* ``arrow_view``: the frame as plain Arrow-backed data plus a
+  ``column_config``, with a coloured marker column beside each change
+  column — no Styler and no HTML, so thousands of rows render cheaply.
+
+``show`` picks between them (``mode="auto"`` switches to Arrow above
+``STYLED_MAX_CELLS`` cells).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+UP   = "color: #38a169; font-weight:600"
+DOWN = "color: #e53e3e; font-weight:600"
+FLAT = "color: #718096"
+
+MARKERS = np.array(["🔴", "⚪", "🟢"])  # indexed by sign + 1
+
+STYLED_MAX_CELLS = 5_000
+MODES = ("auto", "styled", "arrow")
+
+
+def change_sign(values):
+    """-1 / 0 / +1 per value; NaN and non-numeric values count as 0."""
+    v = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+    return np.sign(np.nan_to_num(v, nan=0.0)).astype(np.int8)
+
+
+def change_css(frame):
+    """CSS for every cell of ``frame`` (``Styler.apply(..., axis=None)``)."""
+    css = {
+        col: np.select([s > 0, s < 0], [UP, DOWN], FLAT)
+        for col, s in ((col, change_sign(frame[col])) for col in frame.columns)
+    }
+    return pd.DataFrame(css, index=frame.index)
+
+
+def styled(df, fmt, change_cols=()):
+    """``df.style.format(fmt)`` with change columns coloured in one vectorised pass."""
+    styler = df.style.format(fmt)
+    if change_cols:
+        styler = styler.apply(change_css, axis=None, subset=list(change_cols))
+    return styler
+
+
+def _number_format(fmt):
+    # "{:.2f}" -> "%.2f"; "{:,.2f}" -> locale separators (printf formats have no ",")
+    if fmt.startswith("{:,"):
+        return "localized"
+    return "%" + fmt[2:-1]
+
+
+def arrow_view(df, fmt, change_cols=()):
+    """``(frame, column_config)`` for ``st.dataframe`` without a Styler.
+
+    Each change column gets a marker column (🟢 / 🔴 / ⚪) inserted after it.
+    """
+    import streamlit as st
+    frame = df.copy()
+    config = {}
+    formats = fmt if isinstance(fmt, dict) else {
+        c: fmt for c in df.columns if pd.api.types.is_numeric_dtype(df[c])
+    }
+    for col, f in formats.items():
+        config[col] = st.column_config.NumberColumn(col, format=_number_format(f))
+    for col in change_cols:
+        marker = f"{col} ·"
+        frame.insert(frame.columns.get_loc(col) + 1, marker, MARKERS[change_sign(frame[col]) + 1])
+        config[marker] = st.column_config.TextColumn("", width="small")
+    return frame, config
+
+
+def show(df, fmt, change_cols=(), mode="auto", **kwargs):
+    """Render ``df`` with ``st.dataframe`` in ``mode`` ("auto", "styled" or "arrow")."""
+    import streamlit as st
+    if mode == "auto":
+        mode = "styled" if df.size <= STYLED_MAX_CELLS else "arrow"
+    if mode == "styled":
+        st.dataframe(styled(df, fmt, change_cols), **kwargs)
+    else:
+        frame, config = arrow_view(df, fmt, change_cols)
+        st.dataframe(frame, column_config=config, **kwargs)
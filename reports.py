@@ -0,0 +1,799 @@
+"""
+Report export.
+
+Renders the page's sections — ratio groups, horizontal and vertical
+analysis, key ratio trends, the Altman Z-score and the red-flag list — for
+every company of a statements file, one document each, as HTML, XLSX or
+PDF:
+
+    python reports.py statements.parquet reports/ --format html --workers 8
+
+The statements are analysed chunk by chunk in the parent exactly as
+``batch.py`` does (one vectorised ``analyse`` per chunk); each company's
+results become a small plain-data *context* (``report_contexts``), and
+batches of contexts are rendered and written on a process pool with at
+most ``2 * workers`` batches in flight, so memory stays flat however many
+documents are written.
+
+Everything that is the same in every document is built once: the HTML
+template is compiled once (before the pool forks, so workers inherit it),
+the stylesheet and the Altman zone scale are written once to ``assets/``
+and linked, and each chart's frame (row labels, legend) is pre-rendered
+per chart, so a document only adds its own bars. The XLSX and PDF writers
+need no third-party package: a workbook is a handful of XML parts (the
+static ones pre-rendered) in a zip, and a PDF page is a text and
+rectangle content stream in the standard Helvetica fonts. XLSX holds the
+tables only. (Reading Excel *input* is another matter: like ``batch.py``
+it needs the optional openpyxl.)
+"""
+
+import argparse
+import math
+import os
+import re
+import sys
+import time
+import zipfile
+import zlib
+from collections import deque
+from functools import lru_cache
+from multiprocessing import get_all_start_methods, get_context
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+import red_flags
+from ratio_engine import (
+    BALANCE_VERTICAL, HORIZONTAL_ITEMS, INCOME_VERTICAL, RATIO_GROUPS, TREND_CAPTIONS, TREND_CHARTS,
+    Z_ZONES,
+    analyse, current_view, growth, z_label,
+)
+
+
+FORMATS = ("html", "xlsx", "pdf")
+
+# The Altman gauge covers this range; scores beyond it sit at the ends
+Z_SCALE = (0.0, 4.5)
+
+UP, DOWN, FLAT = "#38a169", "#e53e3e", "#718096"
+CY_COLOUR, PY_COLOUR = "#3182ce", "#a0aec0"
+
+
+# --------------------------------------------------
+# Contexts: one company's results as plain data
+# --------------------------------------------------
+
+def _column(table, name):
+    columns = getattr(table, "column_names", None)
+    if columns is None:
+        columns = table.keys()
+    return np.asarray(table[name]).tolist() if name in columns else None
+
+def report_contexts(table, first_row=0, industry=None):
+    """One report context (a dict of lists, tuples and floats) per row of ``table``.
+
+    ``table`` is a statements table as ``analyse`` takes it; its
+    ``company``, ``period``, ``industry`` and ``currency`` columns, where
+    present, title the reports. Rows are numbered from ``first_row``.
+    """
+    results = analyse(table, flags=False)
+    view = current_view(results)
+    if industry is None:
+        industry = _column(table, "industry")
+    if industry is not None and not isinstance(industry, str):
+        industry = np.asarray(industry, dtype=object)
+    rules = red_flags.evaluate(view, industry)
+    flags = red_flags.all_company_flags(rules, view)
+
+    def values(key):
+        return results[f"{key}_cy"].tolist(), results[f"{key}_py"].tolist()
+
+    ratio_cols = {}
+    for _, items in RATIO_GROUPS:
+        for key, _, _ in items:
+            cy, py = results[f"{key}_cy"], results[f"{key}_py"]
+            ratio_cols[key] = (cy.tolist(), py.tolist(), (cy - py).tolist(), growth(cy, py).tolist())
+    horizontal = {key: (*values(key)[::-1], results[f"growth_{key}"].tolist()) for _, key in HORIZONTAL_ITEMS}
+    income = {key: values(f"pct_rev_{key}") for _, key in INCOME_VERTICAL}
+    balance = {key: values(f"pct_ta_{key}") for _, key in BALANCE_VERTICAL}
+    z_cy, z_py = values("z")
+
+    n = len(z_cy)
+    names = _column(table, "company") or [None] * n
+    details = [_column(table, c) or [None] * n for c in ("period", "industry", "currency")]
+    out = []
+    for i in range(n):
+        row = first_row + i
+        out.append({
+            "row": row,
+            "title": str(names[i]) if names[i] not in (None, "") else f"Company {row + 1}",
+            "subtitle": " · ".join(str(d[i]) for d in details if d[i] not in (None, "")),
+            "ratios": [(group, [(label, *(col[i] for col in ratio_cols[key])) for key, label, _ in items])
+                       for group, items in RATIO_GROUPS],
+            "horizontal": [(label, *(col[i] for col in horizontal[key])) for label, key in HORIZONTAL_ITEMS],
+            "income": [(label, *(col[i] for col in income[key])) for label, key in INCOME_VERTICAL],
+            "balance": [(label, *(col[i] for col in balance[key])) for label, key in BALANCE_VERTICAL],
+            "trends": [(TREND_CAPTIONS[chart], [(label, ratio_cols[key][1][i], ratio_cols[key][0][i])
+                                                for label, key in items])
+                       for chart, items in TREND_CHARTS.items()],
+            "z": (z_cy[i], z_py[i]),
+            "flags": flags[i][0],
+            "positives": flags[i][1],
+        })
+    return out
+
+
+def _num(v, spec=".2f"):
+    return format(v, spec) if math.isfinite(v) else "—"
+
+def _sign(v):
+    return "up" if v > 0 else "down" if v < 0 else "flat"  # NaN compares False: flat
+
+def _trend(v):
+    return "▲" if v > 0 else "▼" if v < 0 else "—"
+
+def filename(context, fmt):
+    """``<row>-<company>.<fmt>``: unique per row, safe on any file system."""
+    slug = re.sub(r"[^0-9A-Za-z]+", "-", context["title"]).strip("-")[:60] or "company"
+    return f"{context['row'] + 1:06d}-{slug}.{fmt}"
+
+
+# --------------------------------------------------
+# Charts
+# --------------------------------------------------
+# Horizontal bar charts: a label column, then one bar per series per row,
+# scaled to the chart's own range with 0 marked.
+
+BAR_LABEL_W, BAR_PLOT_W, BAR_ROW_H = 170, 300, 22
+
+def _bar_geometry(rows, n_series, plot_w=BAR_PLOT_W):
+    # -> (x of 0, [(row, series, x, width, value)]) within a plot ``plot_w`` wide
+    finite = [v for values in rows for v in values if math.isfinite(v)]
+    lo, hi = min([0.0, *finite]), max([0.0, *finite])
+    span = (hi - lo) or 1.0
+    zero = (0.0 - lo) / span * plot_w
+    bars = []
+    for r, values in enumerate(rows):
+        for s, v in enumerate(values[:n_series]):
+            if math.isfinite(v):
+                x = (v - lo) / span * plot_w
+                bars.append((r, s, min(x, zero), abs(x - zero), v))
+    return zero, bars
+
+@lru_cache(maxsize=None)
+def _svg_frame(labels, series):
+    # Static part of a chart: size, row labels and legend; the bars go in between
+    height = BAR_ROW_H * len(labels) + 24
+    width = BAR_LABEL_W + BAR_PLOT_W + 60
+    head = [f'<svg xmlns="http://www.w3.org/2000/svg" class="chart" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">']
+    for r, label in enumerate(labels):
+        head.append(f'<text x="{BAR_LABEL_W - 8}" y="{r * BAR_ROW_H + 15}" text-anchor="end">{escape(label)}</text>')
+    tail = []
+    for s, (name, colour) in enumerate(series):
+        x = BAR_LABEL_W + s * 110
+        tail.append(f'<rect x="{x}" y="{height - 14}" width="10" height="10" fill="{colour}"/>'
+                    f'<text x="{x + 14}" y="{height - 5}">{escape(name)}</text>')
+    tail.append("</svg>")
+    return "".join(head), "".join(tail)
+
+def svg_bars(labels, rows, series):
+    """Inline SVG bar chart: ``rows`` of values (one per ``(name, colour)`` series) per label."""
+    head, tail = _svg_frame(tuple(labels), tuple(series))
+    zero, bars = _bar_geometry(rows, len(series))
+    bar_h = (BAR_ROW_H - 6) / len(series)
+    parts = [head, f'<line x1="{BAR_LABEL_W + zero:.1f}" x2="{BAR_LABEL_W + zero:.1f}" y1="0" '
+                   f'y2="{BAR_ROW_H * len(labels)}" stroke="#cbd5e0"/>']
+    for r, s, x, w, v in bars:
+        y = r * BAR_ROW_H + 3 + s * bar_h
+        parts.append(f'<rect x="{BAR_LABEL_W + x:.1f}" y="{y:.1f}" width="{w:.1f}" height="{bar_h:.1f}" '
+                     f'fill="{series[s][1]}"><title>{v:,.2f}</title></rect>')
+    parts.append(tail)
+    return "".join(parts)
+
+
+def _z_position(z):
+    lo, hi = Z_SCALE
+    return min(max((z - lo) / (hi - lo), 0.0), 1.0) if math.isfinite(z) else 0.0
+
+def z_scale_svg(width=600, height=24):
+    """The Altman zone bands, a static asset shared by every HTML report."""
+    lo, hi = Z_SCALE
+    bounds = [hi] + [max(b, lo) for b, _, _ in Z_ZONES[:-1]] + [lo]
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}" preserveAspectRatio="none">']
+    for (_, _, colour), top, bottom in zip(Z_ZONES, bounds, bounds[1:]):
+        x0, x1 = (bottom - lo) / (hi - lo) * width, (top - lo) / (hi - lo) * width
+        parts.append(f'<rect x="{x0:.1f}" y="0" width="{x1 - x0:.1f}" height="{height}" fill="{colour}"/>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+# --------------------------------------------------
+# HTML
+# --------------------------------------------------
+
+STYLESHEET = """
+body { font-family: -apple-system, "Segoe UI", Helvetica, Arial, sans-serif; color: #2d3748;
+       margin: 2rem auto; max-width: 1000px; padding: 0 1rem; }
+h1 { margin-bottom: 0; } .sub { color: #718096; margin-top: .25rem; }
+h2 { font-size: 1.3rem; border-bottom: 2px solid #e2e8f0; padding-bottom: .4rem; margin-top: 2rem; }
+h3 { font-size: 1.05rem; margin: 1.2rem 0 .4rem; }
+table { border-collapse: collapse; margin-bottom: .75rem; font-size: .9rem; }
+th, td { padding: .3rem .7rem; border-bottom: 1px solid #edf2f7; }
+th { text-align: left; background: #f7fafc; } td.n { text-align: right; font-variant-numeric: tabular-nums; }
+.up { color: #38a169; font-weight: 600; } .down { color: #e53e3e; font-weight: 600; } .flat { color: #718096; }
+.cols { display: flex; gap: 2rem; flex-wrap: wrap; }
+.chart { font-size: 11px; fill: #4a5568; display: block; margin: .5rem 0 1rem; }
+.caption { color: #718096; font-size: .85rem; margin: .75rem 0 0; }
+.metrics { display: flex; gap: 2.5rem; } .metric b { display: block; font-size: 1.6rem; }
+.gauge { position: relative; width: 600px; height: 24px; margin: 1.5rem 0 2rem; }
+.gauge img { width: 100%; height: 100%; display: block; }
+.gauge span { position: absolute; top: -6px; width: 2px; height: 36px; background: #1a202c; }
+.gauge span i { position: absolute; top: 38px; left: -12px; font-size: .75rem; font-style: normal; }
+.flag { padding: .5rem .8rem; border-radius: 6px; margin: .35rem 0; }
+.critical { background: #fed7d7; } .warning { background: #fefcbf; } .positive { background: #c6f6d5; }
+"""
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8">
+<title>{{ title }} — Financial Analysis</title>
+<link rel="stylesheet" href="assets/report.css"></head>
+<body>
+<h1>{{ title }}</h1>
+{% if subtitle %}<p class="sub">{{ subtitle }}</p>{% endif %}
+
+<h2>📊 Ratio Analysis</h2>
+{% for group, rows in ratios %}
+<h3>{{ group }}</h3>
+<table><tr><th>Ratio</th><th>Current Year</th><th>Previous Year</th><th>Change</th><th>Change %</th></tr>
+{% for label, cy, py, change, pct in rows %}<tr><td>{{ label }}</td><td class="n">{{ cy|num }}</td>
+<td class="n">{{ py|num }}</td><td class="n {{ change|sign }}">{{ change|num }}</td>
+<td class="n {{ pct|sign }}">{{ pct|num }}</td></tr>
+{% endfor %}</table>
+{% endfor %}
+
+<h2>📈 Horizontal Analysis (Year-on-Year %)</h2>
+<table><tr><th>Item</th><th>Previous Year</th><th>Current Year</th><th>Change (%)</th><th>Trend</th></tr>
+{% for label, py, cy, change in horizontal %}<tr><td>{{ label }}</td><td class="n">{{ py|num(",.2f") }}</td>
+<td class="n">{{ cy|num(",.2f") }}</td><td class="n {{ change|sign }}">{{ change|num }}</td>
+<td class="{{ change|sign }}">{{ change|trend }}</td></tr>
+{% endfor %}</table>
+<p class="caption">📊 Year-on-Year Growth (%)</p>
+{{ charts.growth }}
+
+<h2>📊 Vertical Analysis (Common Size)</h2>
+<div class="cols">
+{% for heading, rows, chart in [("Income Statement (% of Revenue)", income, charts.income),
+                                ("Balance Sheet (% of Total Assets)", balance, charts.balance)] %}
+<div><h3>{{ heading }}</h3>
+<table><tr><th></th><th>CY %</th><th>PY %</th></tr>
+{% for label, cy, py in rows %}<tr><td>{{ label }}</td><td class="n">{{ cy|num }}</td><td class="n">{{ py|num }}</td></tr>
+{% endfor %}</table>
+{{ chart }}</div>
+{% endfor %}
+</div>
+
+<h2>📉 Key Ratio Trends (CY vs PY)</h2>
+{% for caption, chart in charts.trends %}<p class="caption">📊 {{ caption }}</p>
+{{ chart }}
+{% endfor %}
+
+<h2>🧮 Altman Z-Score</h2>
+<div class="metrics">
+<div class="metric">Current Year Z-Score<b>{{ z[0]|num }}</b></div>
+<div class="metric">Previous Year Z-Score<b>{{ z[1]|num }}</b></div>
+<div class="metric">Interpretation<b style="color: {{ zone[1] }}; font-size: 1.05rem">{{ zone[0] }}</b></div>
+</div>
+<div class="gauge"><img src="assets/z_zones.svg" alt="">
+<span style="left: {{ '%.1f' % (marks[1] * 100) }}%; opacity: .45"><i>PY</i></span>
+<span style="left: {{ '%.1f' % (marks[0] * 100) }}%"><i>CY</i></span></div>
+<p class="caption">Zones: &lt; 1.8 Danger | 1.8–2.7 Distress | 2.7–3.0 Caution | &gt; 3.0 Safe</p>
+
+<h2>🚨 Red Flag &amp; Health Check</h2>
+<div class="metrics">
+<div class="metric">🔴 Critical Issues<b>{{ critical|length }}</b></div>
+<div class="metric">🟡 Warnings<b>{{ warnings|length }}</b></div>
+<div class="metric">✅ Positives<b>{{ positives|length }}</b></div>
+</div>
+{% for sev, msg in critical %}<div class="flag critical">{{ sev }}: {{ msg }}</div>
+{% endfor %}{% for sev, msg in warnings %}<div class="flag warning">{{ sev }}: {{ msg }}</div>
+{% endfor %}{% for msg in positives %}<div class="flag positive">✅ {{ msg }}</div>
+{% endfor %}{% if not critical and not warnings %}<div class="flag positive">✅ No major red flags detected. Financial health looks solid.</div>{% endif %}
+</body></html>
+"""
+
+@lru_cache(maxsize=None)
+def html_template():
+    """The compiled report template (compiled once per process)."""
+    import jinja2
+    env = jinja2.Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+    env.filters.update(num=_num, sign=_sign, trend=_trend)
+    return env.from_string(HTML_TEMPLATE)
+
+def write_assets(directory):
+    """The files every HTML report links to, written once per output directory."""
+    assets = os.path.join(directory, "assets")
+    os.makedirs(assets, exist_ok=True)
+    for name, text in (("report.css", STYLESHEET), ("z_zones.svg", z_scale_svg())):
+        with open(os.path.join(assets, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+def _split_flags(context):
+    critical = [f for f in context["flags"] if f[0] == red_flags.CRITICAL]
+    return critical, [f for f in context["flags"] if f[0] != red_flags.CRITICAL]
+
+def render_html(context):
+    from markupsafe import Markup
+    growth_rows = [(change,) for _, _, _, change in context["horizontal"]]
+    charts = {
+        "growth": svg_bars([label for label, *_ in context["horizontal"]], growth_rows,
+                           (("Change (%)", CY_COLOUR),)),
+        "income": svg_bars([label for label, *_ in context["income"]],
+                           [(cy,) for _, cy, _ in context["income"]], (("CY %", CY_COLOUR),)),
+        "balance": svg_bars([label for label, *_ in context["balance"]],
+                            [(cy, py) for _, cy, py in context["balance"]],
+                            (("CY %", CY_COLOUR), ("PY %", PY_COLOUR))),
+        "trends": [(caption, Markup(svg_bars([label for label, *_ in items],
+                                             [(py, cy) for _, py, cy in items],
+                                             (("Previous Year", PY_COLOUR), ("Current Year", CY_COLOUR)))))
+                   for caption, items in context["trends"]],
+    }
+    for key in ("growth", "income", "balance"):
+        charts[key] = Markup(charts[key])
+    critical, warnings = _split_flags(context)
+    z_cy, z_py = context["z"]
+    return html_template().render(
+        context, charts=charts, critical=critical, warnings=warnings,
+        zone=z_label(z_cy), marks=(_z_position(z_cy), _z_position(z_py)),
+    ).encode("utf-8")
+
+
+# --------------------------------------------------
+# XLSX (SpreadsheetML parts in a zip)
+# --------------------------------------------------
+
+XLSX_SHEETS = (
+    ("Summary",    (14, 34)),
+    ("Ratios",     (22, 30, 14, 14, 14, 14)),
+    ("Horizontal", (24, 18, 18, 14, 8)),
+    ("Vertical",   (20, 22, 10, 10)),
+    ("Red Flags",  (14, 90)),
+)
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Cell styles: 0 text, 1 header (bold), 2 number (0.00), 3 amount (#,##0.00)
+_STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet {_NS}><numFmts count="1"><numFmt numFmtId="164" formatCode="0.00"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+@lru_cache(maxsize=None)
+def _xlsx_static():
+    # Parts identical in every workbook, and each sheet's header (column widths)
+    sheets = "".join(f'<sheet name="{name}" sheetId="{i}" r:id="rId{i}"/>'
+                     for i, (name, _) in enumerate(XLSX_SHEETS, 1))
+    rels = "".join(f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                   for i in range(1, len(XLSX_SHEETS) + 1))
+    overrides = "".join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType='
+                        f'"application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                        for i in range(1, len(XLSX_SHEETS) + 1))
+    xml = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    parts = {
+        "[Content_Types].xml": (
+            f'{xml}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType='
+            f'"application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>{overrides}</Types>'),
+        "_rels/.rels": (
+            f'{xml}<Relationships xmlns="{_PKG_REL_NS}"><Relationship Id="rId1" '
+            f'Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'),
+        "xl/workbook.xml": f'{xml}<workbook {_NS} xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>',
+        "xl/_rels/workbook.xml.rels": (
+            f'{xml}<Relationships xmlns="{_PKG_REL_NS}">{rels}'
+            f'<Relationship Id="rId{len(XLSX_SHEETS) + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+            '</Relationships>'),
+        "xl/styles.xml": _STYLES,
+    }
+    heads = [xml + f'<worksheet {_NS}><cols>' + "".join(
+                 f'<col min="{c}" max="{c}" width="{w}" customWidth="1"/>' for c, w in enumerate(widths, 1))
+             + "</cols><sheetData>"
+             for _, widths in XLSX_SHEETS]
+    return {name: text.encode("utf-8") for name, text in parts.items()}, heads
+
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _cell(ref, value, style=0):
+    if isinstance(value, str):
+        text = escape(_ILLEGAL_XML.sub("", value))
+        return f'<c r="{ref}" t="inlineStr" s="{style}"><is><t xml:space="preserve">{text}</t></is></c>'
+    if value is None or not math.isfinite(value):
+        return ""
+    return f'<c r="{ref}" s="{style}"><v>{value!r}</v></c>'
+
+def _sheet(head, rows):
+    # ``rows`` of ``(value, style)`` cells; columns A, B, ...
+    out = [head]
+    for r, cells in enumerate(rows, 1):
+        out.append(f'<row r="{r}">')
+        out.extend(_cell(f"{chr(65 + c)}{r}", v, s) for c, (v, s) in enumerate(cells))
+        out.append("</row>")
+    out.append("</sheetData></worksheet>")
+    return "".join(out).encode("utf-8")
+
+def _header(*names):
+    return [(name, 1) for name in names]
+
+def render_xlsx(context):
+    import io
+    static, heads = _xlsx_static()
+    critical, warnings = _split_flags(context)
+    z_cy, z_py = context["z"]
+    summary = [
+        [("Company", 1), (context["title"], 0)],
+        [("Details", 1), (context["subtitle"], 0)],
+        [("Z-Score CY", 1), (z_cy, 2)],
+        [("Z-Score PY", 1), (z_py, 2)],
+        [("Zone", 1), (z_label(z_cy)[0], 0)],
+        [("Critical", 1), (len(critical), 0)],
+        [("Warnings", 1), (len(warnings), 0)],
+        [("Positives", 1), (len(context["positives"]), 0)],
+    ]
+    ratios = [_header("Group", "Ratio", "Current Year", "Previous Year", "Change", "Change %")]
+    ratios += [[(group, 0), (label, 0)] + [(v, 2) for v in values]
+               for group, rows in context["ratios"] for label, *values in rows]
+    horizontal = [_header("Item", "Previous Year", "Current Year", "Change (%)", "Trend")]
+    horizontal += [[(label, 0), (py, 3), (cy, 3), (change, 2), (_trend(change), 0)]
+                   for label, py, cy, change in context["horizontal"]]
+    vertical = [_header("Statement", "Item", "CY %", "PY %")]
+    vertical += [[(statement, 0), (label, 0), (cy, 2), (py, 2)]
+                 for statement, rows in (("Income Statement", context["income"]),
+                                         ("Balance Sheet", context["balance"]))
+                 for label, cy, py in rows]
+    flags = [_header("Severity", "Message")]
+    flags += [[(sev, 0), (msg, 0)] for sev, msg in critical + warnings]
+    flags += [[(red_flags.POSITIVE, 0), (msg, 0)] for msg in context["positives"]]
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+        for name, data in static.items():
+            z.writestr(name, data)
+        for i, (head, rows) in enumerate(zip(heads, (summary, ratios, horizontal, vertical, flags)), 1):
+            z.writestr(f"xl/worksheets/sheet{i}.xml", _sheet(head, rows))
+    return buf.getvalue()
+
+
+# --------------------------------------------------
+# PDF (base-14 Helvetica, WinAnsi text)
+# --------------------------------------------------
+
+PAGE_W, PAGE_H, MARGIN = 595, 842, 48
+
+# Characters outside WinAnsi: spelled out, or dropped with the emoji
+_PDF_CHARS = str.maketrans({"≥": ">=", "≤": "<=", "≠": "!=", "−": "-", "▲": "+", "▼": "-", "σ": "s"})
+# Helvetica advance widths (1/1000 em) of printable ASCII, for right-aligned cells
+_HELVETICA_WIDTHS = dict(zip(map(chr, range(32, 127)), map(int, """
+    278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556
+    556 556 278 278 584 584 584 556 1015 667 667 722 722 667 611 778 722 278 500 667 556 833 722 778
+    667 778 722 667 611 722 667 944 667 667 611 278 278 278 469 556 333 556 556 500 556 556 278 556
+    556 222 222 500 222 833 556 556 556 556 333 500 278 556 500 722 500 500 500 334 260 334 584
+""".split())), **{"—": 1000, "–": 556})
+
+@lru_cache(maxsize=4096)  # labels and headers repeat in every report
+def _pdf_text(s):
+    s = s.translate(_PDF_CHARS).encode("cp1252", "ignore").decode("cp1252").strip()
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _text_width(s, size):
+    return sum(_HELVETICA_WIDTHS.get(ch, 556) for ch in s) * size / 1000
+
+@lru_cache(maxsize=None)
+def _rgb(colour):
+    return " ".join(f"{int(colour[i:i + 2], 16) / 255:.3f}" for i in (1, 3, 5))
+
+@lru_cache(maxsize=None)
+def _pdf_z_scale(x, y, width, height):
+    # Altman zone bands as a content-stream fragment, drawn the same in every report
+    lo, hi = Z_SCALE
+    bounds = [hi] + [max(b, lo) for b, _, _ in Z_ZONES[:-1]] + [lo]
+    return "".join(f"{_rgb(colour)} rg {x + (bottom - lo) / (hi - lo) * width:.1f} {y} "
+                   f"{(top - bottom) / (hi - lo) * width:.1f} {height} re f\n"
+                   for (_, _, colour), top, bottom in zip(Z_ZONES, bounds, bounds[1:]))
+
+
+class PdfDocument:
+    """Pages of text, table rows and rectangles, laid out top to bottom."""
+
+    def __init__(self):
+        self.pages = []
+        self._new_page()
+
+    def _new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+        self.y = PAGE_H - MARGIN
+
+    def keep(self, height):
+        """Start a new page unless ``height`` more fits on this one."""
+        if self.y - height < MARGIN:
+            self._new_page()
+
+    def space(self, height):
+        """Move down ``height``, starting a new page if it does not fit."""
+        self.keep(height)
+        self.y -= height
+
+    def text(self, x, s, size=9, bold=False, colour=None, right=False):
+        s = _pdf_text(s)
+        if right:
+            x -= _text_width(s, size)
+        fill = _rgb(colour) + " rg " if colour else "0.176 0.216 0.282 rg "
+        self.ops.append(f"{fill}BT /{'F2' if bold else 'F1'} {size} Tf {x:.1f} {self.y:.1f} Td ({s}) Tj ET\n")
+
+    def rect(self, x, y, width, height, colour):
+        self.ops.append(f"{_rgb(colour)} rg {x:.1f} {y:.1f} {width:.1f} {height:.1f} re f\n")
+
+    def heading(self, s, size=13):
+        self.keep(size + 80)  # with a few lines of what follows
+        self.space(size + 14)
+        self.text(MARGIN, s, size, bold=True)
+        self.rect(MARGIN, self.y - 5, PAGE_W - 2 * MARGIN, 1, "#e2e8f0")
+        self.space(6)
+
+    def table(self, header, rows, widths, colours=None, bars=None, bar_colour=None, title=None):
+        """Rows of cells: the first column left-aligned text, the rest right-aligned.
+
+        ``bars`` (one value per row) are drawn as a bar chart right of the
+        table, in ``bar_colour`` or coloured by sign; with a tuple of
+        colours, one per series, ``bars`` holds a tuple of values per row.
+        A ``title`` is kept on the same page as the table.
+        """
+        self.keep(14 * (len(rows) + 1) + (20 if title else 0))
+        if title:
+            self.space(20)
+            self.text(MARGIN, title, 10, bold=True)
+        left = MARGIN + sum(widths) + 16
+        series = bar_colour if isinstance(bar_colour, tuple) else (bar_colour,)
+        if bars is not None:
+            rows_of_values = bars if isinstance(bar_colour, tuple) else [(v,) for v in bars]
+            zero, geometry = _bar_geometry(rows_of_values, len(series), PAGE_W - MARGIN - left)
+            bar_h = 8 / len(series)
+            bars = {}
+            for r, s, x, w, v in geometry:
+                bars.setdefault(r, []).append((s, x, w, v))
+        def line(cells, bold, row_colours=()):
+            self.space(14)
+            x = MARGIN
+            for c, (cell, width) in enumerate(zip(cells, widths)):
+                colour = row_colours[c] if c < len(row_colours) else None
+                if c == 0:
+                    self.text(x, cell, bold=bold)
+                else:
+                    self.text(x + width, cell, bold=bold, colour=colour, right=True)
+                x += width
+        line(header, True)
+        for i, cells in enumerate(rows):
+            line(cells, False, colours[i] if colours else ())
+            for s, x, w, v in bars.get(i, ()) if bars else ():
+                # the first series on top
+                self.rect(left + x, self.y - 1 + (len(series) - 1 - s) * bar_h, w, bar_h,
+                          series[s] or _sign_colour(v))
+        if bars is not None:
+            self.rect(left + zero, self.y - 2, 0.5, 14 * len(rows) + 2, "#cbd5e0")
+        self.space(6)
+
+    def tobytes(self):
+        # 1 catalog, 2 page tree, 3-4 fonts, then a page and its contents per page
+        objects = [None, None,
+                   b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+                   b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+        kids = []
+        pages = self.pages[:-1] if len(self.pages) > 1 and not self.pages[-1] else self.pages
+        for ops in pages:
+            stream = zlib.compress("".join(ops).encode("cp1252"), 6)
+            n = len(objects) + 1
+            kids.append(f"{n} 0 R")
+            objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_W} {PAGE_H}] "
+                           f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {n + 1} 0 R >>".encode())
+            objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for i, obj in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+        return bytes(out)
+
+def _sign_colour(v):
+    return UP if v > 0 else DOWN if v < 0 else FLAT
+
+def render_pdf(context):
+    doc = PdfDocument()
+    doc.space(16)
+    doc.text(MARGIN, context["title"], 18, bold=True)
+    if context["subtitle"]:
+        doc.space(16)
+        doc.text(MARGIN, context["subtitle"], 10, colour=FLAT)
+
+    critical, warnings = _split_flags(context)
+    z_cy, z_py = context["z"]
+    label, colour = z_label(z_cy)
+    doc.heading("Altman Z-Score")
+    doc.space(14)
+    doc.text(MARGIN, f"Current Year {_num(z_cy)}    Previous Year {_num(z_py)}    ", 10, bold=True)
+    doc.text(MARGIN + 250, label, 10, bold=True, colour=colour)
+    doc.space(26)
+    width = PAGE_W - 2 * MARGIN
+    doc.ops.append(_pdf_z_scale(MARGIN, round(doc.y, 1), width, 12))
+    for z, name, shade in ((z_py, "PY", FLAT), (z_cy, "CY", "#1a202c")):
+        x = MARGIN + _z_position(z) * width
+        doc.rect(x - 1, doc.y - 4, 2, 20, shade)
+        doc.ops.append(f"0 0 0 rg BT /F1 7 Tf {x - 5:.1f} {doc.y - 12:.1f} Td ({name}) Tj ET\n")
+    doc.space(28)
+    doc.text(MARGIN, "Zones: < 1.8 Danger | 1.8–2.7 Distress | 2.7–3.0 Caution | > 3.0 Safe", 8, colour=FLAT)
+
+    doc.heading("Red Flag & Health Check")
+    doc.space(14)
+    doc.text(MARGIN, f"Critical Issues {len(critical)}    Warnings {len(warnings)}    "
+                     f"Positives {len(context['positives'])}", 10, bold=True)
+    for sev, msg, shade in ([(s, m, DOWN) for s, m in critical] + [(s, m, "#b7791f") for s, m in warnings]
+                            + [(red_flags.POSITIVE, m, UP) for m in context["positives"]]):
+        doc.space(13)
+        doc.text(MARGIN, f"{sev}: {msg}", 9, colour=shade)
+    if not critical and not warnings:
+        doc.space(13)
+        doc.text(MARGIN, "No major red flags detected. Financial health looks solid.", 9, colour=UP)
+
+    doc.heading("Ratio Analysis")
+    widths = (200, 75, 75, 75, 75)
+    for group, rows in context["ratios"]:
+        doc.table(("Ratio", "Current Year", "Previous Year", "Change", "Change %"),
+                  [(label, _num(cy), _num(py), _num(d), _num(g)) for label, cy, py, d, g in rows], widths,
+                  [(None, None, None, _sign_colour(d), _sign_colour(g)) for _, _, _, d, g in rows],
+                  title=group)
+
+    doc.heading("Horizontal Analysis (Year-on-Year %)")
+    doc.table(("Item", "Previous Year", "Current Year", "Change (%)"),
+              [(label, _num(py, ",.2f"), _num(cy, ",.2f"), _num(g)) for label, py, cy, g in context["horizontal"]],
+              (140, 95, 95, 75),
+              [(None, None, None, _sign_colour(g)) for *_, g in context["horizontal"]],
+              bars=[g for *_, g in context["horizontal"]])
+
+    doc.heading("Vertical Analysis (Common Size)")
+    for heading, rows in (("Income Statement (% of Revenue)", context["income"]),
+                          ("Balance Sheet (% of Total Assets)", context["balance"])):
+        doc.table(("", "CY %", "PY %"), [(label, _num(cy), _num(py)) for label, cy, py in rows], (160, 80, 80),
+                  bars=[cy for _, cy, _ in rows], bar_colour=CY_COLOUR, title=heading)
+
+    doc.heading("Key Ratio Trends (CY vs PY)")
+    doc.space(12)
+    for x, (name, shade) in zip((MARGIN, MARGIN + 90), (("Previous Year", PY_COLOUR), ("Current Year", CY_COLOUR))):
+        doc.rect(x, doc.y - 1, 8, 8, shade)
+        doc.text(x + 12, name, 8, colour=FLAT)
+    for caption, items in context["trends"]:
+        doc.table(("", "Previous Year", "Current Year"), [(label, _num(py), _num(cy)) for label, py, cy in items],
+                  (160, 80, 80), bars=[(py, cy) for _, py, cy in items], bar_colour=(PY_COLOUR, CY_COLOUR),
+                  title=caption)
+    return doc.tobytes()
+
+
+RENDERERS = {"html": render_html, "xlsx": render_xlsx, "pdf": render_pdf}
+
+
+# --------------------------------------------------
+# Export pipeline
+# --------------------------------------------------
+
+def write_reports(task):
+    """Render and write one batch of contexts; returns ``(documents, bytes)``."""
+    contexts, fmt, directory = task
+    render, size = RENDERERS[fmt], 0
+    for context in contexts:
+        data = render(context)
+        with open(os.path.join(directory, filename(context, fmt)), "wb") as f:
+            f.write(data)
+        size += len(data)
+    return len(contexts), size
+
+
+def _tasks(chunks, fmt, directory, batch_size):
+    first = 0
+    for chunk in chunks:
+        contexts = report_contexts(chunk, first)
+        first += len(contexts)
+        for i in range(0, len(contexts), batch_size):
+            yield contexts[i:i + batch_size], fmt, directory
+
+
+def export(input_path, directory, fmt="html", workers=1, chunk_size=10_000, batch_size=100,
+           industry=None, log=sys.stderr):
+    """One ``fmt`` report per company of ``input_path`` into ``directory``.
+
+    Returns ``(documents, bytes written, seconds)``. With ``workers`` > 1
+    batches of ``batch_size`` reports are rendered on a process pool.
+    ``industry`` is the industry of every row when the input has no
+    ``industry`` column.
+    """
+    from batch import _with_industry, read_chunks
+    if fmt not in RENDERERS:
+        raise ValueError(f"unknown report format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    os.makedirs(directory, exist_ok=True)
+    if fmt == "html":
+        write_assets(directory)
+        html_template()  # compiled here, so forked workers inherit it
+    chunks = read_chunks(input_path, chunk_size)
+    if industry is not None:
+        chunks = (_with_industry(chunk, industry) for chunk in chunks)
+    tasks = _tasks(chunks, fmt, directory, batch_size)
+
+    documents = size = 0
+    start = time.perf_counter()
+
+    def done(result):
+        nonlocal documents, size
+        documents += result[0]
+        size += result[1]
+        if log and documents % (batch_size * max(workers, 1) * 10) < batch_size:
+            elapsed = time.perf_counter() - start
+            print(f"{documents:,} reports  {documents / elapsed:,.0f} reports/sec", file=log)
+
+    if workers <= 1:
+        for task in tasks:
+            done(write_reports(task))
+    else:
+        method = "fork" if "fork" in get_all_start_methods() else None
+        with get_context(method).Pool(workers) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.apply_async(write_reports, (task,)))
+                if len(pending) >= 2 * workers:
+                    done(pending.popleft().get())
+            while pending:
+                done(pending.popleft().get())
+    return documents, size, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a report for every company in a file of statements.")
+    parser.add_argument("input", help="CSV, Parquet or Excel (needs openpyxl) file of statements")
+    parser.add_argument("output", help="directory to write the reports to")
+    parser.add_argument("--format", choices=FORMATS, default="html")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; 0 = one per core (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=10_000,
+                        help="companies analysed at a time (default: 10000)")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="reports per worker task (default: 100)")
+    parser.add_argument("--industry", help="industry of every row when the input has no industry column")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    documents, size, elapsed = export(args.input, args.output, args.format, workers, args.chunk_size,
+                                      args.batch_size, args.industry, log=None if args.quiet else sys.stderr)
+    rate = documents / elapsed if elapsed else 0.0
+    print(f"Wrote {documents:,} {args.format.upper()} reports ({size / 1e6:,.1f} MB) in {elapsed:.2f}s "
+          f"({rate:,.0f} reports/sec) -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Content-hashed cache for analysis results.
+
+Results are keyed on a hash of the normalised input vector (every
+``<line>_cy`` / ``<line>_py`` field plus context such as industry and
+currency), so the same company analysed twice — in one session or across
+sessions on a shared server — is computed once. The in-memory tier is a
+bounded LRU; an optional on-disk tier (pickles under ``directory``) survives
+restarts and is bounded by entry count, evicting least recently used files.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from ratio_engine import line_values
+
+
+_MISSING = object()
+
+
+def _code_version():
+    # Results depend on the formulas, so any edit to the engine invalidates
+    # entries written by an older version (important for the disk tier).
+    # What is cached is the page's display model, though, which file hashes
+    # of the engine do not cover: that is ``SECTIONS_VERSION``.
+    h = hashlib.blake2b(digest_size=8)
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ("ratio_engine.py", "red_flags.py"):
+        try:
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+# Version of the cached display model — ``main.build_section``'s section
+# layout, labels and frames. Bump it with any change to what that returns.
+SECTIONS_VERSION = 1
+
+CODE_VERSION = f"{_code_version()}-{SECTIONS_VERSION}"
+
+
+def input_key(inputs, **context):
+    """Stable hex digest of ``inputs`` (line fields, missing = 0) and ``context``.
+
+    ``inputs`` is a single company: a mapping or a one-record statement array.
+    """
+    vec = line_values(inputs).ravel()
+    vec += 0.0  # -0.0 and 0.0 are the same input
+    h = hashlib.blake2b(digest_size=20)
+    h.update(CODE_VERSION.encode())
+    for name in sorted(context):
+        h.update(f"\0{name}={context[name]}".encode())
+    h.update(vec.tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU cache with an optional on-disk second tier."""
+
+    def __init__(self, maxsize=256, directory=None, disk_maxsize=10_000):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.disk_maxsize = disk_maxsize
+        self.hits = self.disk_hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_count = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_count = sum(1 for _ in self._disk_files())
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data or (self.directory is not None
+                                     and os.path.exists(self._path(key)))
+
+    # ---------- public API ----------
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+        value = self._load(key)
+        if value is not _MISSING:
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, value)
+            return value
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value)
+        self._store(key, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        for path in self._disk_files():
+            os.remove(path)
+        self._disk_count = 0
+
+    # ---------- memory tier ----------
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # ---------- disk tier ----------
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def _disk_files(self):
+        if not self.directory:
+            return
+        for sub in os.scandir(self.directory):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(".pkl"):
+                        yield entry.path
+
+    def _load(self, key):
+        if not self.directory:
+            return _MISSING
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return _MISSING
+        except Exception:
+            # Truncated or unreadable entry: drop it and recompute
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return _MISSING
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def _store(self, key, value):
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        if not existed:
+            with self._lock:
+                self._disk_count += 1
+                over = self._disk_count > self.disk_maxsize
+            if over:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Trim to 90% of the bound so eviction is not paid on every write
+        files = []
+        for path in self._disk_files():
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        files.sort()
+        excess = len(files) - int(self.disk_maxsize * 0.9)
+        for _, path in files[:max(excess, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_count = len(files) - max(excess, 0)
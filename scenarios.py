@@ -0,0 +1,193 @@
+"""
+What-if sensitivity grids.
+
+Varies one or two statement lines of a single company over a grid of
+relative changes — revenue ±30% × COGS ±20%, debt ±50% — and evaluates
+every ratio, the Altman Z-score and the red flags at every grid point in
+one ``ratio_engine.analyse`` call: the grid is laid out as the rows of a
+columnar table (unvaried lines are zero-stride broadcasts of the base
+value) and each result column is reshaped back to the grid.
+
+A change to a line also moves the subtotals built from it (``FLOWS``):
+more revenue is more gross profit, EBIT and profit; more debt is more total
+liabilities. Subtotals left at 0 are not touched, since 0 means "not
+entered" and the engine derives or ignores them.
+
+    from scenarios import axis, sensitivity
+    grid = sensitivity(inputs, axis("revenue", 0.30), axis("cogs", 0.20))
+    grid["z_cy"]             # (41, 41) Z-scores
+    grid["critical_count"]   # (41, 41) critical red flags
+
+``simulate_z`` is the probabilistic counterpart for the Altman Z-score:
+it draws perturbed statements from per-line uncertainty and reports how
+likely each zone is.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from ratio_engine import LINE_KEYS, Z_ZONES, altman, analyse, to_statements, z_zone
+
+
+# One grid dimension: a statement line and the relative changes applied to it
+Axis = namedtuple("Axis", ["line", "changes"])
+
+def axis(line, span, steps=41):
+    """``line`` varied over ``±span`` (0.3 = ±30%) in ``steps`` evenly spaced points."""
+    if line not in LINE_KEYS:
+        raise KeyError(f"unknown statement line {line!r}")
+    return Axis(line, np.linspace(-span, span, steps))
+
+
+# --------------------------------------------------
+# Flow-through to subtotals
+# --------------------------------------------------
+# line -> (subtotal, sign) pairs. Pre-tax changes reach PAT in full (no tax
+# effect); balance sheet changes stop at the totals they sit in.
+
+_PROFIT_BELOW_EBITDA = (("ebitda", 1), ("ebit", 1), ("pbt", 1), ("pat", 1))
+
+FLOWS = {
+    "revenue":        (("gross", 1),) + _PROFIT_BELOW_EBITDA,
+    "cogs":           (("gross", -1),) + tuple((k, -s) for k, s in _PROFIT_BELOW_EBITDA),
+    "gross":          _PROFIT_BELOW_EBITDA,
+    "ebitda":         _PROFIT_BELOW_EBITDA[1:],
+    "ebit":           _PROFIT_BELOW_EBITDA[2:],
+    "pbt":            _PROFIT_BELOW_EBITDA[3:],
+    "sga":            tuple((k, -s) for k, s in _PROFIT_BELOW_EBITDA),
+    "depreciation":   (("ebit", -1), ("pbt", -1), ("pat", -1)),
+    "interest":       (("pbt", -1), ("pat", -1)),
+    "tax":            (("pat", -1),),
+    "cash":           (("current_assets", 1), ("total_assets", 1)),
+    "receivables":    (("current_assets", 1), ("total_assets", 1)),
+    "inventory":      (("current_assets", 1), ("total_assets", 1)),
+    "current_assets": (("total_assets", 1),),
+    "net_ppe":        (("total_assets", 1),),
+    "st_debt":        (("total_debt", 1), ("total_liab", 1)),
+    "lt_debt":        (("total_debt", 1), ("total_liab", 1)),
+    "total_debt":     (("total_liab", 1),),
+    "current_liab":   (("total_liab", 1),),
+}
+
+
+# --------------------------------------------------
+# Evaluation
+# --------------------------------------------------
+
+def scenario_table(table, axes, period="cy", flow_through=True):
+    """Columnar table with one row per grid point (C order), and the grid shape.
+
+    ``table`` holds one company (a statement record, dict or one-row frame);
+    each axis changes ``<line>_<period>`` by ``base * change``.
+    """
+    base = to_statements(table)[0]
+    shape = tuple(len(a.changes) for a in axes)
+    columns = {name: np.broadcast_to(base[name], shape) for name in base.dtype.names}
+    for i, ax in enumerate(axes):
+        changes = np.asarray(ax.changes, dtype=np.float64)
+        delta = base[f"{ax.line}_{period}"] * changes.reshape([-1 if j == i else 1 for j in range(len(axes))])
+        targets = [(ax.line, 1)]
+        if flow_through:
+            targets += [(k, s) for k, s in FLOWS.get(ax.line, ()) if base[f"{k}_{period}"] != 0]
+        for key, sign in targets:
+            col = f"{key}_{period}"
+            columns[col] = columns[col] + sign * delta
+    n = int(np.prod(shape))
+    return {name: np.broadcast_to(col, shape).reshape(n) for name, col in columns.items()}, shape
+
+def sensitivity(table, *axes, period="cy", flow_through=True, industry=None):
+    """Every ``analyse`` output at every point of the grid spanned by ``axes``.
+
+    Returns a dict of arrays shaped ``(len(axes[0].changes), ...)``, keyed as
+    ``analyse`` keys its columns (``z_cy``, ``cr_cy``, ``critical_count`` ...).
+    """
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("a sensitivity grid has one or two axes")
+    if len({a.line for a in axes}) < len(axes):
+        raise ValueError("each axis must vary a different line")
+    rows, shape = scenario_table(table, axes, period, flow_through)
+    results = analyse(rows, industry=industry)
+    return {name: np.asarray(values).reshape(shape) for name, values in results.items()}
+
+
+def grid_frame(grid, axes, columns):
+    """Long-form DataFrame of ``columns`` over the grid, one row per point.
+
+    Axis columns are named after their line and hold the change in percent.
+    """
+    import pandas as pd
+    coords = np.meshgrid(*(np.asarray(a.changes) * 100 for a in axes), indexing="ij")
+    data = {a.line: c.ravel() for a, c in zip(axes, coords)}
+    data.update((c, np.asarray(grid[c]).ravel()) for c in columns)
+    return pd.DataFrame(data)
+
+
+# --------------------------------------------------
+# Monte Carlo: Altman Z-score distribution
+# --------------------------------------------------
+# Each input is drawn independently as base + |base| * sd * N(0, 1), so an
+# sd of 0.1 is "±10% one standard deviation" whatever the sign of the base.
+# Every input has its own random stream, so results depend on the seed and
+# the number of draws but not on the chunk size.
+
+# Altman inputs, in ``altman()`` argument order, as the lines they come from
+Z_INPUTS = ("working_capital", "total_assets", "retained", "ebit", "equity", "total_liab", "revenue")
+
+ZSimulation = namedtuple("ZSimulation", [
+    "draws", "base", "probabilities", "mean", "std", "bin_edges", "counts",
+])
+
+Z_BINS = np.linspace(-2.0, 8.0, 101)
+
+def z_inputs(table, period="cy"):
+    """Base values of ``Z_INPUTS`` for the first company of ``table``."""
+    base = to_statements(table)[0]
+    values = {name: float(base[f"{name}_{period}"]) for name in Z_INPUTS if name != "working_capital"}
+    values["working_capital"] = float(base[f"current_assets_{period}"] - base[f"current_liab_{period}"])
+    return values
+
+def simulate_z(table, uncertainty, draws=100_000, seed=0, chunk_size=250_000, period="cy"):
+    """Distribution of the Altman Z-score under ``uncertainty``.
+
+    ``uncertainty`` maps names in ``Z_INPUTS`` to a relative standard
+    deviation (``{"revenue": 0.1, "ebit": 0.2}``); other inputs stay at their
+    base value. Scores are computed ``chunk_size`` draws at a time, so memory
+    is bounded however many draws are asked for. ``probabilities`` is one
+    value per ``Z_ZONES`` entry, top zone first; scores outside ``Z_BINS``
+    are counted in the outermost bins.
+    """
+    unknown = set(uncertainty).difference(Z_INPUTS)
+    if unknown:
+        raise KeyError(f"cannot simulate {sorted(unknown)}; choose from {Z_INPUTS}")
+    base = z_inputs(table, period)
+    streams = dict(zip(Z_INPUTS, (np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(len(Z_INPUTS)))))
+
+    zones = np.zeros(len(Z_ZONES), dtype=np.int64)
+    counts = np.zeros(len(Z_BINS) - 1, dtype=np.int64)
+    total = total_sq = 0.0
+    for start in range(0, draws, chunk_size):
+        n = min(chunk_size, draws - start)
+        args = []
+        for name in Z_INPUTS:
+            sd = uncertainty.get(name, 0.0)
+            if sd:
+                args.append(base[name] + abs(base[name]) * sd * streams[name].standard_normal(n))
+            else:
+                args.append(base[name])
+        z = np.broadcast_to(altman(*args), (n,))
+        zones += np.bincount(z_zone(z), minlength=len(Z_ZONES))
+        counts += np.histogram(np.clip(z, Z_BINS[0], Z_BINS[-1]), Z_BINS)[0]
+        total += z.sum()
+        total_sq += np.square(z).sum()
+
+    mean = total / draws
+    return ZSimulation(
+        draws=draws,
+        base=float(altman(*(base[name] for name in Z_INPUTS))),
+        probabilities=zones / draws,
+        mean=mean,
+        std=float(np.sqrt(max(total_sq / draws - mean ** 2, 0.0))),
+        bin_edges=Z_BINS,
+        counts=counts,
+    )
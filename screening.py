@@ -0,0 +1,244 @@
+"""
+Screening store: "find all companies where…" over batch results.
+
+``build_store`` writes the output of ``batch.py`` (every ratio, growth
+column and red flag per company) as a Parquet file with min/max statistics
+per row group, clustered on the columns screens usually filter by.
+``ScreeningStore`` memory-maps that file and answers screens such as
+
+    z_cy < 1.8 and cr_cy < 1.0 and growth_receivables > growth_revenue + 15
+
+by first ruling out every row group whose statistics show it cannot match,
+then filtering the rest exactly — no full scan and no recompute.
+
+    python screening.py build results.parquet store.parquet
+    python screening.py query store.parquet "z_cy < 1.8 and cr_cy < 1" -c company z_cy cr_cy
+"""
+
+import argparse
+import re
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from red_flags import COMPARATORS
+
+
+# --------------------------------------------------
+# Conditions
+# --------------------------------------------------
+# ``column <op> threshold``, or ``column <op> versus * scale + threshold`` —
+# the same shape as a red-flag rule, so rules can be used as screens.
+
+Condition = namedtuple("Condition", ["column", "op", "threshold", "versus", "scale"],
+                       defaults=(None, 1.0))
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_CONDITION = re.compile(
+    rf"^\s*(?P<column>\w+)\s*(?P<op><=|>=|==|!=|<|>)\s*"
+    rf"(?:(?P<value>{_NUMBER}|true|false)"
+    rf"|(?:(?P<scale>{_NUMBER})\s*\*\s*)?(?P<versus>[A-Za-z_]\w*)"
+    rf"(?:\s*(?P<sign>[-+])\s*(?P<offset>{_NUMBER}))?)\s*$",
+    re.IGNORECASE,
+)
+
+def parse(screen):
+    """``"a < 1 and b > c + 15"`` -> ``[Condition, ...]``. Conditions may also be passed as-is."""
+    if not isinstance(screen, str):
+        return [c if isinstance(c, Condition) else Condition(*c) for c in screen]
+    conditions = []
+    for part in re.split(r"\s+and\s+", screen.strip(), flags=re.IGNORECASE):
+        m = _CONDITION.match(part)
+        if m is None:
+            raise ValueError(f"cannot parse screen condition {part!r}")
+        if m["value"] is not None:
+            value = m["value"].lower()
+            threshold = {"true": True, "false": False}.get(value)
+            conditions.append(Condition(m["column"], m["op"],
+                                        float(value) if threshold is None else threshold))
+        else:
+            offset = float(m["offset"]) if m["offset"] else 0.0
+            conditions.append(Condition(
+                m["column"], m["op"], -offset if m["sign"] == "-" else offset,
+                m["versus"], float(m["scale"]) if m["scale"] else 1.0,
+            ))
+    return conditions
+
+
+def _may_match(cond, bounds):
+    # Can any row of a row group with these (min, max) bounds satisfy cond?
+    lo, hi = bounds[cond.column]
+    if cond.versus is None:
+        r_lo = r_hi = cond.threshold
+    else:
+        v_lo, v_hi = bounds[cond.versus]
+        if v_lo is None:
+            return True
+        if cond.scale < 0:
+            v_lo, v_hi = v_hi, v_lo
+        r_lo = v_lo * cond.scale + cond.threshold
+        r_hi = v_hi * cond.scale + cond.threshold
+    if lo is None:
+        return True
+    if cond.op == "<":
+        return lo < r_hi
+    if cond.op == "<=":
+        return lo <= r_hi
+    if cond.op == ">":
+        return hi > r_lo
+    if cond.op == ">=":
+        return hi >= r_lo
+    if cond.op == "==":
+        return lo <= r_hi and r_lo <= hi
+    return not (lo == hi == r_lo == r_hi)  # "!="
+
+
+def _mask(cond, columns):
+    lhs = columns[cond.column]
+    rhs = cond.threshold
+    if cond.versus is not None:
+        rhs = columns[cond.versus] * cond.scale + cond.threshold
+    return COMPARATORS[cond.op](lhs, rhs)
+
+
+# --------------------------------------------------
+# Store
+# --------------------------------------------------
+
+DEFAULT_CLUSTER = ("z_cy", "cr_cy")
+
+def build_store(source, path, cluster_by=DEFAULT_CLUSTER, row_group_size=50_000):
+    """Write ``source`` (a results Parquet path or Arrow table) as a screening store.
+
+    Rows are sorted by ``cluster_by`` so row groups cover narrow value ranges
+    of those columns and screens on them skip most of the file; smaller row
+    groups prune more finely at some cost in file size.
+    """
+    import pyarrow.parquet as pq
+    table = pq.read_table(source, memory_map=True) if isinstance(source, str) else source
+    keys = [(c, "ascending") for c in cluster_by if c in table.column_names]
+    if keys:
+        table = table.sort_by(keys)
+    pq.write_table(table, path, row_group_size=row_group_size, write_statistics=True)
+    return table.num_rows
+
+
+class ScreeningStore:
+    """Memory-mapped screening store; ``query`` prunes row groups on min/max statistics."""
+
+    def __init__(self, path):
+        import pyarrow.parquet as pq
+        self.path = path
+        self.file = pq.ParquetFile(path, memory_map=True)
+        self.columns = self.file.schema_arrow.names
+        self.num_rows = self.file.metadata.num_rows
+        self.num_row_groups = self.file.metadata.num_row_groups
+        self.groups_read = 0
+        self._bounds = [{} for _ in range(self.num_row_groups)]
+
+    def bounds(self, group, column):
+        """``(min, max)`` of ``column`` in row group ``group``; ``(None, None)`` if unknown."""
+        cached = self._bounds[group]
+        if column not in cached:
+            meta = self.file.metadata.row_group(group)
+            stats = meta.column(self.columns.index(column)).statistics
+            if stats is not None and stats.has_min_max:
+                cached[column] = (stats.min, stats.max)
+            else:
+                cached[column] = (None, None)
+        return cached[column]
+
+    def candidate_groups(self, conditions):
+        """Row groups whose statistics do not rule out every condition."""
+        names = {c.column for c in conditions} | {c.versus for c in conditions if c.versus}
+        unknown = names.difference(self.columns)
+        if unknown:
+            raise KeyError(f"no such column(s) in store: {sorted(unknown)}")
+        groups = []
+        for g in range(self.num_row_groups):
+            bounds = {n: self.bounds(g, n) for n in names}
+            if all(_may_match(c, bounds) for c in conditions):
+                groups.append(g)
+        return groups
+
+    def query(self, screen, columns=None, limit=None):
+        """Rows matching every condition of ``screen`` as an Arrow table.
+
+        ``columns`` selects the output columns (default: all); ``limit``
+        stops reading once that many rows have matched.
+        """
+        import pyarrow as pa
+        conditions = parse(screen)
+        needed = sorted({c.column for c in conditions} | {c.versus for c in conditions if c.versus})
+        output = list(columns) if columns is not None else self.columns
+        self.groups_read = 0
+        parts, found = [], 0
+        for g in self.candidate_groups(conditions):
+            chunk = self.file.read_row_group(g, columns=needed)
+            self.groups_read += 1
+            values = {n: chunk.column(n).to_numpy() for n in needed}
+            mask = np.ones(chunk.num_rows, dtype=bool)
+            for cond in conditions:
+                mask &= _mask(cond, values)
+            if not mask.any():
+                continue
+            rows = self.file.read_row_group(g, columns=output).filter(pa.array(mask))
+            parts.append(rows)
+            found += rows.num_rows
+            if limit is not None and found >= limit:
+                break
+        if not parts:
+            return self.file.schema_arrow.empty_table().select(output)
+        result = pa.concat_tables(parts)
+        return result.slice(0, limit) if limit is not None else result
+
+    def count(self, screen):
+        """Number of rows matching ``screen``."""
+        conditions = parse(screen)
+        return self.query(conditions, columns=[conditions[0].column]).num_rows
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query a screening store of batch results.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="write batch results as a screening store")
+    build.add_argument("results", help="Parquet output of batch.py")
+    build.add_argument("store", help="store file to write")
+    build.add_argument("--cluster-by", nargs="*", default=list(DEFAULT_CLUSTER),
+                       help="columns to sort by (default: z_cy cr_cy)")
+    build.add_argument("--row-group-size", type=int, default=50_000)
+
+    query = sub.add_parser("query", help="run a screen against a store")
+    query.add_argument("store")
+    query.add_argument("screen", help='e.g. "z_cy < 1.8 and cr_cy < 1.0"')
+    query.add_argument("-c", "--columns", nargs="*", help="output columns (default: all)")
+    query.add_argument("-o", "--output", help="write matches to this CSV or Parquet file")
+    query.add_argument("-n", "--limit", type=int, help="stop after this many matches")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        rows = build_store(args.results, args.store, args.cluster_by, args.row_group_size)
+        print(f"Wrote {rows:,} rows -> {args.store}", file=sys.stderr)
+        return
+
+    store = ScreeningStore(args.store)
+    result = store.query(args.screen, args.columns, args.limit)
+    print(f"{result.num_rows:,} matches ({store.groups_read} of {store.num_row_groups} row groups read)",
+          file=sys.stderr)
+    if args.output:
+        from batch import Writer
+        writer = Writer(args.output)
+        writer.write(result)
+        writer.close()
+    else:
+        print(result.to_pandas().to_string(max_rows=50))
+
+
+if __name__ == "__main__":
+    main()
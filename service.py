@@ -0,0 +1,464 @@
+"""
+Analysis HTTP service.
+
+Serves what the page shows — every ratio, the Altman Z-score and zone, and
+the red flags — as JSON to other systems, from a plain asyncio server
+(standard library only):
+
+    python service.py --port 8321
+    curl -s localhost:8321/analyse -d '{"company": "Acme", "revenue_cy": 1200, "cogs_cy": 700}'
+    python service.py --bench 20000       # offline load test over loopback
+
+``POST /analyse`` takes one statement object (answered with one result), a
+list of them or ``{"companies": [...], "industry": ...}`` (answered with a
+list). Statements use the batch column names (``revenue_cy`` ...; page
+labels work too, see ``batch.column_mapping``); missing or null lines are
+0 (non-finite numbers are refused), ``industry`` selects red-flag
+thresholds and any other field (company, id ...) is echoed back, except
+the result fields themselves (``RESULT_FIELDS``). ``GET /health`` reports
+counters.
+
+Concurrent requests are coalesced: a ``MicroBatcher`` collects the
+companies of every request that arrives within a short window (1 ms by
+default), or while the previous batch is running, and analyses them as one
+array batch on a worker thread. The per-call cost of the vectorised engine
+is paid once per batch rather than once per request, and the event loop
+keeps parsing requests meanwhile.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+import red_flags
+from batch import column_mapping
+from ratio_engine import LINE_KEYS, PERIODS, RATIO_GROUPS, Z_ZONES, analyse, current_view, z_zone
+
+
+RATIO_KEYS = tuple(key for _, ratios in RATIO_GROUPS for key, _, _ in ratios)
+ZONE_CODES = tuple(label.split()[1].lower() for _, label, _ in Z_ZONES)   # safe, caution ...
+SEVERITY = {red_flags.CRITICAL: "critical", red_flags.WARNING: "warning"}
+LINE_COLUMNS = tuple(f"{k}_{p}" for k in LINE_KEYS for p in PERIODS)
+_ROW = {c: i for i, c in enumerate(LINE_COLUMNS)}
+
+# Top-level fields of a result; a statement may not echo these back
+RESULT_FIELDS = frozenset({"altman", "red_flags", "ratios"})
+
+MAX_HEAD = 64 << 10
+MAX_BODY = 16 << 20
+
+
+class BadRequest(ValueError):
+    pass
+
+
+# --------------------------------------------------
+# Requests
+# --------------------------------------------------
+# A parsed request is ``(lines, industries, identifiers)``: a
+# ``(len(LINE_COLUMNS), n)`` matrix of its companies' statement lines, and
+# one industry and one dict of echoed fields per company.
+
+@lru_cache(maxsize=1024)
+def _fields(keys):
+    # Statement keys -> (line keys, their matrix rows, keys to echo back)
+    mapping = column_mapping(keys)
+    rows = np.array([_ROW[column] for column in mapping.values()], dtype=np.intp)
+    return tuple(mapping), rows, tuple(k for k in keys if k not in mapping and k != "industry")
+
+def parse_statements(payload):
+    """``(request, single)`` for a decoded ``/analyse`` body; raises ``BadRequest``."""
+    industry = None
+    if isinstance(payload, dict) and "companies" in payload:
+        industry, statements, single = payload.get("industry"), payload["companies"], False
+    elif isinstance(payload, dict):
+        statements, single = [payload], True
+    else:
+        statements, single = payload, False
+    if not isinstance(statements, list) or not statements or not all(isinstance(s, dict) for s in statements):
+        raise BadRequest('expected a statement object, a list of them or {"companies": [...]}')
+    if not isinstance(industry, (str, type(None))):
+        raise BadRequest("industry is not a string")
+
+    lines = np.zeros((len(LINE_COLUMNS), len(statements)))
+    industries, identifiers = [], []
+    for i, statement in enumerate(statements):
+        keys, rows, echo = _fields(tuple(statement))
+        values = [statement[k] for k in keys]
+        bad = next((k for k, v in zip(keys, values) if type(v) not in _NUMBER_TYPES), None)
+        if bad is None:
+            try:
+                column = np.array(values, dtype=np.float64)
+            except OverflowError:
+                column = np.full(len(values), np.inf)
+            if not np.isfinite(column).all():    # NaN is also a null line, which is fine
+                bad = next((k for k, v in zip(keys, values)
+                            if v is not None and not (abs(v) <= sys.float_info.max)), None)
+            lines[rows, i] = column
+        if bad is not None:
+            raise BadRequest(f"company {i}: {bad} is not a finite number")
+        clash = RESULT_FIELDS.intersection(echo)
+        if clash:
+            raise BadRequest(f"company {i}: {min(clash)} is a result field and cannot be echoed")
+        name = statement.get("industry")
+        if not isinstance(name, (str, type(None))):
+            raise BadRequest(f"company {i}: industry is not a string")
+        industries.append(name or industry or "")
+        identifiers.append({k: statement[k] for k in echo})
+    lines[np.isnan(lines)] = 0.0    # null lines, like blank ones on the page
+    return (lines, industries, identifiers), single
+
+# What a line may decode to (null is 0); booleans and numeric strings are not numbers
+_NUMBER_TYPES = frozenset({int, float, type(None)})
+
+
+# Ratio objects are formatted from one template per batch row rather than
+# through ``json.dumps`` (several times faster); values carry 12 significant
+# digits, and non-finite ones (JSON has no NaN) become null
+_RATIO_OBJECT = "{" + ",".join(f'"{k}":%s' for k in RATIO_KEYS) + "}"
+_FINITE_RATIO_OBJECT = _RATIO_OBJECT.replace("%s", "%.12g")
+
+def _ratio_objects(matrix):
+    finite = np.isfinite(matrix).all(axis=1).tolist()
+    return [_FINITE_RATIO_OBJECT % tuple(row) if ok else
+            _RATIO_OBJECT % tuple("%.12g" % v if np.isfinite(v) else "null" for v in row)
+            for ok, row in zip(finite, matrix.tolist())]
+
+def analyse_requests(requests):
+    """JSON documents (bytes), one list per request, for a batch of parsed requests."""
+    lines = np.concatenate([r[0] for r in requests], axis=1)
+    industries = [name for r in requests for name in r[1]]
+    out = analyse(dict(zip(LINE_COLUMNS, lines)), flags=False)
+    view = current_view(out)
+    rules = red_flags.evaluate(view, industries)
+    counts = red_flags.flag_columns(rules)
+    messages = red_flags.all_company_flags(rules, view)
+    cy = _ratio_objects(np.stack([out[f"{k}_cy"] for k in RATIO_KEYS], axis=1))
+    py = _ratio_objects(np.stack([out[f"{k}_py"] for k in RATIO_KEYS], axis=1))
+    z_cy, z_py = (np.where(np.isfinite(out[k]), out[k], None).tolist() for k in ("z_cy", "z_py"))
+    zones = z_zone(out["z_cy"]).tolist()
+    critical = counts["critical_count"].tolist()
+    warning = counts["warning_count"].tolist()
+
+    docs, i = [], 0
+    for request in requests:
+        request_docs = []
+        for echo in request[2]:
+            flags, positives = messages[i]
+            summary = json.dumps({
+                **echo,
+                "altman": {"z_cy": z_cy[i], "z_py": z_py[i], "zone": ZONE_CODES[zones[i]]},
+                "red_flags": {
+                    "critical": critical[i],
+                    "warning": warning[i],
+                    "flags": [{"severity": SEVERITY[sev], "message": msg} for sev, msg in flags],
+                    "positives": positives,
+                },
+            }, separators=(",", ":"))
+            request_docs.append(f'{summary[:-1]},"ratios":{{"cy":{cy[i]},"py":{py[i]}}}}}'.encode())
+            i += 1
+        docs.append(request_docs)
+    return docs
+
+
+# --------------------------------------------------
+# Micro-batching
+# --------------------------------------------------
+
+class MicroBatcher:
+    """Coalesces concurrent submissions into one ``fn(items)`` call on a worker thread.
+
+    ``fn`` returns one result per item. When idle, a batch runs ``window``
+    seconds after its first item arrives; while a batch runs, the next one
+    collects and runs as soon as it finishes, so batches grow with load
+    instead of queueing. A batch also runs once it holds ``max_size`` units
+    (``size(item)`` each). If a batch raises, its items are retried one at
+    a time, so only the item at fault fails.
+    """
+
+    def __init__(self, fn, window=0.001, max_size=4096, size=len):
+        self.fn = fn
+        self.window = window
+        self.max_size = max_size
+        self.size = size
+        self._pending = []
+        self._pending_size = 0
+        self._timer = None
+        self._in_flight = 0            # batches submitted and not yet finished
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="micro-batch")
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self._pending_size += self.size(item)
+        if self._pending_size >= self.max_size:
+            self._flush(force=True)
+        elif self._timer is None and not self._in_flight:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self, force=False):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._in_flight and not force:
+            return                     # runs when the current batch finishes
+        batch, self._pending, self._pending_size = self._pending, [], 0
+        if batch:
+            # A forced (full) batch queues behind a running one on the worker thread
+            self._in_flight += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self.fn, [item for item, _ in batch])
+        except Exception as e:
+            results = [e]
+            if len(batch) > 1:
+                # One item broke the batch: run each alone so only that one fails
+                results = []
+                for item, _ in batch:
+                    try:
+                        results.extend(await loop.run_in_executor(self._executor, self.fn, [item]))
+                    except Exception as e:
+                        results.append(e)
+        for (_, future), result in zip(batch, results):
+            if future.done():          # the client went away
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        self._in_flight -= 1
+        if self._pending and not self._in_flight:
+            self._flush()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+# --------------------------------------------------
+# HTTP
+# --------------------------------------------------
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+def _response(status, body, keep_alive=True):
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+def _error(message):
+    return json.dumps({"error": message}).encode()
+
+async def _ready(status, body):
+    return status, body
+
+
+class _Connection(asyncio.Protocol):
+    # HTTP/1.1 with keep-alive and pipelining, parsed straight off the
+    # socket's buffer; responses go out in request order
+
+    def __init__(self, service):
+        self.service = service
+        self.buffer = bytearray()
+        self.transport = None
+        self._closing = False
+        self._last = None              # the previous request's response task
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def data_received(self, data):
+        self.buffer += data
+        while not self._closing:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.buffer) > MAX_HEAD:
+                    self._fail(400, "request head too large")
+                return
+            lines = self.buffer[:end].decode("latin-1").split("\r\n")
+            parts = lines[0].split()
+            if len(parts) != 3:
+                return self._fail(400, "malformed request line")
+            method, target, version = parts
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = headers.get("content-length", "0")
+            if not length.isdigit():
+                return self._fail(400, "bad Content-Length")
+            length = int(length)
+            if length > MAX_BODY:
+                return self._fail(413, f"body over {MAX_BODY} bytes")
+            if len(self.buffer) < end + 4 + length:
+                return
+            body = bytes(self.buffer[end + 4:end + 4 + length])
+            del self.buffer[:end + 4 + length]
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+            self._queue(self.service.route(method, target.split("?", 1)[0], body), keep_alive)
+
+    def _fail(self, status, message):
+        self._queue(_ready(status, _error(message)), keep_alive=False)
+
+    def _queue(self, response, keep_alive):
+        self._closing = not keep_alive
+        self._last = asyncio.ensure_future(self._send(self._last, response, keep_alive))
+
+    async def _send(self, previous, response, keep_alive):
+        try:
+            status, body = await response
+        except Exception as e:
+            status, body = 500, _error(f"{type(e).__name__}: {e}")
+        if previous is not None:
+            await previous
+        if self.transport is not None:
+            self.transport.write(_response(status, body, keep_alive))
+            if not keep_alive:
+                self.transport.close()
+
+
+class Service:
+    """The HTTP front end: request parsing, routing and the shared ``MicroBatcher``."""
+
+    def __init__(self, window=0.001, max_rows=4096):
+        self.batcher = MicroBatcher(analyse_requests, window, max_rows, size=lambda r: len(r[2]))
+        self.requests = 0
+        self.started = time.time()
+
+    async def analyse(self, payload):
+        """Response body for a decoded ``/analyse`` payload (no HTTP involved)."""
+        request, single = parse_statements(payload)
+        docs = await self.batcher.submit(request)
+        return docs[0] if single else b"[" + b",".join(docs) + b"]"
+
+    async def route(self, method, path, body):
+        """``(status, body)`` for one request."""
+        self.requests += 1
+        if path == "/analyse":
+            if method != "POST":
+                return 405, _error("use POST")
+            try:
+                return 200, await self.analyse(json.loads(body or b"null"))
+            except (ValueError, BadRequest) as e:   # JSONDecodeError is a ValueError
+                return 400, _error(str(e))
+        if path == "/health":
+            batches = self.batcher.batches
+            return 200, json.dumps({
+                "status": "ok", "uptime_s": round(time.time() - self.started, 1),
+                "requests": self.requests, "batches": batches,
+                "mean_batch": round(self.batcher.items / batches, 2) if batches else None,
+            }).encode()
+        return 404, _error(f"no route {path}")
+
+    async def start(self, host="127.0.0.1", port=8321):
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: _Connection(self), host, port, backlog=1024)
+
+    def close(self):
+        self.batcher.close()
+
+
+# --------------------------------------------------
+# Offline load test
+# --------------------------------------------------
+
+def _sample_statements(n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(1, 1000, (n, len(LINE_COLUMNS))).round(2)
+    return [{"company": f"C{i}", **dict(zip(LINE_COLUMNS, row))} for i, row in enumerate(values.tolist())]
+
+async def _client(host, port, bodies, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            writer.write(b"POST /analyse HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            status = await reader.readline()
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            if not status.startswith(b"HTTP/1.1 200"):
+                raise RuntimeError(status.decode().strip())
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+async def bench(requests, concurrency, window, max_rows):
+    """Requests/sec and latency of one-company requests from ``concurrency`` keep-alive clients."""
+    service = Service(window, max_rows)
+    server = await service.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    bodies = [json.dumps(s).encode() for s in _sample_statements(min(requests, 1000))]
+    per_client = [[bodies[(c + k * concurrency) % len(bodies)] for k in range(requests // concurrency)]
+                  for c in range(concurrency)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client("127.0.0.1", port, b, latencies) for b in per_client))
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    service.close()
+    ms = np.percentile(np.array(latencies) * 1e3, [50, 99])
+    return {"requests": len(latencies), "seconds": elapsed, "per_second": len(latencies) / elapsed,
+            "p50_ms": ms[0], "p99_ms": ms[1], "mean_batch": service.batcher.items / service.batcher.batches}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the analysis over HTTP as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8321)
+    parser.add_argument("--window-ms", type=float, default=1.0,
+                        help="how long an idle service collects requests into a batch (default: 1)")
+    parser.add_argument("--max-rows", type=int, default=4096, help="companies per batch at most")
+    parser.add_argument("--bench", type=int, metavar="N",
+                        help="instead of serving, time N requests over loopback and exit")
+    parser.add_argument("--concurrency", type=int, default=64, help="clients for --bench (default: 64)")
+    args = parser.parse_args(argv)
+    window = args.window_ms / 1000
+
+    if args.bench:
+        r = asyncio.run(bench(args.bench, args.concurrency, window, args.max_rows))
+        print(f"{r['requests']:,} requests in {r['seconds']:.2f}s: {r['per_second']:,.0f}/s, "
+              f"p50 {r['p50_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms, "
+              f"{r['mean_batch']:.1f} requests per batch", file=sys.stderr)
+        return
+
+    async def serve():
+        service = Service(window, args.max_rows)
+        server = await service.start(args.host, args.port)
+        print(f"Serving on http://{args.host}:{args.port} (POST /analyse, GET /health)", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
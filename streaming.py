@@ -0,0 +1,231 @@
+"""
+Streaming updates: one filing at a time.
+
+A feed of filings — each a company's statement for one new period — is
+analysed as it arrives, without keeping or rescanning anyone's history.
+``FilingStream`` holds a fixed amount of running state per company:
+
+* a ring of the last ``window`` periods of every flow line (income
+  statement and cash flow) and their running sums, so each flow is its
+  trailing total (``window=4`` on quarterly filings is TTM) after adding
+  the new period and dropping the oldest;
+* a ring of the last ``lag`` periods' lines and the few results growth and
+  the red flags compare (``PAST``), so the comparative period — for the
+  opening/closing averages of inventory, receivables, payables, equity and
+  total assets, YoY growth and the margin red flag — is a lookup.
+
+An update therefore costs the same whatever a company's history length,
+and a batch of filings (any mix of companies) is one vectorised pass
+through the ratio engine. Results match ``ratio_engine.analyse_panel`` run
+over the whole history with flows summed by ``rolling_sum``: flows are NaN
+until a company has ``window`` periods, and the first ``lag`` periods are
+opening periods (compared with themselves, no growth).
+
+    stream = FilingStream(window=4, lag=4)            # quarterly filings, YoY on TTM
+    results = stream.update(["ACME", "INITECH"], filings)
+    results["z"], results["critical_count"], results["roe"]
+
+    python streaming.py filings.parquet results.parquet --window 4 --lag 4
+
+The input file has one row per filing, in filing order, with a ``company``
+column and one column per statement line (``revenue``, ``cogs`` ...).
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import red_flags
+from ratio_engine import HORIZONTAL_ITEMS, LINE_KEYS, evaluate_step, growth, load_panel
+
+
+# Lines reported over a period (summed over the window); the rest are balances
+FLOW_LINES = (
+    "revenue", "cogs", "gross", "ebitda", "ebit", "interest", "tax", "pbt", "pat",
+    "sga", "depreciation", "ocf", "icf", "fcf", "credit_sales",
+)
+_FLOWS = np.array([LINE_KEYS.index(k) for k in FLOW_LINES])
+
+# Results the next comparison reads back: growth lines and net margin for the red flags
+PAST = tuple(dict.fromkeys([key for _, key in HORIZONTAL_ITEMS] + ["npm"]))
+
+
+class FilingStream:
+    """Running per-company state for a feed of filings, one period per company per filing.
+
+    ``window`` is the number of periods each flow line is summed over (1 for
+    annual filings, 4 for TTM from quarterly ones) and ``lag`` how many
+    periods back the comparative is (default ``window``).
+    """
+
+    def __init__(self, window=1, lag=None, flags=True, capacity=1024):
+        self.window = window
+        self.lag = window if lag is None else lag
+        self.flags = flags
+        self.slots = {}                  # company -> row of the state arrays
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "periods", None)
+        arrays = {
+            "periods": np.zeros(capacity, np.int64),                            # periods seen
+            "_flows":  np.zeros((capacity, self.window, len(FLOW_LINES))),      # ring of raw flows
+            "_sums":   np.zeros((capacity, len(FLOW_LINES))),                   # sum of its finite values
+            "_bad":    np.zeros((capacity, len(FLOW_LINES)), np.int32),         # and how many are not
+            "_lines":  np.zeros((capacity, self.lag, len(LINE_KEYS))),          # ring of period lines
+            "_past":   np.zeros((capacity, self.lag, len(PAST))),               # and their PAST results
+        }
+        for name, arr in arrays.items():
+            if old is not None:
+                arr[:len(old)] = getattr(self, name)
+            setattr(self, name, arr)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _rows(self, companies):
+        slots = self.slots
+        rows = np.fromiter((slots.setdefault(c, len(slots)) for c in companies), np.intp, len(companies))
+        if len(slots) > len(self.periods):
+            self._allocate(max(len(slots), 2 * len(self.periods)))
+        return rows
+
+    def update(self, companies, filings, industry=None):
+        """Add one period per filing and return its analysis, one row per filing.
+
+        ``filings`` is a columnar table (dict of arrays, DataFrame, Arrow
+        table) of statement lines named without a period suffix
+        (``revenue``, ``inventory`` ...), one row per entry of
+        ``companies``; missing lines are 0. A company may file more than
+        once in an update; its filings apply in order. Returns a columnar
+        dict with the columns of ``analyse_panel`` (flows are the trailing
+        totals). ``industry`` is one name or one per filing.
+        """
+        companies = list(companies)
+        rows = self._rows(companies)
+        lines = load_panel(filings)
+        values = np.stack([np.broadcast_to(lines[k], rows.shape) for k in LINE_KEYS])
+        if industry is not None and not isinstance(industry, str):
+            industry = np.asarray(industry)
+        rank = _occurrence(rows)
+        if not rank.any():
+            return self._step(rows, values, industry)
+        # Some company files twice: one step per round of filings, results back in input order
+        out = {}
+        for r in range(rank.max() + 1):
+            sel = np.flatnonzero(rank == r)
+            part = self._step(rows[sel], values[:, sel],
+                              industry[sel] if isinstance(industry, np.ndarray) else industry)
+            for name, arr in part.items():
+                if name not in out:
+                    out[name] = np.empty(rows.shape, arr.dtype)
+                out[name][sel] = arr
+        return out
+
+    def _step(self, rows, values, industry):
+        # One period for distinct ``rows``; ``values`` is (lines, rows)
+        n = self.periods[rows]
+        opening = n < self.lag
+
+        # Trailing flow totals: add the new period, drop the one it replaces
+        flows = values[_FLOWS].T
+        pos = n % self.window
+        dropped = self._flows[rows, pos]
+        self._flows[rows, pos] = flows
+        finite, was_finite = np.isfinite(flows), np.isfinite(dropped)
+        self._sums[rows] += np.where(finite, flows, 0.0) - np.where(was_finite, dropped, 0.0)
+        self._bad[rows] += was_finite.astype(np.int32) - finite
+        # Re-add each window once per cycle, so rounding in the running sum cannot build up
+        full = rows[pos == self.window - 1]
+        if full.size:
+            ring = self._flows[full]
+            self._sums[full] = np.where(np.isfinite(ring), ring, 0.0).sum(axis=1)
+        n += 1
+        self.periods[rows] = n
+        complete = (self._bad[rows] == 0) & (n >= self.window)[:, None]
+        values = values.copy()
+        values[_FLOWS] = np.where(complete, self._sums[rows], np.nan).T
+
+        # Comparative period: ``lag`` periods back, or the period itself when there is none
+        slot = (n - 1) % self.lag
+        prior = np.where(opening, values, self._lines[rows, slot].T)
+        past = dict(zip(PAST, np.where(opening, np.nan, self._past[rows, slot].T)))
+        ns = evaluate_step(dict(zip(LINE_KEYS, values)), dict(zip(LINE_KEYS, prior)), opening)
+        for _, key in HORIZONTAL_ITEMS:
+            ns[f"growth_{key}"] = growth(ns[key], past[key])
+        if self.flags:
+            view = dict(ns, prior_npm=past["npm"])
+            ns.update(red_flags.flag_columns(red_flags.evaluate(view, industry)))
+
+        self._lines[rows, slot] = values.T
+        self._past[rows, slot] = np.stack([ns[k] for k in PAST], axis=-1)
+        return ns
+
+
+def _occurrence(rows):
+    # How many earlier entries of ``rows`` hold the same value (0 for a first filing)
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+    group_start = np.repeat(starts, np.diff(np.r_[starts, rows.size]))
+    rank = np.empty_like(rows)
+    rank[order] = np.arange(rows.size) - group_start
+    return rank
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+
+def run(input_path, output_path, window=1, lag=None, chunk_size=100_000, company="company",
+        log=sys.stderr):
+    """Stream a file of filings through a ``FilingStream``; return ``(filings, seconds)``."""
+    import pyarrow as pa
+    from batch import Writer, read_chunks
+    stream = FilingStream(window, lag)
+    writer = Writer(output_path)
+    rows, start = 0, time.perf_counter()
+    try:
+        for chunk in read_chunks(input_path, chunk_size):
+            # Bare line names come back as ``<line>_cy``; the stream wants them bare
+            names = [n[:-3] if n.endswith("_cy") and n[:-3] in LINE_KEYS else n for n in chunk.column_names]
+            chunk = chunk.rename_columns(names)
+            industry = chunk.column("industry").to_numpy(zero_copy_only=False) \
+                if "industry" in names else None
+            results = stream.update(chunk.column(company).to_pylist(), chunk, industry)
+            out = {c: chunk.column(c) for c in names if c not in LINE_KEYS}
+            out.update(results)
+            writer.write(pa.table(out))
+            rows += chunk.num_rows
+            if log:
+                elapsed = time.perf_counter() - start
+                print(f"{rows:,} filings  {len(stream):,} companies  {rows / elapsed:,.0f} filings/sec",
+                      file=log)
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse a feed of filings, one period per row, as it streams.")
+    parser.add_argument("input", help="CSV or Parquet file of filings in filing order")
+    parser.add_argument("output", help="CSV or Parquet file to write each filing's analysis to")
+    parser.add_argument("--window", type=int, default=1,
+                        help="periods each flow line is summed over (4 = TTM from quarters; default: 1)")
+    parser.add_argument("--lag", type=int, help="periods back to the comparative (default: --window)")
+    parser.add_argument("--company", default="company", help="column naming the company (default: company)")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+
+    rows, elapsed = run(args.input, args.output, args.window, args.lag, args.chunk_size, args.company,
+                        log=None if args.quiet else sys.stderr)
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"Analysed {rows:,} filings in {elapsed:.2f}s ({rate:,.0f} filings/sec) -> {args.output}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+The single-company page as it was before the ratio engine, for parity tests.
+
+``page`` is the original script's formulas and red-flag chain transcribed
+line for line onto plain floats, so the vectorised paths can be checked
+against what the page has always shown.
+"""
+
+import numpy as np
+
+from ratio_engine import LINE_KEYS, PERIODS
+
+
+def safe_div(n, d):
+    return n / d if d and d != 0 else 0
+
+def pct(n, d):
+    return safe_div(n, d) * 100
+
+def growth(current, previous):
+    if previous == 0:
+        return 0.0
+    return ((current - previous) / abs(previous)) * 100
+
+def avg(a, b):
+    return (a + b) / 2 if (a + b) != 0 else 0
+
+def altman(wc, ta, re, ebit, equity, tl, sales):
+    if ta == 0 or tl == 0:
+        return 0.0
+    return (1.2*(wc/ta) + 1.4*(re/ta) + 3.3*(ebit/ta) +
+            0.6*(equity/tl) + 1.0*(sales/ta))
+
+
+def page(cy, py):
+    """``(columns, flags, positives)`` the page showed for one company.
+
+    ``cy`` and ``py`` map each statement line to a float. ``columns`` uses
+    the ``analyse`` column names; ``flags`` is ``[(severity, message), ...]``
+    in the order the page raised them.
+    """
+    cy_gross_profit = cy["gross"] if cy["gross"] != 0 else cy["revenue"] - cy["cogs"]
+    py_gross_profit = py["gross"] if py["gross"] != 0 else py["revenue"] - py["cogs"]
+
+    credit_cy = cy["credit_sales"] if cy["credit_sales"] != 0 else cy["revenue"]
+    credit_py = py["credit_sales"] if py["credit_sales"] != 0 else py["revenue"]
+
+    avg_inventory    = avg(cy["inventory"],    py["inventory"])
+    avg_receivables  = avg(cy["receivables"],  py["receivables"])
+    avg_payables     = avg(cy["payables"],     py["payables"])
+    avg_equity       = avg(cy["equity"],       py["equity"])
+    avg_total_assets = avg(cy["total_assets"], py["total_assets"])
+
+    working_capital = cy["current_assets"] - cy["current_liab"]
+    py_wc           = py["current_assets"] - py["current_liab"]
+
+    v = {}
+    v["roce_cy"]     = pct(cy["ebit"], cy["total_assets"] - cy["current_liab"])
+    v["roe_cy"]      = pct(cy["pat"], avg_equity)
+    v["roa_cy"]      = pct(cy["pat"], avg_total_assets)
+    v["gpm_cy"]      = pct(cy_gross_profit, cy["revenue"])
+    v["npm_cy"]      = pct(cy["pat"], cy["revenue"])
+    v["ebitda_m_cy"] = pct(cy["ebitda"], cy["revenue"])
+    v["roce_py"]     = pct(py["ebit"], py["total_assets"] - py["current_liab"])
+    v["roe_py"]      = pct(py["pat"], py["equity"])
+    v["roa_py"]      = pct(py["pat"], py["total_assets"])
+    v["gpm_py"]      = pct(py_gross_profit, py["revenue"])
+    v["npm_py"]      = pct(py["pat"], py["revenue"])
+    v["ebitda_m_py"] = pct(py["ebitda"], py["revenue"])
+
+    v["cr_cy"]     = safe_div(cy["current_assets"], cy["current_liab"])
+    v["qr_cy"]     = safe_div(cy["current_assets"] - cy["inventory"], cy["current_liab"])
+    v["cash_r_cy"] = safe_div(cy["cash"], cy["current_liab"])
+    v["cr_py"]     = safe_div(py["current_assets"], py["current_liab"])
+    v["qr_py"]     = safe_div(py["current_assets"] - py["inventory"], py["current_liab"])
+    v["cash_r_py"] = safe_div(py["cash"], py["current_liab"])
+    v["working_capital_cy"], v["working_capital_py"] = working_capital, py_wc
+
+    v["de_cy"]   = safe_div(cy["total_debt"], cy["equity"])
+    v["gear_cy"] = pct(cy["lt_debt"], cy["lt_debt"] + cy["equity"])
+    v["ic_cy"]   = safe_div(cy["ebit"], cy["interest"])
+    v["de_py"]   = safe_div(py["total_debt"], py["equity"])
+    v["gear_py"] = pct(py["lt_debt"], py["lt_debt"] + py["equity"])
+    v["ic_py"]   = safe_div(py["ebit"], py["interest"])
+
+    v["inv_turn_cy"] = safe_div(cy["cogs"], avg_inventory)
+    v["inv_days_cy"] = safe_div(avg_inventory, cy["cogs"]) * 365
+    v["rec_days_cy"] = safe_div(avg_receivables, credit_cy) * 365
+    v["pay_days_cy"] = safe_div(avg_payables, cy["cogs"]) * 365
+    v["wcc_cy"]      = v["inv_days_cy"] + v["rec_days_cy"] - v["pay_days_cy"]
+    v["at_cy"]       = safe_div(cy["revenue"], cy["total_assets"])
+    v["fat_cy"]      = safe_div(cy["revenue"], cy["net_ppe"])
+    v["inv_turn_py"] = safe_div(py["cogs"], avg(py["inventory"], 0))
+    v["inv_days_py"] = safe_div(py["inventory"], py["cogs"]) * 365
+    v["rec_days_py"] = safe_div(py["receivables"], credit_py) * 365
+    v["pay_days_py"] = safe_div(py["payables"], py["cogs"]) * 365
+    v["wcc_py"]      = v["inv_days_py"] + v["rec_days_py"] - v["pay_days_py"]
+    v["at_py"]       = safe_div(py["revenue"], py["total_assets"])
+    v["fat_py"]      = safe_div(py["revenue"], py["net_ppe"])
+
+    for p, s in (("cy", cy), ("py", py)):
+        v[f"ocf_cl_{p}"]   = safe_div(s["ocf"], s["current_liab"])
+        v[f"ocf_np_{p}"]   = safe_div(s["ocf"], s["pat"])
+        v[f"ccr_{p}"]      = safe_div(s["ocf"], s["ebitda"])
+        v[f"cfo_debt_{p}"] = safe_div(s["ocf"], s["total_debt"])
+        v[f"eff_tax_{p}"]  = pct(s["tax"], s["pbt"])
+        v[f"sga_s_{p}"]    = pct(s["sga"], s["revenue"])
+        v[f"dep_rate_{p}"] = pct(s["depreciation"], s["gross_ppe"])
+        v[f"accruals_{p}"] = pct(s["pat"] - s["ocf"], s["total_assets"])
+
+    v["z_cy"] = altman(working_capital, cy["total_assets"], cy["retained"],
+                       cy["ebit"], cy["equity"], cy["total_liab"], cy["revenue"])
+    v["z_py"] = altman(py_wc, py["total_assets"], py["retained"],
+                       py["ebit"], py["equity"], py["total_liab"], py["revenue"])
+
+    # Horizontal analysis
+    horiz_items = {
+        "revenue":      (cy["revenue"],      py["revenue"]),
+        "gross_profit": (cy_gross_profit,    py_gross_profit),
+        "ebit":         (cy["ebit"],         py["ebit"]),
+        "pat":          (cy["pat"],          py["pat"]),
+        "total_assets": (cy["total_assets"], py["total_assets"]),
+        "total_liab":   (cy["total_liab"],   py["total_liab"]),
+        "equity":       (cy["equity"],       py["equity"]),
+        "ocf":          (cy["ocf"],          py["ocf"]),
+        "receivables":  (cy["receivables"],  py["receivables"]),
+        "inventory":    (cy["inventory"],    py["inventory"]),
+        "total_debt":   (cy["total_debt"],   py["total_debt"]),
+    }
+    for item, (c, p) in horiz_items.items():
+        v[f"growth_{item}"] = growth(c, p)
+
+    # Vertical analysis
+    for p, s, gp in (("cy", cy, cy_gross_profit), ("py", py, py_gross_profit)):
+        v[f"pct_rev_revenue_{p}"] = 100.0
+        for key in ("cogs", "sga", "ebit", "interest", "tax", "pat"):
+            v[f"pct_rev_{key}_{p}"] = pct(s[key], s["revenue"])
+        v[f"pct_rev_gross_profit_{p}"] = pct(gp, s["revenue"])
+        for key in ("cash", "receivables", "inventory", "current_assets", "net_ppe",
+                    "current_liab", "total_liab", "equity"):
+            v[f"pct_ta_{key}_{p}"] = pct(s[key], s["total_assets"])
+
+    # Red flags
+    cr_cy, qr_cy, de_cy, ic_cy = v["cr_cy"], v["qr_cy"], v["de_cy"], v["ic_cy"]
+    npm_cy, npm_py, accruals_cy, z_cy = v["npm_cy"], v["npm_py"], v["accruals_cy"], v["z_cy"]
+    cy_ocf, cy_pat, cy_interest = cy["ocf"], cy["pat"], cy["interest"]
+
+    flags     = []
+    positives = []
+
+    rev_growth    = growth(cy["revenue"],     py["revenue"])
+    rec_growth    = growth(cy["receivables"], py["receivables"])
+    profit_growth = growth(cy["pat"],         py["pat"])
+    debt_growth   = growth(cy["total_debt"],  py["total_debt"])
+
+    if cr_cy < 1.0:
+        flags.append(("🔴 Critical", "Current Ratio below 1.0 — Cannot cover short-term obligations"))
+    elif cr_cy < 1.5:
+        flags.append(("🟡 Warning",  f"Current Ratio is low at {cr_cy:.2f} (target ≥ 1.5)"))
+    else:
+        positives.append(f"Current Ratio is healthy at {cr_cy:.2f}")
+
+    if qr_cy < 1.0:
+        flags.append(("🟡 Warning", f"Quick Ratio below 1.0 at {qr_cy:.2f} — Limited liquid assets"))
+
+    if working_capital < 0:
+        flags.append(("🔴 Critical", "Negative Working Capital — Serious liquidity risk"))
+
+    if cy_ocf < 0:
+        flags.append(("🔴 Critical", "Negative Operating Cash Flow — Business is burning cash from operations"))
+    elif cy_ocf > cy_pat:
+        positives.append("Operating Cash Flow exceeds Net Profit — Strong earnings quality")
+
+    if cy_ocf < cy_pat * 0.8 and cy_pat > 0:
+        flags.append(("🟡 Warning", "Operating CF significantly below Net Profit — Weak cash conversion or aggressive accounting"))
+
+    if de_cy > 3.0:
+        flags.append(("🔴 Critical", f"Debt-to-Equity at {de_cy:.2f} — Dangerously high leverage"))
+    elif de_cy > 2.0:
+        flags.append(("🟡 Warning",  f"Debt-to-Equity at {de_cy:.2f} — High leverage (target < 2.0)"))
+    else:
+        positives.append(f"Debt-to-Equity is manageable at {de_cy:.2f}")
+
+    if ic_cy < 1.5 and cy_interest > 0:
+        flags.append(("🔴 Critical", f"Interest Coverage of {ic_cy:.2f}x — At risk of defaulting on interest"))
+    elif ic_cy < 3.0 and cy_interest > 0:
+        flags.append(("🟡 Warning",  f"Interest Coverage of {ic_cy:.2f}x — Should be above 3.0x"))
+
+    if rec_growth > rev_growth + 15:
+        flags.append(("🟡 Warning", f"Receivables growing ({rec_growth:.1f}%) faster than Revenue ({rev_growth:.1f}%) — Potential collection issues"))
+
+    if rev_growth > 0 and profit_growth < 0:
+        flags.append(("🟡 Warning", "Revenue growing but profits declining — Margin compression or cost overruns"))
+
+    if debt_growth > rev_growth + 20:
+        flags.append(("🟡 Warning", f"Debt growing ({debt_growth:.1f}%) much faster than Revenue ({rev_growth:.1f}%)"))
+
+    if npm_cy < 0:
+        flags.append(("🔴 Critical", "Negative Net Profit Margin — Company is loss-making"))
+    elif npm_cy < 5:
+        flags.append(("🟡 Warning",  f"Net Profit Margin very thin at {npm_cy:.1f}%"))
+
+    if abs(accruals_cy) > 5:
+        flags.append(("🟡 Warning", f"High Accruals-to-Assets ({accruals_cy:.1f}%) — Earnings quality concern"))
+
+    if z_cy < 1.8:
+        flags.append(("🔴 Critical", f"Altman Z-Score {z_cy:.2f} — High bankruptcy risk"))
+    elif z_cy < 2.7:
+        flags.append(("🟡 Warning",  f"Altman Z-Score {z_cy:.2f} — In financial distress zone"))
+    elif z_cy > 3.0:
+        positives.append(f"Altman Z-Score {z_cy:.2f} — Company is in the safe zone")
+
+    if npm_cy > npm_py and rev_growth > 0:
+        positives.append("Profit margin improving alongside revenue growth — Quality performance")
+
+    return v, flags, positives
+
+
+def random_table(n, seed=0):
+    """``n`` companies of whole-number ``<line>_<period>`` columns with the page's edge cases.
+
+    About one line in eight is 0 (blank gross profit and credit sales, no
+    interest, PBT or revenue ...) and cash flow and profit lines can be
+    negative, so every red flag and every zero-denominator branch is hit.
+    """
+    rng = np.random.default_rng(seed)
+    signed = {"ebitda", "ebit", "pbt", "pat", "tax", "ocf", "icf", "fcf", "retained"}
+    table = {}
+    for key in LINE_KEYS:
+        for p in PERIODS:
+            low = -500 if key in signed else 0
+            values = rng.integers(low, 2000, n).astype(np.float64)
+            values[rng.random(n) < 0.125] = 0.0
+            table[f"{key}_{p}"] = values
+    return table
+
+
+def row(table, i, period):
+    """One company's period of ``random_table`` as ``{line: float}``."""
+    return {key: float(table[f"{key}_{period}"][i]) for key in LINE_KEYS}
@@ -0,0 +1,25 @@
+import numpy as np
+
+from page_baseline import page, random_table, row
+from ratio_engine import analyse
+
+
+TABLE = random_table(500)
+N = len(TABLE["revenue_cy"])
+
+
+def test_analyse_matches_page():
+    out = analyse(TABLE, flags=False)
+    pages = [page(row(TABLE, i, "cy"), row(TABLE, i, "py"))[0] for i in range(N)]
+    for column in pages[0]:
+        expected = np.array([p[column] for p in pages], dtype=np.float64)
+        np.testing.assert_allclose(out[column], expected, rtol=1e-12, atol=1e-9, err_msg=column)
+
+
+def test_analyse_single_statement_matches_page():
+    # A one-row table of scalars, as the page hands it over
+    cy, py = row(TABLE, 0, "cy"), row(TABLE, 0, "py")
+    table = {**{f"{k}_cy": v for k, v in cy.items()}, **{f"{k}_py": v for k, v in py.items()}}
+    out = analyse(table, flags=False)
+    for column, value in page(cy, py)[0].items():
+        np.testing.assert_allclose(out[column], [value], rtol=1e-12, atol=1e-9, err_msg=column)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from page_baseline import random_table
+from ratio_engine import analyse, compute_ratios
+from ratio_graph import INPUTS, IncrementalAnalysis
+
+
+def _assert_matches_full(engine, table, industry=None):
+    full = compute_ratios(table)
+    for column, arr in full.items():
+        np.testing.assert_allclose(engine.values[column], arr, rtol=1e-12, atol=1e-9, err_msg=column)
+    page = analyse(table, industry=industry)
+    for column, arr in page.items():
+        if column in engine.values:
+            np.testing.assert_allclose(engine.values[column], arr, rtol=1e-12, atol=1e-9, err_msg=column)
+    for code, _, mask, _, _ in engine.values["red_flags"]:
+        np.testing.assert_array_equal(mask, page[f"flag_{code}"], err_msg=code)
+
+
+def test_single_edits_match_full_recompute():
+    table = random_table(1, seed=3)
+    engine = IncrementalAnalysis()
+    engine.update(table)
+    _assert_matches_full(engine, table)
+
+    rng = np.random.default_rng(3)
+    for name in rng.permutation(INPUTS)[:40]:
+        table = dict(table)
+        table[name] = table[name] + rng.integers(-300, 300)
+        changed = engine.update(table)
+        assert name in changed
+        _assert_matches_full(engine, table)
+
+
+def test_edit_to_zero_and_back():
+    # Blanking a line switches the page's fallbacks (gross profit, credit sales, averages)
+    table = random_table(1, seed=4)
+    engine = IncrementalAnalysis()
+    engine.update(table)
+    for name in ("gross_cy", "credit_sales_py", "inventory_py", "equity_cy", "interest_cy", "revenue_py"):
+        original = table[name]
+        table = dict(table, **{name: np.zeros(1)})
+        engine.update(table)
+        _assert_matches_full(engine, table)
+        table = dict(table, **{name: original})
+        engine.update(table)
+        _assert_matches_full(engine, table)
+
+
+def test_unchanged_inputs_recompute_nothing():
+    table = random_table(1, seed=5)
+    engine = IncrementalAnalysis()
+    engine.update(table)
+    assert engine.update(table) == set()
+    assert engine.recomputed == 0
+
+
+def test_industry_only_touches_red_flags():
+    table = random_table(1, seed=6)
+    engine = IncrementalAnalysis()
+    engine.update(table)
+    changed = engine.update(table, industry="Banking")
+    assert changed <= {"industry", "red_flags"}
+    _assert_matches_full(engine, table, industry="Banking")
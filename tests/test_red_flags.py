@@ -0,0 +1,41 @@
+import red_flags
+from page_baseline import page, random_table, row
+from ratio_engine import analyse, current_view
+
+
+TABLE = random_table(500)
+N = len(TABLE["revenue_cy"])
+
+
+def _flags():
+    view = current_view(analyse(TABLE, flags=False))
+    return red_flags.evaluate(view), view
+
+
+def test_every_rule_is_exercised():
+    rules, _ = _flags()
+    assert [code for code, _, mask, _, _ in rules if not mask.any()] == []
+
+
+def test_messages_and_order_match_page():
+    rules, view = _flags()
+    for i, (flags, positives) in enumerate(red_flags.all_company_flags(rules, view)):
+        _, expected_flags, expected_positives = page(row(TABLE, i, "cy"), row(TABLE, i, "py"))
+        assert flags == expected_flags, i
+        assert positives == expected_positives, i
+
+
+def test_company_flags_matches_all_company_flags():
+    rules, view = _flags()
+    everyone = red_flags.all_company_flags(rules, view)
+    for i in range(0, N, 37):
+        assert red_flags.company_flags(rules, view, i) == everyone[i]
+
+
+def test_counts_match_page():
+    out = analyse(TABLE)
+    for i in range(N):
+        _, flags, positives = page(row(TABLE, i, "cy"), row(TABLE, i, "py"))
+        assert out["critical_count"][i] == sum(sev == red_flags.CRITICAL for sev, _ in flags)
+        assert out["warning_count"][i] == sum(sev == red_flags.WARNING for sev, _ in flags)
+        assert out["positive_count"][i] == len(positives)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from ratio_engine import LINE_KEYS, analyse_panel, rolling_sum
+from streaming import FLOW_LINES, FilingStream
+
+
+def _panel(n, periods, seed=0):
+    # Whole numbers, so running sums and ``rolling_sum`` agree exactly
+    rng = np.random.default_rng(seed)
+    signed = {"ebitda", "ebit", "pbt", "pat", "tax", "ocf", "icf", "fcf", "retained"}
+    panel = {}
+    for key in LINE_KEYS:
+        values = rng.integers(-500 if key in signed else 0, 2000, (n, periods)).astype(np.float64)
+        values[rng.random((n, periods)) < 0.1] = 0.0
+        panel[key] = values
+    return panel
+
+
+def _expected(panel, window, lag):
+    summed = {k: rolling_sum(v, window) if k in FLOW_LINES else v for k, v in panel.items()}
+    return analyse_panel(summed, lag=lag)
+
+
+def _assert_same(got, expected, t):
+    for column, arr in expected.items():
+        np.testing.assert_allclose(got[column], arr[:, t], rtol=1e-12, atol=1e-9,
+                                   err_msg=f"{column} at period {t}")
+
+
+@pytest.mark.parametrize("window, lag", [(1, 1), (4, 4), (4, 1)])
+def test_stream_matches_panel(window, lag):
+    panel = _panel(40, 12)
+    expected = _expected(panel, window, lag)
+    stream = FilingStream(window, lag, capacity=8)
+    companies = [f"c{i}" for i in range(40)]
+    for t in range(12):
+        got = stream.update(companies, {k: v[:, t] for k, v in panel.items()})
+        _assert_same(got, expected, t)
+
+
+def test_interleaved_filings_match_panel():
+    # Companies file in any order, some several periods in one update
+    n, periods = 10, 9
+    panel = _panel(n, periods, seed=1)
+    expected = _expected(panel, 4, 4)
+    feed = [(i, t) for t in range(periods) for i in range(n)]
+    feed.sort(key=lambda f: (f[1] + f[0] % 3, f[0]))
+    stream = FilingStream(4)
+    for start in range(0, len(feed), 17):
+        part = feed[start:start + 17]
+        got = stream.update([f"c{i}" for i, _ in part],
+                            {k: np.array([v[i, t] for i, t in part]) for k, v in panel.items()})
+        for j, (i, t) in enumerate(part):
+            for column, arr in expected.items():
+                np.testing.assert_allclose(got[column][j], arr[i, t], rtol=1e-12, atol=1e-9,
+                                           err_msg=f"{column} of c{i} at period {t}")
@@ -0,0 +1,48 @@
+import csv
+
+import numpy as np
+import pytest
+import pyarrow.parquet as pq
+
+from batch import run
+from ratio_engine import LINE_KEYS, PERIODS
+from validation import BITS, validate
+
+
+STATEMENT = {
+    "revenue": 1000.0, "cogs": 600.0, "gross": 400.0, "ebitda": 250.0, "ebit": 200.0, "interest": 20.0,
+    "tax": 45.0, "pbt": 180.0, "pat": 135.0, "sga": 150.0, "depreciation": 50.0,
+    "cash": 100.0, "receivables": 150.0, "inventory": 120.0, "current_assets": 400.0,
+    "total_assets": 1000.0, "gross_ppe": 700.0, "net_ppe": 500.0, "current_liab": 200.0,
+    "st_debt": 50.0, "lt_debt": 250.0, "total_debt": 300.0, "total_liab": 550.0, "equity": 450.0,
+    "retained": 200.0, "payables": 90.0, "ocf": 160.0, "icf": -80.0, "fcf": -40.0, "credit_sales": 800.0,
+}
+assert set(STATEMENT) == set(LINE_KEYS)
+
+
+def _write_csv(path, blank=()):
+    header = [f"{k}_{p}" for k in LINE_KEYS for p in PERIODS]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(["" if column in blank else STATEMENT[column.rsplit("_", 1)[0]] for column in header])
+
+
+@pytest.mark.parametrize("screened", [True, False])
+def test_blank_optional_line_is_not_given(tmp_path, screened):
+    _write_csv(tmp_path / "in.csv", blank={"gross_cy", "credit_sales_py"})
+    rejects = str(tmp_path / "rejects.parquet") if screened else None
+    _, _, totals = run(str(tmp_path / "in.csv"), str(tmp_path / "out.parquet"), log=None, rejects=rejects)
+    assert totals["rejected"] == 0
+    out = pq.read_table(tmp_path / "out.parquet")
+    # Derived as on the page: Revenue − COGS, and Revenue for credit sales
+    assert out.column("gpm_cy").to_pylist() == [40.0]
+    assert out.column("rec_days_py").to_pylist() == pytest.approx([150 / 1000 * 365])
+
+
+def test_blank_required_line_is_rejected():
+    columns = {f"{k}_{p}": np.array([v, v]) for k, v in STATEMENT.items() for p in PERIODS}
+    columns["revenue_cy"][1] = np.nan
+    mask = validate(columns)
+    assert mask[0] == 0
+    assert mask[1] == 1 << BITS.index(("blank", "cy"))
@@ -0,0 +1,187 @@
+"""
+Input validation: accounting identities and sign sanity.
+
+Statements that do not add up still analyse without complaint — ``safe_div``
+turns a zero denominator into a zero ratio and a balance sheet that does
+not balance gives plausible-looking leverage. Before a bulk load is
+analysed its rows are screened here instead.
+
+The checks are a table of ``Check`` records, like the red-flag rules, and
+``validate`` runs the whole table over whole columns: each row gets one
+integer bitmask with a bit per (check, period) it fails — ``BITS[i]`` names
+bit ``i`` — so millions of rows are screened in one pass and a clean row is
+simply 0.
+
+    python validation.py statements.parquet               # failures per check
+    python validation.py statements.parquet -o rejects.csv
+    python batch.py statements.parquet results.parquet --rejects rejects.csv
+"""
+
+import argparse
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from ratio_engine import LINE_KEYS, PERIODS, line_values
+
+
+# --------------------------------------------------
+# Check table
+# --------------------------------------------------
+# ``lines op terms``, where ``terms`` is a sum of lines (a leading "-"
+# subtracts one). ``==`` and ``<=`` hold within the tolerance and are only
+# checked where both sides are reported (the line and at least one term are
+# non-zero), since a blank line means "not given" on the page. With no terms
+# each of ``lines`` is compared with 0. ``finite`` fails where any of
+# ``lines`` is blank or not a number; ``OPTIONAL`` lines are exempt.
+
+Check = namedtuple("Check", ["code", "message", "lines", "op", "terms"], defaults=((),))
+
+# Lines the page derives when left blank (Gross Profit from Revenue − COGS,
+# Credit Sales as Revenue): a blank one is "not given", not a bad row
+OPTIONAL = ("gross", "credit_sales")
+REQUIRED = tuple(k for k in LINE_KEYS if k not in OPTIONAL)
+
+# Lines that are balances or gross amounts and cannot be negative
+NON_NEGATIVE = (
+    "revenue", "cogs", "sga", "depreciation", "interest", "credit_sales",
+    "cash", "receivables", "inventory", "current_assets", "total_assets", "gross_ppe", "net_ppe",
+    "current_liab", "st_debt", "lt_debt", "total_debt", "total_liab", "payables",
+)
+
+CHECKS = (
+    Check("blank", "A required statement line is blank or not a number", REQUIRED, "finite"),
+    Check("negative", "A balance or gross amount is negative", NON_NEGATIVE, ">="),
+
+    # Identities
+    Check("gross_profit", "Gross Profit ≠ Revenue − COGS", ("gross",), "==", ("revenue", "-cogs")),
+    Check("pat_bridge", "PAT ≠ PBT − Tax", ("pat",), "==", ("pbt", "-tax")),
+    Check("balance_sheet", "Total Assets ≠ Total Liabilities + Equity",
+          ("total_assets",), "==", ("total_liab", "equity")),
+    Check("total_debt", "Total Debt ≠ Short-Term + Long-Term Debt",
+          ("total_debt",), "==", ("st_debt", "lt_debt")),
+
+    # Parts within their totals
+    Check("gross_above_revenue", "Gross Profit exceeds Revenue", ("gross",), "<=", ("revenue",)),
+    Check("ebit_above_ebitda", "EBIT exceeds EBITDA", ("ebit",), "<=", ("ebitda",)),
+    Check("credit_above_revenue", "Credit Sales exceed Revenue", ("credit_sales",), "<=", ("revenue",)),
+    Check("current_assets", "Cash + Receivables + Inventory exceed Current Assets",
+          ("cash", "receivables", "inventory"), "<=", ("current_assets",)),
+    Check("current_above_total", "Current Assets exceed Total Assets",
+          ("current_assets",), "<=", ("total_assets",)),
+    Check("net_above_gross_ppe", "Net PP&E exceeds Gross PP&E", ("net_ppe",), "<=", ("gross_ppe",)),
+    Check("current_liab", "Current Liabilities exceed Total Liabilities",
+          ("current_liab",), "<=", ("total_liab",)),
+    Check("debt_above_liab", "Total Debt exceeds Total Liabilities", ("total_debt",), "<=", ("total_liab",)),
+)
+
+# Default tolerance for ``==`` and ``<=``: the larger of 0.5% of the bigger
+# side and one unit, which absorbs rounding in statements given in thousands
+REL_TOL = 0.005
+ABS_TOL = 1.0
+
+# Bit i of a mask is BITS[i] = (check code, period)
+BITS = tuple((check.code, period) for check in CHECKS for period in PERIODS)
+MASK_DTYPE = np.uint32 if len(BITS) <= 32 else np.uint64
+
+
+# --------------------------------------------------
+# Validation
+# --------------------------------------------------
+
+def _sum(values, names):
+    out = 0.0
+    for name in names:
+        sign, name = (-1.0, name[1:]) if name.startswith("-") else (1.0, name)
+        out = out + sign * values[LINE_KEYS.index(name)]
+    return out
+
+def _lines(values, names):
+    # (len(names), N) rows of ``values``; all of them without a copy
+    return values if tuple(names) == LINE_KEYS else values[[LINE_KEYS.index(k) for k in names]]
+
+def _failures(check, values, rel_tol, abs_tol):
+    # -> boolean (N,) of the rows ``check`` fails for one period's (lines, N) values
+    if check.op == "finite":
+        return ~np.isfinite(_lines(values, check.lines)).all(axis=0)
+    if not check.terms:
+        return (_lines(values, check.lines) < 0).any(axis=0)
+    lhs, rhs = _sum(values, check.lines), _sum(values, check.terms)
+    reported = (lhs != 0) & np.any([values[LINE_KEYS.index(t.lstrip("-"))] != 0 for t in check.terms], axis=0)
+    slack = np.maximum(abs_tol, rel_tol * np.maximum(np.abs(lhs), np.abs(rhs)))
+    diff = lhs - rhs
+    fails = np.abs(diff) > slack if check.op == "==" else diff > slack
+    return reported & fails
+
+def validate(table, rel_tol=REL_TOL, abs_tol=ABS_TOL, checks=CHECKS):
+    """One ``MASK_DTYPE`` bitmask per row of ``table``: bit ``i`` set where the row fails ``BITS[i]``.
+
+    ``table`` is any columnar table of ``<line>_<period>`` columns (missing
+    lines count as not reported).
+    """
+    values = line_values(table).reshape(len(LINE_KEYS), len(PERIODS), -1)
+    dtype = np.uint32 if len(checks) * len(PERIODS) <= 32 else np.uint64
+    mask = np.zeros(values.shape[-1], dtype=dtype)
+    with np.errstate(invalid="ignore"):
+        for i, check in enumerate(checks):
+            for p in range(len(PERIODS)):
+                fails = _failures(check, values[:, p], rel_tol, abs_tol)
+                mask |= fails.astype(dtype) << dtype(i * len(PERIODS) + p)
+    return mask
+
+def describe(mask, bits=BITS):
+    """``;``-joined ``<check>_<period>`` codes of each row's failures ("" for a clean row)."""
+    masks, inverse = np.unique(np.asarray(mask), return_inverse=True)
+    text = np.array([";".join(f"{code}_{period}" for b, (code, period) in enumerate(bits) if int(m) >> b & 1)
+                     for m in masks], dtype=object)
+    return text[inverse.reshape(-1)]
+
+def failure_counts(mask, bits=BITS):
+    """``{(check code, period): rows failing it}`` for every bit set in any row."""
+    mask = np.asarray(mask)
+    counts = {}
+    for b, bit in enumerate(bits):
+        n = int(np.count_nonzero(mask >> mask.dtype.type(b) & mask.dtype.type(1)))
+        if n:
+            counts[bit] = n
+    return counts
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a statements file for accounting identities and signs.")
+    parser.add_argument("input", help="CSV, Parquet or Excel (needs openpyxl) file of statements")
+    parser.add_argument("-o", "--rejects", help="write the failing rows, with their failures, to this file")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--rel-tol", type=float, default=REL_TOL)
+    parser.add_argument("--abs-tol", type=float, default=ABS_TOL)
+    args = parser.parse_args(argv)
+
+    from batch import Writer, read_chunks, validate_chunk
+    writer = Writer(args.rejects) if args.rejects else None
+    rows, counts = 0, {}
+    try:
+        for chunk in read_chunks(args.input, args.chunk_size):
+            mask = validate(chunk, args.rel_tol, args.abs_tol)
+            for bit, n in failure_counts(mask).items():
+                counts[bit] = counts.get(bit, 0) + n
+            if writer is not None:
+                _, rejected = validate_chunk(chunk, rows, mask)
+                if rejected is not None:
+                    writer.write(rejected)
+            rows += chunk.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    messages = {check.code: check.message for check in CHECKS}
+    for (code, period), n in sorted(counts.items(), key=lambda kv: -kv[1]):
+        print(f"{n:>10,}  {code}_{period:<24} {messages[code]}", file=sys.stderr)
+    print(f"Checked {rows:,} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()